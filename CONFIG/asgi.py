@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'CONFIG.settings')
 
 application = get_asgi_application()
+
+# Fon worker poolidagi davriy tekshiruvlar (natijalarni qayta yuborish va h.k.) faqat server jarayonida
+from core.tasks import start_background_sweeps  # noqa: E402
+start_background_sweeps()
@@ -25,6 +25,10 @@ load_dotenv(os.path.join(BASE_DIR, '.env'), override=True)
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.getenv('SECRET_KEY')
 TELEGRAM_BOT_TOKEN = os.getenv('BOT_TOKEN')
+# Bot -> Django API so'rovlari uchun umumiy maxfiy kalit (X-Bot-Api-Key sarlavhasi, tgbot.permissions.IsBotClient)
+BOT_API_KEY = os.getenv('BOT_API_KEY')
+# Telegram Bot API manzili (testlarda lokal mock serverga yo'naltiriladi: tgbot.mock_telegram, tgbot/tests.py)
+TELEGRAM_API_BASE_URL = os.getenv('TELEGRAM_API_BASE_URL', 'https://api.telegram.org').rstrip('/')
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = os.getenv('DEBUG', 'False').lower() in ('true', '1', 't')
@@ -145,6 +149,48 @@ STATICFILES_DIRS = [
 
 MEDIA_URL = 'media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Savol HTML idagi rasmlar (media/question_images/<sha256>.<ext>) DEBUG=False da ham Django orqali beriladi.
+# media/ ni nginx kabi veb-server bersa, SERVE_QUESTION_IMAGES=False qilib qo'yish mumkin
+SERVE_QUESTION_IMAGES = os.getenv('SERVE_QUESTION_IMAGES', 'True').lower() in ('true', '1', 't')
+# Eksport fayllari (foydalanuvchilarning shaxsiy ma'lumotlari) MEDIA_ROOT dan tashqarida saqlanadi va MEDIA_URL orqali
+# berilmaydi - faqat bot API kaliti bilan himoyalangan export-jobs/<id>/file/ endpointi orqali yuklab olinadi
+EXPORTS_ROOT = os.getenv('EXPORTS_ROOT', os.path.join(BASE_DIR, 'private', 'exports'))
+
+# Kesh: REDIS_URL berilsa django-redis (barcha worker jarayonlar uchun umumiy), aks holda lokal xotira
+# (har bir jarayonda alohida; savol poollari kaliti bazadagi avlod raqamini o'z ichiga olgani uchun ular eskirib qolmaydi)
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {'CLIENT_CLASS': 'django_redis.client.DefaultClient'},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Savol poollari keshining amal qilish muddati (sekund)
+QUESTION_POOL_TIMEOUT = int(os.getenv('QUESTION_POOL_TIMEOUT', '3600'))
+
+# Fon vazifalari (savollarni render qilish va h.k.) uchun lokal worker pool hajmi
+BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', '4'))
+# CPU talab qiladigan ishlar (ommaviy yuklashda DOCX ni tillar bo'yicha parallel ajratish) uchun jarayonlar soni
+BACKGROUND_PROCESSES = int(os.getenv('BACKGROUND_PROCESSES', '3'))
+# Yuborilmay qolgan test natijalari (ResultDelivery) necha sekundda bir tekshirilib qayta yuborilishi
+RESULT_DELIVERY_SWEEP_INTERVAL = int(os.getenv('RESULT_DELIVERY_SWEEP_INTERVAL', '60'))
+# Navbatda qolgan yoki to'xtab qolgan ommaviy yuklash vazifalari (BulkUploadJob) necha sekundda bir tekshirilishi
+BULK_UPLOAD_SWEEP_INTERVAL = int(os.getenv('BULK_UPLOAD_SWEEP_INTERVAL', '60'))
+
+# Telegram Bot API uchun umumiy (pool qilingan) HTTP klient sozlamalari
+TELEGRAM_HTTP_TIMEOUT = float(os.getenv('TELEGRAM_HTTP_TIMEOUT', '30'))
+TELEGRAM_HTTP_MAX_CONNECTIONS = int(os.getenv('TELEGRAM_HTTP_MAX_CONNECTIONS', '100'))
+TELEGRAM_HTTP_MAX_KEEPALIVE = int(os.getenv('TELEGRAM_HTTP_MAX_KEEPALIVE', '100')) # Yuklama paytida ulanishlar yopilib-ochilmasligi uchun max_connections ga teng
+TELEGRAM_HTTP2 = os.getenv('TELEGRAM_HTTP2', 'True').lower() in ('true', '1', 't') # 'h2' paketi o'rnatilgan bo'lsa
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
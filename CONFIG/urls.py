@@ -1,8 +1,10 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 from django.conf.urls.i18n import i18n_patterns # Til prefikslari uchun
+from django.views.decorators.cache import cache_control
+from django.views.static import serve
 from tgbot.views import ExportTestsAPIView, GetAllUserTelegramIdsAPIView
 
 urlpatterns = [
@@ -21,4 +23,14 @@ urlpatterns += i18n_patterns(
 
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file
+    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+elif settings.SERVE_QUESTION_IMAGES:
+    # Render qilingan savol HTML idagi rasmlar ishlab chiqarishda ham ochilishi uchun. Faqat question_images/
+    # beriladi (qolgan media, masalan savol DOCX fayllari, ochiq bo'lmaydi); fayl nomi kontent hashi - o'zgarmaydi
+    urlpatterns += [
+        re_path(
+            rf'^{settings.MEDIA_URL.strip("/")}/(?P<path>question_images/[0-9a-f]{{64}}\.\w+)$',
+            cache_control(public=True, max_age=31536000, immutable=True)(serve),
+            {'document_root': settings.MEDIA_ROOT},
+        ),
+    ]
\ No newline at end of file
@@ -0,0 +1,183 @@
+# bot_broadcast.py
+"""
+Kanal postini barcha foydalanuvchilarga tarqatish mexanizmi (bot_runner.handle_channel_post uchun).
+
+- Global token-bucket limiter (standart 30 xabar/s, Telegram ommaviy yuborish limiti) va
+  har bir chat uchun minimal oraliq.
+- Cheklangan sonli parallel yuboruvchilar (asyncio.Queue + worker tasklar).
+- 429 (TelegramRetryAfter) kelsa butun yuborish retry_after sekundga to'xtatiladi va xabar qayta yuboriladi.
+- Har bir qabul qiluvchi natijasi on_result orqali qaytariladi (bot uni Django API ga paketlab yozadi,
+  shuning uchun qayta ishga tushganda tarqatish to'xtagan joyidan davom etadi).
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from aiogram.exceptions import (
+    TelegramRetryAfter,
+    TelegramForbiddenError,
+    TelegramBadRequest,
+    TelegramNetworkError,
+    TelegramServerError,
+)
+
+logger = logging.getLogger(__name__)
+
+STATUS_SENT = "sent"
+STATUS_BLOCKED = "blocked" # Foydalanuvchi botni bloklagan yoki akkaunti o'chirilgan
+STATUS_FAILED = "failed"
+
+
+class TokenBucket:
+    """Asinxron token-bucket: o'rtacha `rate` ta/sekund, `capacity` ta gacha portlash (burst)."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """Barcha yuboruvchilarni `seconds` ga to'xtatish (429 retry_after uchun)."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class PerChatLimiter:
+    """Bitta chatga ketma-ket xabarlar orasidagi minimal oraliq (oxirgi `max_chats` ta chat eslab qolinadi)."""
+
+    def __init__(self, min_interval: float = 1.0, max_chats: int = 10000):
+        self.min_interval = min_interval
+        self.max_chats = max_chats
+        self._last_sent = OrderedDict()
+
+    async def wait(self, chat_id):
+        last = self._last_sent.get(chat_id)
+        if last is not None:
+            delay = last + self.min_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        self._last_sent[chat_id] = time.monotonic()
+        self._last_sent.move_to_end(chat_id)
+        while len(self._last_sent) > self.max_chats:
+            self._last_sent.popitem(last=False)
+
+
+class BroadcastEngine:
+    def __init__(self, rate: float = 30, concurrency: int = 20, per_chat_interval: float = 1.0,
+                 max_retries: int = 3, progress_interval: float = 5.0):
+        self.bucket = TokenBucket(rate)
+        self.per_chat = PerChatLimiter(per_chat_interval)
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.progress_interval = progress_interval
+
+    async def _send_one(self, send, chat_id):
+        """Bitta qabul qiluvchiga yuboradi; (status, xato matni) qaytaradi."""
+        for attempt in range(self.max_retries + 1):
+            await self.per_chat.wait(chat_id)
+            await self.bucket.acquire()
+            try:
+                await send(chat_id)
+                return STATUS_SENT, ""
+            except TelegramRetryAfter as e:
+                # Flood limit butun bot uchun: hamma yuboruvchilar kutadi, keyin shu xabar qayta yuboriladi
+                logger.warning(f"Telegram 429: {e.retry_after} s kutilmoqda (chat {chat_id}).")
+                self.bucket.pause(e.retry_after)
+                error = str(e)
+            except TelegramForbiddenError as e:
+                return STATUS_BLOCKED, str(e)
+            except TelegramBadRequest as e:
+                # "chat not found", "user is deactivated" va h.k. - qayta urinishdan foyda yo'q
+                if "chat not found" in str(e).lower() or "deactivated" in str(e).lower():
+                    return STATUS_BLOCKED, str(e)
+                return STATUS_FAILED, str(e)
+            except (TelegramNetworkError, TelegramServerError) as e:
+                error = str(e)
+                await asyncio.sleep(2 ** attempt)
+            except Exception as e:
+                logger.error(f"Xabarni {chat_id} ga yuborishda kutilmagan xatolik: {e}")
+                return STATUS_FAILED, str(e)
+        return STATUS_FAILED, error
+
+    async def run(self, recipient_ids, send, on_progress=None, on_result=None, state=None):
+        """
+        recipient_ids - chat IDlar (list yoki async iterator).
+        send(chat_id) - bitta xabarni yuboruvchi korutina.
+        on_progress(state) - har `progress_interval` sekundda va oxirida chaqiriladi.
+        on_result(chat_id, status, error) - har bir qabul qiluvchi natijasi.
+        """
+        state = state if state is not None else {}
+        for key in (STATUS_SENT, STATUS_BLOCKED, STATUS_FAILED):
+            state.setdefault(key, 0)
+
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        async def worker():
+            while True:
+                chat_id = await queue.get()
+                if chat_id is None:
+                    queue.task_done()
+                    return
+                status, error = await self._send_one(send, chat_id)
+                state[status] += 1
+                if on_result is not None:
+                    try:
+                        await on_result(chat_id, status, error)
+                    except Exception as e:
+                        logger.error(f"Natijani ({chat_id}: {status}) saqlashda xatolik: {e}")
+                queue.task_done()
+
+        finished = asyncio.Event()
+
+        async def reporter():
+            while not finished.is_set():
+                try:
+                    await asyncio.wait_for(finished.wait(), self.progress_interval)
+                except asyncio.TimeoutError:
+                    await on_progress(state)
+
+        async def producer():
+            if hasattr(recipient_ids, "__aiter__"):
+                async for chat_id in recipient_ids:
+                    await queue.put(int(chat_id))
+            else:
+                for chat_id in recipient_ids:
+                    await queue.put(int(chat_id))
+            for _ in range(self.concurrency):
+                await queue.put(None)
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        producer_task = asyncio.create_task(producer())
+        reporter_task = asyncio.create_task(reporter()) if on_progress is not None else None
+        try:
+            # Worker kutilmaganda to'xtasa, producer to'lgan navbatda osilib qolmasligi uchun hammasi birga kutiladi
+            await asyncio.gather(producer_task, *workers)
+            finished.set()
+            if reporter_task is not None:
+                await reporter_task # Yarim bajarilgan on_progress bekor qilinmasligi uchun tugashi kutiladi
+        finally:
+            for task in [producer_task, *workers, reporter_task]:
+                if task is not None:
+                    task.cancel()
+
+        if on_progress is not None:
+            await on_progress(state)
+        return state
@@ -2,6 +2,10 @@
 import asyncio
 import logging
 import os
+import re
+import tempfile
+import time
+from collections import defaultdict, deque, OrderedDict
 
 import httpx # Yoki aiohttp
 from aiogram import Bot, Dispatcher, types, F
@@ -11,6 +15,7 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder # Yangi InlineKeyboardB
 from dotenv import load_dotenv
 from io import BytesIO
 from aiogram.enums import ChatMemberStatus
+from bot_broadcast import BroadcastEngine
 
 load_dotenv(override=True) # .env faylidagi o'zgaruvchilarni yuklash
 
@@ -21,11 +26,27 @@ logger = logging.getLogger(__name__)
 
 API_TOKEN = os.getenv("BOT_TOKEN")
 DJANGO_API_BASE_URL = os.getenv("DJANGO_API_URL", "http://127.0.0.1:8000/api/tg") 
+BOT_API_KEY = os.getenv("BOT_API_KEY", "") # Django dagi BOT_API_KEY bilan bir xil (tarqatish va eksport API lari uchun)
 WEBAPP_BASE_URL = os.getenv("WEBAPP_BASE_URL", "http://127.0.0.1:8000") 
 CHANNELS_URL = os.getenv("CHANNELS_URL", "https://t.me/addlist/K4iMXLXFYLQzYzEy") 
 TARGET_CHANNEL_ID = -1002514048287
 CHANNELS_ENV = os.getenv("REQUIRED_CHANNELS", "")
 TELEGRAM_ADMIN_IDS = [393247779, 681961023]  # O'zingizning admin IDlaringizni qo'shing (agar .env dan olmasangiz)
+DJANGO_API_TIMEOUT = float(os.getenv("DJANGO_API_TIMEOUT", "10"))
+DJANGO_API_MAX_CONNECTIONS = int(os.getenv("DJANGO_API_MAX_CONNECTIONS", "50"))
+DJANGO_API_RETRIES = int(os.getenv("DJANGO_API_RETRIES", "3")) # Ulanish xatosi / 502-504 da qayta urinishlar soni
+MEMBERSHIP_CACHE_TTL = float(os.getenv("MEMBERSHIP_CACHE_TTL", "600")) # Kanal a'zoligi (ijobiy) natijasi keshda turadigan vaqt, sekund
+MEMBERSHIP_NEGATIVE_CACHE_TTL = float(os.getenv("MEMBERSHIP_NEGATIVE_CACHE_TTL", "5")) # "A'zo emas" natijasi uchun
+USER_PROFILE_CACHE_TTL = float(os.getenv("USER_PROFILE_CACHE_TTL", "3600")) # Foydalanuvchi profili (til, telefon) botda saqlanadigan vaqt
+USER_PROFILE_CACHE_SIZE = int(os.getenv("USER_PROFILE_CACHE_SIZE", "50000"))
+TELEGRAM_IDS_PAGE_SIZE = int(os.getenv("TELEGRAM_IDS_PAGE_SIZE", "5000")) # Foydalanuvchi IDlari API dan shu hajmdagi sahifalarda olinadi
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "30")) # Telegram ommaviy yuborish limiti (xabar/sekund)
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "20"))
+BROADCAST_RESULTS_BATCH_SIZE = int(os.getenv("BROADCAST_RESULTS_BATCH_SIZE", "500")) # Natijalar API ga shu hajmdagi paketlarda yoziladi
+BROADCAST_RESULTS_RETRIES = int(os.getenv("BROADCAST_RESULTS_RETRIES", "5")) # Paketni yozishda vaqtinchalik xatoda qayta urinishlar
+EXPORT_JOB_POLL_INTERVAL = float(os.getenv("EXPORT_JOB_POLL_INTERVAL", "3")) # Eksport vazifasi holatini so'rash oralig'i, sekund
+EXPORT_JOB_MAX_WAIT = float(os.getenv("EXPORT_JOB_MAX_WAIT", "1800"))
+EXPORT_DOWNLOAD_TIMEOUT = float(os.getenv("EXPORT_DOWNLOAD_TIMEOUT", "300"))
 
 
 REQUIRED_CHANNELS_LIST = []
@@ -46,117 +67,272 @@ if CHANNELS_ENV:
 # Bot va Dispatcher obyektlari
 bot = Bot(token=API_TOKEN)
 dp = Dispatcher()
+broadcast_engine = BroadcastEngine(rate=BROADCAST_RATE, concurrency=BROADCAST_CONCURRENCY)
+broadcast_lock = asyncio.Lock()
 
 # {"kaa": "", "ru": "","uz": ""}.get(lang_code, "")
 
+class TTLCache:
+    """Oddiy TTL + LRU kesh (bitta event loop ichida ishlatiladi, qulf shart emas)."""
+
+    def __init__(self, ttl: float, max_size: int = 100000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data = OrderedDict() # key -> (qiymat, amal qilish muddati)
+
+    def get(self, key, default=None):
+        item = self._data.get(key)
+        if item is None:
+            return default
+        value, expires_at = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: float = None):
+        self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        item = self._data.pop(key, None)
+        return default if item is None else item[0]
+
+
+# Kanal a'zoligi natijalari: (user_id, kanal) -> True/False. Ijobiy natija uzoqroq saqlanadi,
+# salbiysi esa "Tekseriw" tugmasini ketma-ket bosishda API ga qayta-qayta murojaat qilinmasligi uchun qisqa muddat
+membership_cache = TTLCache(ttl=MEMBERSHIP_CACHE_TTL)
+ACTIVE_MEMBER_STATUSES = [
+    ChatMemberStatus.MEMBER,
+    ChatMemberStatus.ADMINISTRATOR,
+    ChatMemberStatus.CREATOR,
+    # ChatMemberStatus.RESTRICTED # Agar restricted ham a'zo hisoblansa, qo'shing
+]
+
+
+async def check_channel_membership(user_id: int, channel_id_or_username) -> bool:
+    """Bitta kanalga a'zolikni tekshiradi (keshdan yoki Telegram API dan)."""
+    cache_key = (user_id, channel_id_or_username)
+    cached = membership_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        member = await bot.get_chat_member(chat_id=channel_id_or_username, user_id=user_id)
+    except Exception as e:
+        # Bu xatoliklar Telegram API tomonidan qaytarilishi mumkin:
+        # - ChatNotFound: Agar kanal ID/username noto'g'ri bo'lsa.
+        # - BotKicked / BotIsNotAMember: Agar bot kanalda bo'lmasa yoki huquqi yetmasa.
+        # A'zolikni tasdiqlay olmasak ham foydalanuvchini to'xtatmaymiz (avvalgi xatti-harakat), keshlanmaydi.
+        logger.warning(f"Kanalga ({channel_id_or_username}) a'zolikni tekshirishda xatolik (user: {user_id}): {e}")
+        return True
+
+    is_member = member.status in ACTIVE_MEMBER_STATUSES
+    if is_member:
+        logger.debug(f"Foydalanuvchi {user_id} kanalga ({channel_id_or_username}) a'zo. Status: {member.status}")
+        membership_cache.set(cache_key, True)
+    else:
+        logger.info(f"Foydalanuvchi {user_id} kanalga ({channel_id_or_username}) a'zo emas. Status: {member.status}")
+        membership_cache.set(cache_key, False, ttl=MEMBERSHIP_NEGATIVE_CACHE_TTL)
+    return is_member
+
+
 async def check_all_channel_memberships(user_id: int) -> bool:
     """
-    Foydalanuvchining berilgan barcha kanallarga a'zoligini tekshiradi.
-
-    Args:
-        bot_instance: Aiogram Bot obyekti.
-        user_id: Tekshirilayotgan foydalanuvchining Telegram ID si.
-        channel_ids_list: Tekshiriladigan kanallarning ID (int) yoki @username (str) ro'yxati.
+    Foydalanuvchining REQUIRED_CHANNELS_LIST dagi barcha kanallarga a'zoligini tekshiradi.
+    Kanallar parallel tekshiriladi, natijalar membership_cache da saqlanadi.
 
     Returns:
         bool: Agar foydalanuvchi barcha kanallarga a'zo bo'lsa True, aks holda False.
     """
-    bot_instance = bot
-    channel_ids_list = REQUIRED_CHANNELS_LIST # Global o'zgaruvchini olish
-    if not channel_ids_list: # Agar tekshiriladigan kanal bo'lmasa
+    if not REQUIRED_CHANNELS_LIST: # Agar tekshiriladigan kanal bo'lmasa
         return True # Barcha (bo'sh) shartlar bajarildi deb hisoblash
 
-    all_subscribed = True
-    for channel_id_or_username in channel_ids_list:
-        print(channel_id_or_username)
-        try:
-            # Agar bot_instance shu funksiya ichida global bo'lmasa, uni parametr orqali olish kerak.
-            # Men bot_instance ni parametr sifatida qo'shdim.
-            member = await bot_instance.get_chat_member(chat_id=channel_id_or_username, user_id=user_id)
-            
-            # Foydalanuvchi statusi 'member', 'administrator' yoki 'creator' bo'lishi kerak.
-            # 'left' (chiqib ketgan) yoki 'kicked' (chetlatilgan) bo'lmasligi kerak.
-            # 'restricted' statusi ham a'zo emas deb hisoblanishi mumkin (agar shunday xohlasangiz).
-            if member.status not in [
-                ChatMemberStatus.MEMBER,
-                ChatMemberStatus.ADMINISTRATOR,
-                ChatMemberStatus.CREATOR,
-                # types.ChatMemberStatus.RESTRICTED # Agar restricted ham a'zo hisoblansa, qo'shing
-            ]:
-                all_subscribed = False
-                logger.info(f"Foydalanuvchi {user_id} kanalga ({channel_id_or_username}) a'zo emas. Status: {member.status}")
-                break # Bitta kanalga a'zo bo'lmasa, qolganini tekshirish shart emas
-            else:
-                logger.debug(f"Foydalanuvchi {user_id} kanalga ({channel_id_or_username}) a'zo. Status: {member.status}")
-
-        except Exception as e:
-            # Bu xatoliklar Telegram API tomonidan qaytarilishi mumkin:
-            # - ChatNotFound: Agar kanal ID/username noto'g'ri bo'lsa.
-            # - UserNotFound: Agar user_id noto'g'ri bo'lsa (bu kamdan-kam uchraydi, chunki user_id odatda message.from_user.id dan olinadi).
-            # - BotKicked: Agar bot kanaldan chiqarib yuborilgan bo'lsa.
-            # - BotIsNotAMember: Agar bot kanalga a'zo bo'lmasa va kanal public bo'lmasa (yoki maxsus huquqlar kerak bo'lsa).
-            logger.warning(f"Kanalga ({channel_id_or_username}) a'zolikni tekshirishda xatolik (user: {user_id}): {e}")
-            # Xatolik yuzaga kelganda, foydalanuvchi a'zo emas deb hisoblaymiz,
-            # chunki a'zolikni tasdiqlay olmadik.
-            # all_subscribed = True
-            # break # Xatolik bo'lsa, davom etmaymiz
-
-    return all_subscribed
+    results = await asyncio.gather(*(
+        check_channel_membership(user_id, channel_id_or_username) for channel_id_or_username in REQUIRED_CHANNELS_LIST
+    ))
+    return all(results)
 
 
-
-async def get_all_user_ids_from_api():
-    """Django API orqali barcha foydalanuvchi Telegram IDlarini oladi."""
-    base_url = DJANGO_API_BASE_URL.replace("/tg", "")  # /tg ni olib tashlash, agar kerak bo'lsa
-    DJANGO_API_URL_FOR_IDS = f"{base_url}/get-all-user-tg-ids/"  # API endpointini to'g'rilang
-
-    async with httpx.AsyncClient(timeout=30.0) as client:
+class DjangoAPIClient:
+    """
+    Django API uchun bot jarayoni davomida yashaydigan yagona HTTP klient:
+    ulanishlar pool qilinadi (keep-alive), vaqtinchalik xatolarda backoff bilan qayta urinadi
+    va har bir endpoint bo'yicha kechikish (latency) statistikasini yig'adi.
+    """
+    RETRY_STATUS_CODES = {502, 503, 504}
+    LATENCY_SAMPLES = 500 # Har bir endpoint uchun saqlanadigan oxirgi o'lchovlar soni
+
+    def __init__(self, base_url, timeout, max_connections, retries, backoff=0.3, api_key=""):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.retries = retries
+        self.backoff = backoff
+        self._client = None
+        self._latencies = defaultdict(lambda: deque(maxlen=self.LATENCY_SAMPLES))
+        self._counts = defaultdict(lambda: {"requests": 0, "errors": 0, "retries": 0})
+
+    def _get_client(self):
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                headers={"X-Bot-Api-Key": self.api_key} if self.api_key else None,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stream(self, method, url, **kwargs):
+        """Katta javoblar (eksport fayllari) uchun: javob tanasi bo'laklab o'qiladi, qayta urinish yo'q."""
+        return self._get_client().stream(method, url, **kwargs)
+
+    @staticmethod
+    def _metric_name(method, url):
+        # users/393247779/set-language/ -> users/{id}/set-language/ (har bir foydalanuvchi alohida endpoint bo'lmasligi uchun)
+        path = re.sub(r"/\d+(?=/|$)", "/{id}", httpx.URL(url).path)
+        return f"{method} {path}"
+
+    async def request(self, method, url, **kwargs):
+        """
+        So'rov yuboradi va httpx.Response qaytaradi. Ulanish xatolari va 502/503/504 javoblarida
+        eksponensial backoff bilan qayta urinadi (botdagi barcha endpointlar idempotent).
+        """
+        metric = self._metric_name(method, url)
+        counts = self._counts[metric]
+        counts["requests"] += 1
+        started = time.perf_counter()
         try:
-            response = await client.get(DJANGO_API_URL_FOR_IDS)
-            response.raise_for_status()
-            data = response.json()
-            if data.get("success") and "telegram_ids" in data:
-                return data["telegram_ids"]
-            else:
-                logger.error(f"API dan IDlarni olishda xatolik: {data.get('error', 'Nomalum javob')}")
-                return []
-        except httpx.HTTPStatusError as e:
-            logger.error(f"API ga IDlar uchun murojaatda HTTP xatosi: {e.response.status_code} - {e.response.text}")
-            return []
-        except Exception as e:
-            logger.error(f"API dan IDlarni olishda kutilmagan xato: {e}", exc_info=True)
-            return []
+            for attempt in range(self.retries + 1):
+                try:
+                    response = await self._get_client().request(method, url, **kwargs)
+                    if response.status_code not in self.RETRY_STATUS_CODES or attempt == self.retries:
+                        return response
+                    logger.warning(f"{metric}: server {response.status_code} qaytardi, qayta urinish ({attempt + 1}/{self.retries})")
+                except (httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout, httpx.RemoteProtocolError) as e:
+                    if attempt == self.retries:
+                        raise
+                    logger.warning(f"{metric}: ulanish xatosi ({e}), qayta urinish ({attempt + 1}/{self.retries})")
+                counts["retries"] += 1
+                await asyncio.sleep(self.backoff * (2 ** attempt))
+        except Exception:
+            counts["errors"] += 1
+            raise
+        finally:
+            self._latencies[metric].append((time.perf_counter() - started) * 1000)
+
+    def stats(self):
+        """Har bir endpoint uchun: so'rovlar, xatolar, qayta urinishlar, p50/p95/max (ms)."""
+        result = {}
+        for metric, samples in self._latencies.items():
+            ordered = sorted(samples)
+            result[metric] = {
+                **self._counts[metric],
+                "p50_ms": round(ordered[len(ordered) // 2], 1),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+                "max_ms": round(ordered[-1], 1),
+            }
+        return result
+
+
+api_client = DjangoAPIClient(DJANGO_API_BASE_URL, DJANGO_API_TIMEOUT, DJANGO_API_MAX_CONNECTIONS, DJANGO_API_RETRIES, api_key=BOT_API_KEY)
+
+
+async def iter_telegram_ids(url: str, meta: dict = None, page_size: int = TELEGRAM_IDS_PAGE_SIZE):
+    """
+    Django API dagi keyset-sahifalangan (?after=&limit=) telegram_id ro'yxatini o'qiydigan async generator.
+    Keyingi sahifa joriy sahifa ishlatilayotgan paytda oldindan yuklanadi; xotirada ko'pi bilan ikki sahifa turadi.
+    meta berilsa, birinchi sahifadagi "total" unga yoziladi.
+    """
+    async def fetch(after):
+        params = {"limit": page_size}
+        if after is not None:
+            params["after"] = after
+        response = await api_client.request("GET", url, params=params, timeout=30.0)
+        response.raise_for_status()
+        data = response.json()
+        if not data.get("success"):
+            raise RuntimeError(f"API dan IDlarni olishda xatolik: {data.get('error', 'Nomalum javob')}")
+        return data
+
+    next_page = asyncio.create_task(fetch(None))
+    try:
+        while next_page is not None:
+            data = await next_page
+            if meta is not None and "total" in data:
+                meta["total"] = data["total"]
+            cursor = data.get("next_cursor")
+            next_page = asyncio.create_task(fetch(cursor)) if cursor is not None else None
+            for telegram_id in data["telegram_ids"]:
+                yield telegram_id
+    finally:
+        if next_page is not None:
+            next_page.cancel()
 
 
 # --- API bilan ishlash uchun yordamchi funksiyalar ---
 async def api_request(method: str, endpoint: str, data: dict = None, params: dict = None):
     url = f"{DJANGO_API_BASE_URL}/{endpoint}"
-    async with httpx.AsyncClient() as client:
-        try:
-            if method.upper() == "GET":
-                response = await client.get(url, params=params)
-            elif method.upper() == "POST":
-                response = await client.post(url, json=data, params=params)
-            elif method.upper() == "PUT":
-                response = await client.put(url, json=data, params=params)
-            else:
-                logger.error(f"Unsupported HTTP method: {method}")
-                return None
-
-            response.raise_for_status() # Agar 4xx yoki 5xx status kodi bo'lsa xatolik chiqaradi
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            logger.error(f"API request failed to {url} with status {e.response.status_code}: {e.response.text}")
-            return {"error": e.response.json() if e.response.content else str(e), "status_code": e.response.status_code}
-        except httpx.RequestError as e:
-            logger.error(f"API request failed to {url}: {str(e)}")
-            return {"error": str(e), "status_code": None}
-        except Exception as e:
-            logger.error(f"An unexpected error occurred during API request to {url}: {str(e)}")
-            return {"error": str(e), "status_code": None}
+    if method.upper() not in ("GET", "POST", "PUT"):
+        logger.error(f"Unsupported HTTP method: {method}")
+        return None
+    try:
+        response = await api_client.request(method.upper(), url, json=data if method.upper() != "GET" else None, params=params)
+        response.raise_for_status() # Agar 4xx yoki 5xx status kodi bo'lsa xatolik chiqaradi
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        logger.error(f"API request failed to {url} with status {e.response.status_code}: {e.response.text}")
+        return {"error": e.response.json() if e.response.content else str(e), "status_code": e.response.status_code}
+    except httpx.RequestError as e:
+        logger.error(f"API request failed to {url}: {str(e)}")
+        return {"error": str(e), "status_code": None}
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during API request to {url}: {str(e)}")
+        return {"error": str(e), "status_code": None}
 
 
 # --- Keyboardlar ---
+# Foydalanuvchi profillari: telegram_id -> {"language_code": ..., "phone_number": ..., ...}
+# users/register/, set-language/ va set-phone/ javoblaridan to'ldiriladi, shuning uchun handlerlar
+# tilni bilish uchun har safar GET users/{id}/ qilmaydi
+user_profile_cache = TTLCache(ttl=USER_PROFILE_CACHE_TTL, max_size=USER_PROFILE_CACHE_SIZE)
+
+
+def remember_user_profile(user_id: int, data: dict):
+    """API javobidagi profil maydonlarini keshdagi yozuv bilan birlashtiradi."""
+    fields = {key: data[key] for key in ("full_name", "username", "phone_number", "language_code") if key in data}
+    if not fields:
+        return
+    profile = dict(user_profile_cache.get(user_id) or {})
+    profile.update(fields)
+    user_profile_cache.set(user_id, profile)
+
+
+async def get_user_profile(user_id: int):
+    """Profilni keshdan oladi, bo'lmasa API dan (GET users/{id}/) yuklab keshlaydi. Topilmasa None."""
+    profile = user_profile_cache.get(user_id)
+    if profile is not None:
+        return profile
+    user_data = await api_request("GET", f"users/{user_id}/")
+    if not user_data or "error" in user_data:
+        return None
+    remember_user_profile(user_id, user_data)
+    return user_profile_cache.get(user_id)
+
+
+async def get_user_language(user_id: int, default: str = "uz") -> str:
+    profile = await get_user_profile(user_id)
+    return (profile or {}).get("language_code") or default
+
+
 def language_keyboard():
     builder = InlineKeyboardBuilder()
     builder.button(text="Qaraqalpaqsha", callback_data="setlang_kaa")
@@ -202,6 +378,7 @@ async def send_welcome(message: Message):
     api_response = await api_request("POST", "users/register/", data={"telegram_id": user_id, "username": username})
 
     if api_response and "error" not in api_response:
+        remember_user_profile(user_id, api_response.get("user") or {})
         await message.answer(
             "🗺️ Ózińizge qolaylı tildi saylań \n🗺️ Выберите удобный для вас язык \n🗺️ O'zingiz uchun qulayli tilni tanlang",
             reply_markup=language_keyboard()
@@ -214,54 +391,102 @@ async def send_welcome(message: Message):
 
 
 
+async def wait_and_send_export(job_id: int, chat_id: int, load_msg: Message = None):
+    """Eksport vazifasi tayyor bo'lguncha holatini so'rab turadi, so'ng faylni adminga yuboradi."""
+    deadline = time.monotonic() + EXPORT_JOB_MAX_WAIT
+    job = None
+    while time.monotonic() < deadline:
+        await asyncio.sleep(EXPORT_JOB_POLL_INTERVAL)
+        api_response = await api_request("GET", f"export-jobs/{job_id}/")
+        if not api_response or "error" in api_response:
+            logger.warning(f"Eksport #{job_id} holatini olishda xatolik: {api_response}")
+            continue
+        job = api_response["job"]
+        if job["status"] in ("done", "failed"):
+            break
+
+    try:
+        if job is None or job["status"] not in ("done", "failed"):
+            await bot.send_message(chat_id, f"Eksport #{job_id} belgilengen waqıtta tayar bolmadı. Keyinirek admin paneldan kóriń.")
+            return
+        if job["status"] == "failed":
+            await bot.send_message(chat_id, f"Eksport #{job_id} qátelik penen tamamlandı:\n{job['error']}")
+            return
+
+        # Fayl diskka bo'laklab yuklab olinadi (butun fayl xotirada saqlanmaydi)
+        with tempfile.NamedTemporaryFile(suffix=f".{job['file_format']}") as tmp:
+            file_url = f"{DJANGO_API_BASE_URL}/export-jobs/{job_id}/file/"
+            async with api_client.stream("GET", file_url, timeout=EXPORT_DOWNLOAD_TIMEOUT) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes():
+                    tmp.write(chunk)
+            tmp.flush()
+            await bot.send_document(
+                chat_id,
+                types.FSInputFile(tmp.name, filename=job["file_name"] or f"test_results.{job['file_format']}"),
+                caption=f"Barlıq test nátiyjeleri ({job['rows_count']} qatar).",
+            )
+        logger.info(f"Eksport #{job_id} adminga ({chat_id}) yuborildi.")
+    except Exception as e:
+        logger.error(f"Eksport #{job_id} faylini yuborishda xatolik: {e}", exc_info=True)
+        await bot.send_message(chat_id, f"Eksport faylın jiberiwde qátelik: {e}")
+    finally:
+        if load_msg is not None:
+            try:
+                await load_msg.delete() # Yuklash xabarini o'chirish
+            except Exception:
+                pass
+
+
 @dp.message(Command("export_data"))
 async def export_all_data_command(message: types.Message):
     if message.from_user.id not in TELEGRAM_ADMIN_IDS: # Agar IsAdmin filtrini ishlatmasangiz
         return
 
-    load_msg = await message.reply("Maǵlıwmatlar Excel faylına tayarlanbaqta...")
+    # /export_data [xlsx|csv|parquet] [date_from=YYYY-MM-DD] [date_to=...] [institution=ID] [min_score=N] [max_score=N]
+    file_format = "xlsx"
+    filters = {}
+    for arg in (message.text or "").split()[1:]:
+        key, sep, value = arg.partition("=")
+        if sep:
+            filters[key] = value
+        else:
+            file_format = arg.lower()
+
+    # Fayl Django tomonida fon vazifasi sifatida tayyorlanadi; bot faqat vazifa ID sini oladi
+    api_response = await api_request("POST", "export-jobs/", data={
+        "requested_by": message.from_user.id,
+        "file_format": file_format,
+        "filters": filters,
+    })
+    if not api_response or "error" in api_response:
+        error = api_response.get("error") if api_response else None
+        if isinstance(error, dict): # API ning o'z xato xabari {"error": {"error": "..."}} ko'rinishida keladi
+            error = error.get("error", error)
+        await message.reply(f"Eksportti baslawda qátelik: {error}")
+        logger.error(f"Failed to create export job: {api_response}")
+        return
 
-    # API endpointiga so'rov yuborish
-    # API_EXPORT_URL = f"{os.getenv('DJANGO_BASE_URL', 'http://127.0.0.1:8000')}/api/export-all-tests/"
-    # Agar DJANGO_API_BASE_URL da /api/tg/ bo'lsa, undan /tg/ ni olib tashlash kerak
-    # Yoki yangi DJANGO_CORE_API_URL yaratish
-    base_django_url = DJANGO_API_BASE_URL.replace("/tg", "") # Taxminiy
-    api_export_url = f"{base_django_url}/export-all-tests/" # CONFIG/urls.py dagi yo'lga moslang
+    job_id = api_response["job"]["id"]
+    load_msg = await message.reply(f"Maǵlıwmatlar faylǵa tayarlanbaqta (eksport #{job_id})... Tayar bolǵanda jiberiledi.")
+    asyncio.create_task(wait_and_send_export(job_id, message.chat.id, load_msg))
 
-    # Agar API himoyalangan bo'lsa, token yoki boshqa parametr qo'shish kerak
-    # params = {"secret_key": "SIZNING_MAXFIY_KALITINGIZ"} # Misol uchun
 
-    async with httpx.AsyncClient(timeout=60.0) as client: # Kattaroq timeout
-        try:
-            # response = await client.get(api_export_url, params=params)
-            response = await client.get(api_export_url) # Hozircha himoyasiz
-            response.raise_for_status()
-
-            # Faylni Telegramga yuborish
-            file_bytes = BytesIO(response.content)
-            file_name = response.headers.get(
-                "Content-Disposition", "attachment; filename=test_results.xlsx"
-            ).split("filename=")[1].strip('"') or "test_results.xlsx"
-            
-            input_file = types.BufferedInputFile(file_bytes.getvalue(), filename=file_name)
-            await message.reply_document(input_file, caption="Barlıq test nátiyjeleri.")
-            await load_msg.delete() # Yuklash xabarini o'chirish
-
-        except httpx.HTTPStatusError as e:
-            error_text = e.response.text
-            try:
-                error_json = e.response.json()
-                error_text = error_json.get("error", error_json.get("detail", str(error_json)))
-            except:
-                pass
-            await message.reply(f"Excel faylın alıwda qátelik júz berdi (Server qátesi {e.response.status_code}):\n{error_text}")
-            logger.error(f"Failed to get Excel export from API: {e.response.status_code} - {e.response.text}")
-        except httpx.RequestError as e:
-            await message.reply(f"Excel faylın alıwda jalǵanıwda qátelik: {e}")
-            logger.error(f"Failed to connect for Excel export: {e}")
-        except Exception as e:
-            await message.reply(f"Excel faylın alıwda kútilmegen qátelik: {e}")
-            logger.error(f"Unexpected error during Excel export: {e}", exc_info=True)
+@dp.message(Command("api_stats"))
+async def api_stats_command(message: types.Message):
+    """Django API so'rovlari bo'yicha kechikish statistikasi (faqat adminlar uchun)."""
+    if message.from_user.id not in TELEGRAM_ADMIN_IDS:
+        return
+
+    stats = api_client.stats()
+    if not stats:
+        await message.reply("Házirshe API sorawları joq.")
+        return
+    lines = [
+        f"{metric}\n  {s['requests']} soraw, {s['errors']} qáte, {s['retries']} qayta | p50 {s['p50_ms']} ms, p95 {s['p95_ms']} ms, max {s['max_ms']} ms"
+        for metric, s in sorted(stats.items())
+    ]
+    await message.reply("\n".join(lines))
 
 
 @dp.callback_query(F.data.startswith("setlang_"))
@@ -272,6 +497,7 @@ async def process_language_select(callback_query: types.CallbackQuery):
     api_response = await api_request("POST", f"users/{user_id}/set-language/", data={"language_code": lang_code})
 
     if api_response and "error" not in api_response:
+        remember_user_profile(user_id, {"language_code": api_response.get("language_code") or lang_code})
         if not await check_all_channel_memberships(user_id):
             await callback_query.message.edit_text(
                 {"kaa": "Telegram bottan paydalanıp arnawlı sertifikattı alıw ushın tómendegi kanallarǵa aǵza bolıń 👇👇👇", 
@@ -301,8 +527,7 @@ async def process_language_select(callback_query: types.CallbackQuery):
 async def process_channels_check(callback_query: types.CallbackQuery):
     user_id = callback_query.from_user.id
     # Foydalanuvchidan tilni olamiz (agar saqlangan bo'lsa)
-    user_api_response = await api_request("GET", f"users/{user_id}/") # O'zgaruvchi nomini aniqroq qildim
-    lang_code = user_api_response.get("language_code", "uz") if user_api_response and "error" not in user_api_response else "uz" # API javobini tekshirish
+    lang_code = await get_user_language(user_id) # Keshdan; bo'lmasa API dan
 
     if not await check_all_channel_memberships(user_id):
         await callback_query.answer(
@@ -340,8 +565,10 @@ async def process_contact(message: Message):
 
     api_response = await api_request("POST", f"users/{user_id}/set-phone/", data={"phone_number": phone_number})
 
-    user_data = await api_request("GET", f"users/{user_id}/") # Tilni olish uchun
-    lang_code = user_data.get("language_code", "uz") if user_data and "error" not in user_data else "uz"
+    # set-phone javobida til ham qaytadi; eski API versiyasi bo'lsa til keshdan (yoki API dan) olinadi
+    if api_response and "error" not in api_response:
+        remember_user_profile(user_id, api_response)
+    lang_code = await get_user_language(user_id)
 
     if api_response and "error" not in api_response:        
         msg = await message.answer(
@@ -374,6 +601,145 @@ async def process_contact(message: Message):
 
 
 
+@dp.chat_member() # Bot kanal admini bo'lsa, a'zolik o'zgarishlari shu yerga keladi
+async def handle_chat_member_update(update: types.ChatMemberUpdated):
+    """Foydalanuvchi kanalga qo'shilsa/chiqsa, a'zolik keshini darhol yangilaydi."""
+    user_id = update.new_chat_member.user.id
+    is_member = update.new_chat_member.status in ACTIVE_MEMBER_STATUSES
+    channel_keys = [update.chat.id]
+    if update.chat.username:
+        channel_keys.append(f"@{update.chat.username}")
+    for channel_key in channel_keys:
+        if channel_key in REQUIRED_CHANNELS_LIST:
+            membership_cache.set((user_id, channel_key), is_member, ttl=None if is_member else MEMBERSHIP_NEGATIVE_CACHE_TTL)
+    logger.debug(f"A'zolik yangilandi: user {user_id}, kanal {update.chat.id}, status {update.new_chat_member.status}")
+
+
+def broadcast_progress_text(sent, blocked, failed, done=None, total=None):
+    # done berilmasa - yakuniy hisobot
+    text = f"⏳ Xabar uzatılmaqta: {done}/{total}\n✅ {sent}" if done is not None else f"✅ Xabar {sent} paydalanıwshıǵa jetkerildi."
+    if blocked:
+        text += f"\n🚫 {blocked} paydalanıwshı bottı bloklaǵan."
+    if failed > 0:
+        text += f"\n❌ {failed} paydalanıwshıǵa jetkeriwde qátelik júz berdi."
+    return text
+
+
+class BroadcastResultWriter:
+    """Yuborish natijalarini yig'ib, Django API ga paketlab yozadi (har bir xabar uchun alohida so'rov emas)."""
+
+    def __init__(self, broadcast_id, batch_size=BROADCAST_RESULTS_BATCH_SIZE, retries=BROADCAST_RESULTS_RETRIES):
+        self.broadcast_id = broadcast_id
+        self.batch_size = batch_size
+        self.retries = retries
+        self.lost_results = 0 # Qayta urinishdan foyda bo'lmagan (4xx) paketlardagi natijalar
+        self._buffer = []
+        self._lock = asyncio.Lock()
+
+    async def add(self, chat_id, status, error):
+        self._buffer.append({"telegram_id": chat_id, "status": status, "error": error})
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+
+    async def _save_batch(self, batch):
+        """Paketni yozadi; vaqtinchalik xatolarda (tarmoq, 5xx) kutib qayta urinadi. Yozilsa True qaytaradi."""
+        for attempt in range(self.retries + 1):
+            api_response = await api_request("POST", f"broadcasts/{self.broadcast_id}/results/", data={"results": batch})
+            if api_response and "error" not in api_response:
+                return True
+            status_code = (api_response or {}).get("status_code")
+            if status_code is not None and status_code < 500:
+                # 4xx - paketni qayta yuborishdan foyda yo'q
+                logger.error(f"Tarqatish {self.broadcast_id} natijalari rad etildi ({len(batch)} ta): {api_response}")
+                self.lost_results += len(batch)
+                return True
+            if attempt < self.retries:
+                await asyncio.sleep(2 ** attempt)
+        logger.error(f"Tarqatish {self.broadcast_id} natijalarini {self.retries + 1} urinishda ham saqlab bo'lmadi: {api_response}")
+        return False
+
+    async def flush(self):
+        """Buferdagi natijalarni yozadi. Hammasi saqlangan bo'lsa True; saqlanmaganlari buferda qoladi."""
+        async with self._lock:
+            while self._buffer:
+                batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+                try:
+                    saved = await self._save_batch(batch)
+                except asyncio.CancelledError:
+                    self._buffer[:0] = batch # Bekor qilinsa, paket yo'qolmasin
+                    raise
+                if not saved:
+                    self._buffer[:0] = batch # Keyingi flush da qayta urinib ko'riladi
+                    return False
+            return self.lost_results == 0
+
+
+async def run_channel_broadcast(broadcast: dict):
+    """
+    Tarqatishni (Django dagi Broadcast yozuvi) bajaradi: faqat hali yetkazilmagan foydalanuvchilarga
+    yuboradi, natijalarni paketlab saqlaydi va oxirida yakunlaydi. Qayta ishga tushganda ham shu funksiya chaqiriladi.
+    """
+    async with broadcast_lock: # Bir vaqtda faqat bitta tarqatish (limitlar umumiy)
+        broadcast_id = broadcast["id"]
+        progress_message_id = broadcast.get("progress_message_id")
+
+        async def edit_progress(text):
+            if not progress_message_id:
+                return
+            try:
+                await bot.edit_message_text(text=text, chat_id=broadcast["source_chat_id"], message_id=progress_message_id)
+            except Exception as e_edit:
+                logger.debug(f"Progress xabarini tahrirlab bo'lmadi: {e_edit}")
+
+        # Qabul qiluvchilar sahifalab olinadi: yuborish birinchi sahifa kelishi bilan boshlanadi
+        recipients_meta = {}
+        recipients = iter_telegram_ids(f"{DJANGO_API_BASE_URL}/broadcasts/{broadcast_id}/recipients/", meta=recipients_meta)
+
+        reply_markup = InlineKeyboardMarkup.model_validate(broadcast["reply_markup"]) if broadcast.get("reply_markup") else None
+
+        async def send(chat_id):
+            # Asl xabarni nusxalash (forward o'rniga, "forwarded from" yozuvi bo'lmasligi uchun)
+            await bot.copy_message(
+                chat_id=chat_id,
+                from_chat_id=broadcast["source_chat_id"],
+                message_id=broadcast["message_id"],
+                reply_markup=reply_markup # Agar asl xabarda inline tugmalar bo'lsa
+            )
+
+        writer = BroadcastResultWriter(broadcast_id)
+
+        async def on_progress(state):
+            await writer.flush()
+            processed = state["sent"] + state["blocked"] + state["failed"]
+            remaining = recipients_meta.get("total", processed) # Shu ishga tushirishdagi qabul qiluvchilar
+            total = max(broadcast.get("total_recipients") or 0, remaining)
+            done = total - remaining + processed # Oldingi (to'xtab qolgan) urinishda yetkazilganlar ham hisobga olinadi
+            await edit_progress(broadcast_progress_text(state["sent"], state["blocked"], state["failed"], done, total))
+
+        try:
+            state = await broadcast_engine.run(recipients, send, on_progress=on_progress, on_result=writer.add)
+        except Exception as e:
+            # Tarqatish 'running' holatida qoladi va keyingi ishga tushirishda davom ettiriladi
+            logger.error(f"Tarqatish {broadcast_id} to'xtadi: {e}", exc_info=True)
+            await writer.flush()
+            return
+        if not await writer.flush():
+            # Hisoblar noto'g'ri bo'lib qolmasligi uchun yakunlanmaydi: tarqatish 'running' holatida qoladi va
+            # keyingi ishga tushirishda natijasi yozilmagan qabul qiluvchilar bilan davom ettiriladi
+            logger.error(f"Tarqatish {broadcast_id} natijalari to'liq saqlanmadi, tarqatish yakunlanmadi.")
+            await edit_progress(broadcast_progress_text(state["sent"], state["blocked"], state["failed"]))
+            return
+
+        finish_response = await api_request("POST", f"broadcasts/{broadcast_id}/finish/")
+        if finish_response and "error" not in finish_response:
+            final = finish_response["broadcast"]
+            await edit_progress(broadcast_progress_text(final["sent_count"], final["blocked_count"], final["failed_count"]))
+        else:
+            logger.error(f"Tarqatish {broadcast_id} ni yakunlashda xatolik: {finish_response}")
+            await edit_progress(broadcast_progress_text(state["sent"], state["blocked"], state["failed"]))
+        logger.info(f"Tarqatish {broadcast_id} yakunlandi: {state}")
+
+
 @dp.channel_post() # Barcha kanallardagi postlarni ushlaydi
 async def handle_channel_post(message: types.Message): # Funksiya nomini o'zgartirdim, "post" bilan chalkashmasligi uchun
     if message.chat.id == TARGET_CHANNEL_ID:
@@ -383,74 +749,30 @@ async def handle_channel_post(message: types.Message): # Funksiya nomini o'zgart
             loading_message = await message.reply('Xabar uzatılmaqta...') # reply() kanal postiga javob qaytaradi
         except Exception as e:
             logger.warning(f"Kanalga 'Xabar uzatilmaqta...' deb javob qaytarib bo'lmadi: {e}")
-            # Agar reply ishlamasa (masalan, botda kanalga yozish huquqi yo'q bo'lsa),
-            # adminlardan biriga xabar yuborish mumkin
-            # await bot.send_message(chat_id=TELEGRAM_ADMIN_IDS[0], text="Kanal postini tarqatish boshlandi...")
 
-
-        users_telegram_ids = await get_all_user_ids_from_api()
-
-        if not users_telegram_ids:
-            logger.warning("API dan foydalanuvchi IDlari olinmadi yoki ro'yxat bo'sh.")
+        api_response = await api_request("POST", "broadcasts/", data={
+            "source_chat_id": message.chat.id,
+            "message_id": message.message_id,
+            "progress_message_id": loading_message.message_id if loading_message else None,
+            "reply_markup": message.reply_markup.model_dump(exclude_none=True) if message.reply_markup else None,
+        })
+        if not api_response or "error" in api_response:
+            logger.error(f"Tarqatishni yaratib bo'lmadi: {api_response}")
             if loading_message:
-                await loading_message.edit_text('Paydalanıwshılar tabılmadı. Xabar jiberiw toxtatıldı.') # loading_message ni tahrirlash
-            else:
-                # Agar loading_message yuborilmagan bo'lsa, asl postga javob qaytarish
-                try:
-                    await message.reply('Paydalanıwshılar tabılmadı. Xabar jiberiw toxtatıldı.')
-                except Exception as e_reply:
-                     logger.error(f"Kanalga xatolik haqida javob qaytarib bo'lmadi: {e_reply}")
+                await loading_message.edit_text('Xabar jiberiwde qátelik júz berdi.')
             return
+        await run_channel_broadcast(api_response["broadcast"])
 
-        successful_sends = 0
-        failed_sends = 0
-        
-        # Asl xabarni nusxalash (forward o'rniga, "forwarded from" yozuvi bo'lmasligi uchun)
-        # send_copy har doim ham barcha turdagi xabarlar uchun ishlamasligi mumkin (masalan, poll)
-        # Agar muammo bo'lsa, message.forward() ni ishlatish mumkin.
-        for user_id in users_telegram_ids:
-            try:
-                # message.forward(chat_id=int(user_id)) # Forward qilish varianti
-                await bot.copy_message(
-                    chat_id=int(user_id),
-                    from_chat_id=message.chat.id,
-                    message_id=message.message_id,
-                    reply_markup=message.reply_markup # Agar asl xabarda inline tugmalar bo'lsa
-                )
-                successful_sends += 1
-                logger.info(f"Xabar {user_id} ga muvaffaqiyatli yuborildi.")
-                # Telegram API limitlariga duch kelmaslik uchun pauza
-                if successful_sends % 20 == 0: # Har 20 ta xabardan keyin
-                    await asyncio.sleep(0.5) # 1 sekund kutish
-            except Exception as e:
-                failed_sends += 1
-                logger.error(f"Xabarni {user_id} ga yuborishda xatolik: {e}")
-                # Bu yerda xatolik turlarini aniqroq ushlash mumkin (masalan, BotBlocked, UserDeactivated)
-                # if isinstance(e, aiogram.exceptions.TelegramForbiddenError): # Bot bloklangan
-                #     logger.warning(f"Foydalanuvchi {user_id} botni bloklagan.")
-                # elif isinstance(e, aiogram.exceptions.TelegramNotFound): # Chat topilmadi
-                #     logger.warning(f"Foydalanuvchi {user_id} uchun chat topilmadi.")
-
-        result_text = f"✅ Xabar {successful_sends} paydalanıwshıǵa jetkerildi."
-        if failed_sends > 0:
-            result_text += f"\n❌ {failed_sends} paydalanıwshıǵa jetkeriwde qátelik júz berdi."
-        
-        if loading_message:
-            try:
-                await loading_message.edit_text(text=result_text)
-            except Exception as e_edit:
-                 logger.error(f"loading_message ni tahrirlashda xatolik: {e_edit}")
-                 # Agar edit_text ishlamasa, yangi xabar yuborish
-                 try:
-                    await message.reply(text=result_text)
-                 except Exception as e_reply_final:
-                     logger.error(f"Kanalga yakuniy javob qaytarib bo'lmadi: {e_reply_final}")
-
-        elif message.chat.id == TARGET_CHANNEL_ID: # Agar loading_message bo'lmasa ham, kanaldan bo'lsa
-            try:
-                await message.reply(text=result_text)
-            except Exception as e_reply_final_alt:
-                logger.error(f"Kanalga yakuniy javob qaytarib bo'lmadi (alt): {e_reply_final_alt}")
+
+async def resume_unfinished_broadcasts():
+    """Bot qayta ishga tushganda yakunlanmay qolgan tarqatishlarni davom ettiradi."""
+    api_response = await api_request("GET", "broadcasts/")
+    if not api_response or "error" in api_response:
+        logger.error(f"Yakunlanmagan tarqatishlarni olib bo'lmadi: {api_response}")
+        return
+    for broadcast in api_response["broadcasts"]:
+        logger.info(f"Yakunlanmagan tarqatish {broadcast['id']} davom ettirilmoqda.")
+        await run_channel_broadcast(broadcast)
 
 
 
@@ -458,10 +780,17 @@ async def handle_channel_post(message: types.Message): # Funksiya nomini o'zgart
 
 async def main():
     logger.info("Bot ishga tushmoqda...")
+    if not BOT_API_KEY:
+        logger.warning("BOT_API_KEY sozlanmagan: Django ning tarqatish va eksport API lari botga 403 qaytaradi.")
     # Django ilovasi bilan birga ishlash uchun await dp.start_polling() ni
     # Django management command ichida ishlatish mumkin.
     # Yoki alohida jarayon sifatida.
-    await dp.start_polling(bot)
+    asyncio.create_task(resume_unfinished_broadcasts())
+    try:
+        # chat_member update lari standart holatda kelmaydi, shuning uchun ishlatilayotgan turlar aniq so'raladi
+        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+    finally:
+        await api_client.close()
 
 if __name__ == '__main__':
     asyncio.run(main())
\ No newline at end of file
@@ -1,17 +1,25 @@
 # core/admin.py
-from .models import User, EducationType, Institution, EducationLevel, Faculty, Subject, Question, Test
+from .models import User, EducationType, Institution, EducationLevel, Faculty, Subject, Question, Test, RenderedQuestionFile, TestAnswer, ResultDelivery, BulkUploadJob, QuestionBlob
 from django.utils.translation import gettext_lazy as _
-import pandas as pd
-from io import BytesIO
-from django.http import HttpResponse
+import tempfile
+from django.http import FileResponse
 from django.utils import timezone
 
 from django.contrib import admin, messages
-from django.shortcuts import render, redirect
-from django.urls import path
+from django.shortcuts import get_object_or_404, render, redirect
+from django.urls import path, reverse
+from django.utils.html import format_html
 from .forms import BulkUploadQuestionsForm # Yangi forma
-from .utils import split_docx_into_questions # Yangi util funksiya
-from django.core.files.base import ContentFile # Question modeliga saqlash uchun
+from .tasks import render_question_files, run_bulk_upload_job # Fon vazifalari
+from .workers import submit_on_commit
+from .exports import (
+    TEST_EXPORT_COLUMNS,
+    VOUCHER_SENT_COLUMN,
+    EXPORT_FORMATS,
+    export_filename,
+    filter_tests,
+    write_tests_export,
+)
 
 
 @admin.register(User)
@@ -94,13 +102,14 @@ class QuestionInline(admin.TabularInline): # Yoki StackedInline
 
 @admin.register(Question)
 class QuestionAdmin(admin.ModelAdmin):
-    list_display = ('id', 'subject', 'get_available_files_summary_admin', 'correct_answer', 'is_active', 'created_at')
-    list_filter = ('subject', 'is_active', 'correct_answer')
+    list_display = ('id', 'subject', 'get_available_files_summary_admin', 'correct_answer', 'is_active', 'render_status', 'created_at')
+    list_filter = ('subject', 'is_active', 'correct_answer', 'render_status')
     search_fields = ('subject__name_uz', 'id')
     autocomplete_fields = ['subject']
     # Endi bitta fayl o'rniga uchtasi bor
-    fields = ('subject', 'correct_answer', 'is_active', 'question_file_uz', 'question_file_kaa', 'question_file_ru')
-    # readonly_fields = ('get_question_preview_admin',) # Buni ham har bir til uchun alohida qilish kerak bo'ladi
+    fields = ('subject', 'correct_answer', 'is_active', 'question_file_uz', 'question_file_kaa', 'question_file_ru', 'render_status', 'rendered_at', 'render_error')
+    readonly_fields = ('render_status', 'rendered_at', 'render_error') # Fon render pipeline holati
+    actions = ['rerender_selected_questions']
 
     def get_available_files_summary_admin(self, obj):
         langs = []
@@ -110,6 +119,19 @@ class QuestionAdmin(admin.ModelAdmin):
         return ", ".join(langs) if langs else _("Fayl yo'q")
     get_available_files_summary_admin.short_description = _("Mavjud Tillar")
 
+    @admin.action(description=_("Tanlangan savollarni qayta render qilish"))
+    def rerender_selected_questions(self, request, queryset):
+        question_ids = list(queryset.values_list('id', flat=True))
+        content_hashes = {
+            h for row in queryset.values_list('file_hash_uz', 'file_hash_kaa', 'file_hash_ru') for h in row if h
+        }
+        # Eski HTML keshini o'chiramiz, aks holda render vazifasi uni qayta ishlatadi
+        RenderedQuestionFile.objects.filter(content_hash__in=content_hashes).delete()
+        queryset.update(render_status=Question.RENDER_PENDING, render_error='')
+        for question_id in question_ids:
+            submit_on_commit(render_question_files, question_id)
+        self.message_user(request, _("{} ta savol render navbatiga qo'yildi.").format(len(question_ids)), level=messages.INFO)
+
     
     def get_urls(self):
         urls = super().get_urls()
@@ -119,6 +141,11 @@ class QuestionAdmin(admin.ModelAdmin):
                 self.admin_site.admin_view(self.bulk_upload_view),
                 name='core_question_bulk_upload'
             ),
+            path(
+                'bulk-upload/<int:job_id>/',
+                self.admin_site.admin_view(self.bulk_upload_progress_view),
+                name='core_question_bulk_upload_progress'
+            ),
         ]
         return custom_urls + urls
 
@@ -130,87 +157,17 @@ class QuestionAdmin(admin.ModelAdmin):
                 answers_str = form.cleaned_data['answers_string']
                 delimiter = form.cleaned_data['delimiter']
                 
-                file_uz_bytes = form.cleaned_data['questions_file_uz'].read() if form.cleaned_data['questions_file_uz'] else None
-                file_kaa_bytes = form.cleaned_data['questions_file_kaa'].read() if form.cleaned_data['questions_file_kaa'] else None
-                file_ru_bytes = form.cleaned_data['questions_file_ru'].read() if form.cleaned_data['questions_file_ru'] else None
-
-                # Har bir til uchun savollarni ajratib olish
-                # Bu yerda har bir fayldagi savollar soni bir xil bo'lishi va javoblar soniga mos kelishi kerak.
-                # split_docx_into_questions buni tekshiradi.
-
-                parsed_q_uz, error_uz = split_docx_into_questions(file_uz_bytes, answers_str, delimiter)
-                parsed_q_kaa, error_kaa = split_docx_into_questions(file_kaa_bytes, answers_str, delimiter)
-                parsed_q_ru, error_ru = split_docx_into_questions(file_ru_bytes, answers_str, delimiter)
-                print(parsed_q_uz)
-                # Xatoliklarni tekshirish
-                errors = []
-                if error_uz: errors.append(f"UZ: {error_uz}")
-                if error_kaa: errors.append(f"KAA: {error_kaa}")
-                if error_ru: errors.append(f"RU: {error_ru}")
-
-                # Turli tillardagi savollar soni mos kelishini tekshirish (agar kamida ikkita fayl yuklangan bo'lsa)
-                counts = []
-                if parsed_q_uz: counts.append(len(parsed_q_uz))
-                if parsed_q_kaa: counts.append(len(parsed_q_kaa))
-                if parsed_q_ru: counts.append(len(parsed_q_ru))
-
-                if len(counts) > 1 and len(set(counts)) > 1: # Agar yuklangan fayllarda savollar soni har xil bo'lsa
-                    errors.append(_("Turli tillardagi fayllarda savollar soni mos kelmadi: {}").format(counts))
-
-                if errors:
-                    for error_msg in errors:
-                        messages.error(request, error_msg)
-                    # Formani xatolar bilan qayta ko'rsatish
-                    context = self.admin_site.each_context(request)
-                    context['opts'] = self.model._meta
-                    context['form'] = form
-                    context['title'] = _("Savollarni ommaviy yuklash xatosi")
-                    return render(request, 'bulk_upload_form.html', context)
-
-                # Agar xatolik bo'lmasa, savollarni bazaga saqlash
-                # parsed_q_uz, parsed_q_kaa, parsed_q_ru ichida (docx_bytes, answer_char) tuple'lari bor.
-                # Ularning soni bir xil bo'lishi kerak (yuqorida tekshirildi).
-                # Qaysi birida eng ko'p savol bo'lsa (yoki birinchisida), o'sha bo'yicha aylanamiz.
-                
-                num_questions_to_save = 0
-                if parsed_q_uz: num_questions_to_save = len(parsed_q_uz)
-                elif parsed_q_kaa: num_questions_to_save = len(parsed_q_kaa)
-                elif parsed_q_ru: num_questions_to_save = len(parsed_q_ru)
-
-                if num_questions_to_save == 0:
-                     messages.warning(request, _("Yuklash uchun savollar topilmadi (fayllar bo'sh yoki ajratilmadi)."))
-                else:
-                    saved_count = 0
-                    for i in range(num_questions_to_save):
-                        q_data_uz = parsed_q_uz[i][0] if parsed_q_uz and i < len(parsed_q_uz) else None
-                        q_data_kaa = parsed_q_kaa[i][0] if parsed_q_kaa and i < len(parsed_q_kaa) else None
-                        q_data_ru = parsed_q_ru[i][0] if parsed_q_ru and i < len(parsed_q_ru) else None
-                        
-                        # Javobni birinchi mavjud parse qilingan ro'yxatdan olish
-                        correct_ans = None
-                        if parsed_q_uz and i < len(parsed_q_uz): correct_ans = parsed_q_uz[i][1]
-                        elif parsed_q_kaa and i < len(parsed_q_kaa): correct_ans = parsed_q_kaa[i][1]
-                        elif parsed_q_ru and i < len(parsed_q_ru): correct_ans = parsed_q_ru[i][1]
-
-                        if not correct_ans: # Bu holat bo'lmasligi kerak
-                            messages.error(request, _("{}-savol uchun javob topilmadi.").format(i+1))
-                            continue
-
-                        new_question = Question(subject=subject, correct_answer=correct_ans.lower(), is_active=True)
-                        
-                        if q_data_uz:
-                            new_question.question_file_uz.save(f"q_uz_{subject.id}_{i+1}.docx", ContentFile(q_data_uz), save=False)
-                        if q_data_kaa:
-                            new_question.question_file_kaa.save(f"q_kaa_{subject.id}_{i+1}.docx", ContentFile(q_data_kaa), save=False)
-                        if q_data_ru:
-                            new_question.question_file_ru.save(f"q_ru_{subject.id}_{i+1}.docx", ContentFile(q_data_ru), save=False)
-                        
-                        new_question.save() # Barcha fayllar biriktirilgandan keyin saqlash
-                        saved_count +=1
-
-                    messages.success(request, _("{} ta savol muvaffaqiyatli yuklandi.").format(saved_count))
-                
-                return redirect('admin:core_question_changelist') # Savollar ro'yxatiga qaytish
+                # Fayllar saqlanadi, ajratish va savollarni yozish esa fonda bajariladi -
+                # katta banklarda ham so'rov darhol qaytadi, jarayon alohida sahifada ko'rsatiladi
+                job = BulkUploadJob.objects.create(
+                    subject=subject,
+                    answers_string=answers_str,
+                    delimiter=delimiter,
+                    **{f'file_{lang}': form.cleaned_data[f'questions_file_{lang}'] for lang in Question.LANG_CODES},
+                )
+                submit_on_commit(run_bulk_upload_job, job.id)
+                messages.info(request, _("Fayllar qabul qilindi, savollar fonda yuklanmoqda."))
+                return redirect('admin:core_question_bulk_upload_progress', job_id=job.id)
         else:
             form = BulkUploadQuestionsForm()
 
@@ -221,10 +178,47 @@ class QuestionAdmin(admin.ModelAdmin):
         # Shablon admin papkasi ichida bo'lishi kerak
         return render(request, 'bulk_upload_form.html', context)
 
+    def bulk_upload_progress_view(self, request, job_id):
+        job = get_object_or_404(BulkUploadJob.objects.select_related('subject'), pk=job_id)
+        context = self.admin_site.each_context(request)
+        context['opts'] = self.model._meta
+        context['job'] = job
+        context['error_lines'] = job.errors.splitlines()
+        context['title'] = _("Ommaviy yuklash #{}").format(job.id)
+        return render(request, 'bulk_upload_progress.html', context)
+
     # Question ro'yxati sahifasiga "Ko'p savol yuklash" tugmasini qo'shish
     change_list_template = "question_changelist.html"
 
 
+@admin.register(BulkUploadJob)
+class BulkUploadJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'subject', 'status', 'sections_parsed', 'questions_saved', 'questions_total', 'created_at', 'finished_at', 'progress_link')
+    list_filter = ('status', 'subject')
+    readonly_fields = (
+        'subject', 'file_uz', 'file_kaa', 'file_ru', 'answers_string', 'delimiter', 'status',
+        'sections_parsed', 'questions_total', 'questions_saved', 'errors', 'created_at', 'started_at', 'heartbeat_at', 'finished_at',
+    )
+
+    def has_add_permission(self, request):
+        return False # Vazifalar "Ko'p Savol Yuklash" sahifasidan yaratiladi
+
+    def progress_link(self, obj):
+        url = reverse('admin:core_question_bulk_upload_progress', args=[obj.id])
+        return format_html('<a href="{}">{}</a>', url, _("Jarayon"))
+    progress_link.short_description = _("Jarayon")
+
+
+@admin.register(QuestionBlob)
+class QuestionBlobAdmin(admin.ModelAdmin):
+    list_display = ('sha256', 'size', 'ref_count', 'created_at')
+    search_fields = ('sha256',)
+    readonly_fields = ('sha256', 'size', 'ref_count', 'created_at')
+
+    def has_add_permission(self, request):
+        return False # Bloblar savol fayllari saqlanganda avtomatik yaratiladi
+
+
 class TestQuestionsInline(admin.TabularInline): # Testga qaysi savollar tushganini ko'rsatish
     model = Test.questions.through # M2M uchun through model
     extra = 0
@@ -233,21 +227,45 @@ class TestQuestionsInline(admin.TabularInline): # Testga qaysi savollar tushgani
     # fields = ('question',) # Faqat savolni ko'rsatish
     # readonly_fields = ('question',)
     
+class TestAnswerInline(admin.TabularInline): # Foydalanuvchi bergan javoblar
+    model = TestAnswer
+    extra = 0
+    fields = ('question', 'answer', 'updated_at')
+    readonly_fields = ('question', 'answer', 'updated_at')
+    can_delete = False
+
+@admin.register(ResultDelivery)
+class ResultDeliveryAdmin(admin.ModelAdmin):
+    list_display = ('test', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('test__id', 'test__user__telegram_id')
+    readonly_fields = ('test', 'attempts', 'last_error', 'created_at', 'sent_at')
+    actions = ['retry_selected_deliveries']
+
+    @admin.action(description=str(_("Tanlanganlarni qayta yuborish navbatiga qo'yish")))
+    def retry_selected_deliveries(self, request, queryset):
+        # deliver_results komandasi ularni keyingi tekshiruvda oladi
+        updated = queryset.exclude(status=ResultDelivery.STATUS_SENT).update(
+            status=ResultDelivery.STATUS_PENDING, attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, str(_("%(count)d ta yozuv navbatga qo'yildi.")) % {'count': updated}, level=messages.SUCCESS)
+
 @admin.register(Test)
 class TestAdmin(admin.ModelAdmin):
     # ... (list_display, list_filter, etc. avvalgidek, subject bilan bog'liq qismlar olib tashlangan) ...
-    list_display = ('id', 'user', 'get_test_description_admin', 'score', 'started_at', 'completed_at', 'voucher_sent')
+    list_display = ('id', 'user', 'get_test_description_admin', 'score', 'total_questions', 'started_at', 'completed_at', 'voucher_sent')
     list_filter = ('voucher_sent', 'started_at', 'user')
     search_fields = ('user__full_name', 'user__telegram_id', 'voucher_code', 'id')
-    readonly_fields = ('started_at', 'completed_at', 'get_questions_display_admin')
+    readonly_fields = ('started_at', 'completed_at', 'total_questions', 'get_questions_display_admin')
     autocomplete_fields = ['user']
     
     fieldsets = (
-        (None, {'fields': ('user', 'score', 'voucher_sent', 'voucher_code')}),
+        (None, {'fields': ('user', 'score', 'total_questions', 'voucher_sent', 'voucher_code')}),
         (_("Vaqt belgilari"), {'fields': ('started_at', 'completed_at', 'time_spent_seconds')}),
         (_("Test Savollari"), {'fields': ('get_questions_display_admin',)}),
     )
 
+    inlines = [TestAnswerInline]
     actions = ['export_selected_tests_as_excel']
 
     def get_queryset(self, request):
@@ -264,8 +282,8 @@ class TestAdmin(admin.ModelAdmin):
             # Bu yerda ham str() ishlatish mumkin, lekin format_html odatda __proxy__ ni to'g'ri hal qiladi
             questions_html += f"<li>{question.id}: {str(question.subject.get_localized_name())} ({question.correct_answer})</li>"
         questions_html += "</ul>"
-        if obj.questions.count() > 15:
-            questions_html += f"<p>{str(_('va yana'))} {obj.questions.count() - 15} {str(_('ta savol...'))}</p>"
+        if obj.total_questions > 15:
+            questions_html += f"<p>{str(_('va yana'))} {obj.total_questions - 15} {str(_('ta savol...'))}</p>"
         return format_html(questions_html)
     get_questions_display_admin.short_description = str(_("Test Savollari")) # str() bilan o'rash
 
@@ -276,99 +294,8 @@ class TestAdmin(admin.ModelAdmin):
             self.message_user(request, str(_("Eksport uchun testlar tanlanmadi.")), level=messages.WARNING) # str()
             return
 
-        queryset = queryset.select_related(
-            'user__education_type', # User ga bog'liq ForeignKeylarni oldindan yuklash
-            'user__institution__education_type', # Institution va uning turi
-            'user__education_level',
-            'user__faculty'
-        ).prefetch_related('questions__subject')
-
-
-        data_for_excel = []
-        # DataFrame uchun ustun nomlarini oldindan stringga aylantirish
-        column_names = {
-            'test_id': str(_('Test ID')),
-            'tg_id': str(_('Telegram ID')),
-            'name': str(_('Atı')),
-            'surname': str(_('Familiyası')),
-            'patronymic': str(_('Ákesiniń Atı')),
-            'phone': str(_('Telefon')),
-            'edu_type': str(_('Bilimlendiriw Túri')),
-            'institution': str(_('Mákeme')),
-            'edu_level_otm': str(_('Basqısh (JOO)')),
-            'faculty_otm': str(_('Fakultet (JOO)')),
-            'course': str(_('Kurs')),
-            'test_date_started': str(_('Test Baslanıw Waqıtı')),
-            'test_date_completed': str(_('Test Tamamlanıw Waqıtı')),
-            'score': str(_('Nátiyje (Ball)')),
-            'total_q': str(_('Jámi Sorawlar')),
-            'time_spent': str(_('Sarplaǵan Waqıtı (s)')),
-            'voucher_code': str(_('Sertifikat Kodı')),
-            'voucher_sent': str(_('Sertifikat Jiberildi')),
-        }
-
-        for test_obj in queryset:
-            user = test_obj.user
-            
-            data_for_excel.append({
-                column_names['test_id']: test_obj.id,
-                column_names['tg_id']: user.telegram_id,
-                column_names['name']: user.name or "",
-                column_names['surname']: user.surname or "",
-                column_names['patronymic']: user.patronymic or "",
-                column_names['phone']: user.phone_number or "",
-                column_names['edu_type']: str(user.education_type.name_kaa) if user.education_type else "",
-                column_names['institution']: str(user.institution.name_kaa) if user.institution else "",
-                column_names['edu_level_otm']: str(user.education_level.name_kaa) if user.education_level else "",
-                column_names['faculty_otm']: str(user.faculty.name_kaa) if user.faculty else "",
-                column_names['course']: user.course_year or "",
-                column_names['test_date_started']: timezone.localtime(test_obj.started_at).strftime('%Y-%m-%d %H:%M') if test_obj.started_at else "",
-                column_names['test_date_completed']: timezone.localtime(test_obj.completed_at).strftime('%Y-%m-%d %H:%M') if test_obj.completed_at else "",
-                column_names['score']: test_obj.score,
-                column_names['total_q']: test_obj.questions.count(),
-                column_names['time_spent']: test_obj.time_spent_seconds,
-                column_names['voucher_code']: test_obj.voucher_code or "",
-                column_names['voucher_sent']: str(_("Awa")) if test_obj.voucher_sent else str(_("Yaq")),
-            })
-
-        if not data_for_excel:
-            self.message_user(request, str(_("Eksport uchun ma'lumot topilmadi.")), level=messages.INFO) # str()
-            return
-
-        df = pd.DataFrame(data_for_excel)
-        
-        output = BytesIO()
-        sheet_name_str = str(_('Test_Natijalari')) # Varaq nomini aniq stringga aylantirish
-
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df.to_excel(writer, index=False, sheet_name=sheet_name_str)
-            
-            # Ustun kengliklarini avtomatik sozlash (ixtiyoriy)
-            worksheet = writer.sheets[sheet_name_str]
-            for idx, col_name_proxy in enumerate(df.columns): # df.columns endi string bo'lishi kerak
-                col_name_str = str(col_name_proxy) # Har ehtimolga qarshi
-                series = df[col_name_proxy] # Original __proxy__ bilan olish kerak bo'lishi mumkin
-                
-                # Ma'lumotlar uzunligi
-                try:
-                    # Agar seriyada None qiymatlar bo'lsa, map(len) xato berishi mumkin
-                    # None larni bo'sh stringga almashtirish
-                    data_max_len = series.fillna('').astype(str).map(len).max()
-                except Exception:
-                    data_max_len = 0 # Agar xato bo'lsa
-                
-                # Ustun nomi uzunligi
-                header_len = len(col_name_str)
-                
-                max_len = max(data_max_len, header_len) + 2 # Qo'shimcha joy
-                worksheet.set_column(idx, idx, max_len)
-
+        # API va bot bilan bir xil eksport mexanizmi (core/exports.py), admin uchun "Sertifikat Jiberildi" ustuni qo'shiladi
+        output = tempfile.TemporaryFile()
+        write_tests_export(filter_tests(queryset), 'xlsx', output, columns=TEST_EXPORT_COLUMNS + [VOUCHER_SENT_COLUMN])
         output.seek(0)
-
-        filename = f"test_results_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        response = HttpResponse(
-            output,
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
\ No newline at end of file
+        return FileResponse(output, as_attachment=True, filename=export_filename('xlsx'), content_type=EXPORT_FORMATS['xlsx'])
\ No newline at end of file
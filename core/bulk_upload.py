@@ -0,0 +1,175 @@
+# core/bulk_upload.py
+"""
+Savollarni DOCX banklardan ommaviy yuklash (BulkUploadJob, admin dagi ommaviy yuklash sahifasi).
+
+- UZ/KAA/RU fayllari split_docx_into_questions bilan parallel, alohida jarayonlarda ajratiladi
+  (core.workers.get_process_executor); bitta fayl bo'lsa yoki pool ishlamasa - shu jarayonning o'zida.
+- Savol fayllari kontent hashi bo'yicha (QuestionBlob) saqlanadi: faqat yangi kontent storage ga parallel
+  yoziladi. Question lar BULK_CREATE_BATCH_SIZE li paketlarda, har bir paket alohida tranzaksiyada
+  bulk_create qilinadi (jarayon sahifasi haqiqatan saqlangan savollarni ko'rsatadi). Biror paket xato bersa,
+  oldingi paketlar savollari va shu yuklash yaratgan bloblar o'chiriladi - natija "hammasi yoki hech narsa".
+- bulk_create post_save signalini chaqirmaydi, shuning uchun render navbati va fan poollari
+  (core.signals dagi kabi) commit dan keyin shu yerda yangilanadi.
+"""
+import hashlib
+import logging
+from collections import Counter
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from django.db import transaction
+from django.utils import translation
+from django.utils.translation import gettext_lazy as _
+
+from . import question_pool
+from .models import Question, QuestionBlob
+from .tasks import render_question_files
+from .utils import split_docx_into_questions
+from .workers import get_process_executor, reset_process_executor, submit
+
+logger = logging.getLogger(__name__)
+
+FILE_WRITE_WORKERS = 8 # Storage ga bir vaqtda yoziladigan blob fayllar soni
+BULK_CREATE_BATCH_SIZE = 200 # Shuncha savol saqlangach jarayon (on_saved) yangilanadi
+
+
+def _split_with_language(language, docx_bytes, answers_string, delimiter):
+    # Worker jarayonda xato matnlari so'rov tilida chiqishi uchun
+    with translation.override(language):
+        parsed, error = split_docx_into_questions(docx_bytes, answers_string, delimiter)
+        return parsed, str(error) if error else None
+
+
+def _split_sequentially(args, on_split):
+    results = {}
+    for lang, lang_args in args.items():
+        results[lang] = _split_with_language(*lang_args)
+        if on_split is not None:
+            on_split(lang, *results[lang])
+    return results
+
+
+def split_language_files(files, answers_string, delimiter, on_split=None):
+    """
+    files: {lang: docx_bytes} (yuklanmagan tillar tushirib qoldiriladi).
+    Har bir til faylini parallel ajratadi va {lang: (parsed, error)} qaytaradi.
+    on_split(lang, parsed, error) - har bir til tayyor bo'lishi bilan chaqiriladi (jarayonni ko'rsatish uchun).
+    """
+    language = translation.get_language()
+    args = {lang: (language, data, answers_string, delimiter) for lang, data in files.items()}
+    if len(args) < 2:
+        return _split_sequentially(args, on_split)
+
+    try:
+        executor = get_process_executor()
+        futures = {executor.submit(_split_with_language, *lang_args): lang for lang, lang_args in args.items()}
+        results = {}
+        for future in as_completed(futures):
+            lang = futures[future]
+            results[lang] = future.result()
+            if on_split is not None:
+                on_split(lang, *results[lang])
+        return {lang: results[lang] for lang in args} # Tillar tartibi saqlanadi
+    except BrokenProcessPool as e:
+        # Jarayon kutilmaganda o'lsa (masalan, xotira yetmasa) - navbatdagi yuklash uchun pool qayta ochiladi
+        logger.error(f"DOCX ajratish process pooli ishdan chiqdi, ketma-ket ajratiladi: {e}")
+        reset_process_executor()
+        return _split_sequentially(args, on_split)
+
+
+def check_parsed_questions(results):
+    """Ajratish natijalarini tekshiradi; xato matnlari ro'yxatini qaytaradi (bo'sh bo'lsa - hammasi joyida)."""
+    errors = [f"{lang.upper()}: {error}" for lang, (_parsed, error) in results.items() if error]
+    counts = [len(parsed) for parsed, _error in results.values() if parsed]
+    # Turli tillardagi savollar soni mos kelishini tekshirish (agar kamida ikkita fayl yuklangan bo'lsa)
+    if len(counts) > 1 and len(set(counts)) > 1:
+        errors.append(str(_("Turli tillardagi fayllarda savollar soni mos kelmadi: {}").format(counts)))
+    return errors
+
+
+def schedule_after_create(subject_id, question_ids):
+    """bulk_create dan keyin post_save signallari o'rniga: render navbati va fan poollarini yangilash."""
+    def after_commit():
+        for question_id in question_ids:
+            submit(render_question_files, question_id)
+        question_pool.bump_generation()
+        question_pool.refresh_subject_pools(subject_id)
+
+    transaction.on_commit(after_commit)
+
+
+def save_parsed_questions(subject, results, on_saved=None):
+    """
+    results: split_language_files natijasi (xatosiz). Savollarni fayllari bilan saqlaydi,
+    yaratilgan Question lar ro'yxatini qaytaradi.
+    on_saved(created) - har bir paket commit qilingach, shu paytgacha saqlangan savollar ro'yxati bilan chaqiriladi.
+    """
+    parsed_by_lang = {lang: parsed for lang, (parsed, _error) in results.items() if parsed}
+    if not parsed_by_lang:
+        return []
+    num_questions = max(len(parsed) for parsed in parsed_by_lang.values())
+
+    questions, question_hashes, contents = [], [], {} # question_hashes[i] - i-savol fayllari hashlari
+    for i in range(num_questions):
+        # Javob hamma tillarda bir xil javoblar qatoridan olinadi - birinchi mavjud tildan
+        correct_ans = next(parsed[i][1] for parsed in parsed_by_lang.values() if i < len(parsed))
+        question = Question(subject=subject, correct_answer=correct_ans.lower(), is_active=True)
+        hashes = []
+        for lang, parsed in parsed_by_lang.items():
+            if i >= len(parsed):
+                continue
+            docx_bytes = parsed[i][0]
+            # Fayl kontent hashi bo'yicha saqlanadi (QuestionBlob); hash render keshi uchun ham kerak
+            sha256 = hashlib.sha256(docx_bytes).hexdigest()
+            contents.setdefault(sha256, docx_bytes)
+            setattr(question, f'question_file_{lang}', QuestionBlob.path_for(sha256))
+            setattr(question, f'file_hash_{lang}', sha256)
+            hashes.append(sha256)
+        questions.append(question)
+        question_hashes.append(hashes)
+
+    # Faqat bazada yo'q bloblar yoziladi - qayta yuklangan bank deyarli hech narsa yozmaydi
+    created, created_blobs = [], []
+    try:
+        for start in range(0, len(questions), BULK_CREATE_BATCH_SIZE):
+            batch_hashes = question_hashes[start:start + BULK_CREATE_BATCH_SIZE]
+            created_blobs.extend(QuestionBlob.store_many(
+                {sha256: contents[sha256] for hashes in batch_hashes for sha256 in hashes},
+                max_workers=FILE_WRITE_WORKERS,
+            ))
+            with transaction.atomic():
+                batch_created = Question.objects.bulk_create(questions[start:start + BULK_CREATE_BATCH_SIZE])
+                QuestionBlob.acquire(Counter(sha256 for hashes in batch_hashes for sha256 in hashes))
+            created.extend(batch_created)
+            if on_saved is not None:
+                on_saved(created)
+    except Exception:
+        # Oldingi paketlar ham bekor qilinadi: o'chirilgan savollar bloblarni post_delete signali orqali bo'shatadi
+        discard_questions([question.pk for question in created])
+        QuestionBlob.delete_unreferenced(created_blobs)
+        raise
+    # Render va poollar faqat barcha paketlar saqlangandan keyin (bekor qilingan savollar render qilinmaydi)
+    schedule_after_create(subject.id, [question.pk for question in created])
+    return created
+
+
+def discard_questions(question_ids):
+    """Yakunlanmagan ommaviy yuklash saqlagan savollarni o'chiradi (bloblar havolasi signal orqali kamayadi)."""
+    if question_ids:
+        Question.objects.filter(pk__in=question_ids).delete()
+
+
+def bulk_upload_questions(subject, files, answers_string, delimiter, on_split=None, on_saved=None):
+    """
+    Yuklangan fayllarni ajratib saqlaydi (BulkUploadJob.run dan chaqiriladi).
+    files: {lang: docx_bytes yoki None}. (saqlangan savollar soni, xatolar ro'yxati) qaytaradi;
+    xato bo'lsa hech narsa saqlanmaydi.
+    """
+    files = {lang: data for lang, data in files.items() if data}
+    if not files:
+        return 0, [str(_("Fayl yuklanmagan."))]
+    results = split_language_files(files, answers_string, delimiter, on_split=on_split)
+    errors = check_parsed_questions(results)
+    if errors:
+        return 0, errors
+    return len(save_parsed_questions(subject, results, on_saved=on_saved)), []
@@ -0,0 +1,228 @@
+# core/exports.py
+"""
+Testlar eksporti - API (ExportTestsAPIView), admin action va bot uchun yagona mexanizm.
+
+Testlar values_list orqali bo'laklab (EXPORT_CHUNK_SIZE) o'qiladi va har bir bo'lak ustunlarga
+(har bir ustun - alohida ro'yxat) ajratiladi, keyin tanlangan formatga yoziladi:
+- xlsx    - xlsxwriter, constant_memory rejimi (qatorlar darhol diskka tushadi);
+- csv     - qatorma-qator oqim (StreamingHttpResponse uchun generator);
+- parquet - pyarrow o'rnatilgan bo'lsa, har bir bo'lak alohida row group.
+Shuning uchun xotira testlar soniga emas, bo'lak hajmiga bog'liq.
+"""
+import csv
+import importlib.util
+import tempfile
+from datetime import datetime, time
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.translation import gettext_lazy as _
+
+EXPORT_CHUNK_SIZE = 2000
+
+# (ustun nomi, values_list maydoni, Excel dagi kengligi) - kenglik fayl yozilishidan oldin beriladi,
+# chunki constant_memory rejimida ma'lumotlar bo'yicha kenglikni keyin hisoblab bo'lmaydi
+TEST_EXPORT_COLUMNS = [
+    (_('Test ID'), 'id', 10),
+    (_('Telegram ID'), 'user__telegram_id', 14),
+    (_('Atı'), 'user__name', 18),
+    (_('Familiyası'), 'user__surname', 18),
+    (_('Ákesiniń Atı'), 'user__patronymic', 18),
+    (_('Telefon'), 'user__phone_number', 16),
+    (_('Bilimlendiriw Túri'), 'user__education_type__name_kaa', 22),
+    (_('Mákeme'), 'user__institution__name_kaa', 40),
+    (_('Basqısh (JOO)'), 'user__education_level__name_kaa', 16),
+    (_('Fakultet (JOO)'), 'user__faculty__name_kaa', 30),
+    (_('Kurs'), 'user__course_year', 6),
+    (_('Test Baslanıw Waqıtı'), 'started_at', 18),
+    (_('Test Tamamlanıw Waqıtı'), 'completed_at', 18),
+    (_('Nátiyje (Ball)'), 'score', 10),
+    (_('Jámi Sorawlar'), 'total_questions', 10),
+    (_('Sarplaǵan Waqıtı (s)'), 'time_spent_seconds', 12),
+    (_('Sertifikat Kodı'), 'voucher_code', 16),
+]
+VOUCHER_SENT_COLUMN = (_('Sertifikat Jiberildi'), 'voucher_sent', 12)
+
+DATETIME_FIELDS = {'started_at', 'completed_at'}
+BOOLEAN_FIELDS = {'voucher_sent'}
+INTEGER_FIELDS = {'id', 'user__telegram_id', 'user__course_year', 'score', 'total_questions', 'time_spent_seconds'}
+
+EXPORT_FORMATS = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+class ExportError(Exception):
+    """Eksport parametrlari noto'g'ri yoki format ishlatib bo'lmaydi (foydalanuvchiga ko'rsatiladigan xato)."""
+
+
+def parquet_available():
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def check_export_format(file_format):
+    if file_format not in EXPORT_FORMATS:
+        raise ExportError(_("Noma'lum format. 'xlsx', 'csv' yoki 'parquet' bo'lishi kerak."))
+    if file_format == 'parquet' and not parquet_available():
+        raise ExportError(_("Parquet eksporti uchun serverda pyarrow o'rnatilmagan."))
+    return file_format
+
+
+def export_filename(file_format, prefix='test_results'):
+    return f"{prefix}_{timezone.now().strftime('%Y%m%d_%H%M%S')}.{file_format}"
+
+
+def parse_export_filters(params):
+    """
+    So'rov parametrlaridan (request.GET yoki dict) filtrlarni o'qiydi:
+    date_from, date_to (YYYY-MM-DD, test boshlangan sana), institution (ID), min_score, max_score.
+    """
+    filters = {}
+    for key in ('date_from', 'date_to'):
+        value = params.get(key)
+        if value:
+            parsed = parse_date(value)
+            if parsed is None:
+                raise ExportError(_("Sana YYYY-MM-DD formatida bo'lishi kerak: %(value)s") % {'value': value})
+            filters[key] = parsed
+    for key in ('institution', 'min_score', 'max_score'):
+        value = params.get(key)
+        if value not in (None, ''):
+            try:
+                filters[key] = int(value)
+            except (TypeError, ValueError):
+                raise ExportError(_("%(key)s butun son bo'lishi kerak.") % {'key': key})
+    return filters
+
+
+def filter_tests(queryset=None, date_from=None, date_to=None, institution=None, min_score=None, max_score=None):
+    """Testlarni sana oralig'i (started_at), muassasa va natija (ball) bo'yicha filtrlaydi."""
+    if queryset is None:
+        from core.models import Test
+        queryset = Test.objects.all()
+    conditions = Q()
+    tz = timezone.get_current_timezone()
+    if date_from:
+        conditions &= Q(started_at__gte=timezone.make_aware(datetime.combine(date_from, time.min), tz))
+    if date_to:
+        conditions &= Q(started_at__lte=timezone.make_aware(datetime.combine(date_to, time.max), tz))
+    if institution is not None:
+        conditions &= Q(user__institution_id=institution)
+    if min_score is not None:
+        conditions &= Q(score__gte=min_score)
+    if max_score is not None:
+        conditions &= Q(score__lte=max_score)
+    return queryset.filter(conditions).order_by('-started_at')
+
+
+def iter_column_chunks(queryset, columns=TEST_EXPORT_COLUMNS, chunk_size=EXPORT_CHUNK_SIZE, text=True):
+    """
+    Testlarni bo'laklab o'qib, har bir bo'lakni ustunlar ro'yxati ko'rinishida qaytaradi: [[ustun1...], [ustun2...], ...].
+    text=True bo'lsa (xlsx/csv) bo'sh qiymatlar "" ga, mantiqiy qiymatlar "Awa"/"Yaq" ga aylantiriladi;
+    parquet uchun (text=False) turlari saqlanadi.
+    """
+    fields = [field for _label, field, _width in columns]
+    rows = queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+    yes, no = str(_("Awa")), str(_("Yaq"))
+
+    def project(chunk):
+        projected = []
+        for field, values in zip(fields, zip(*chunk)):
+            if field in DATETIME_FIELDS:
+                values = [timezone.localtime(v).strftime('%Y-%m-%d %H:%M') if v else None for v in values]
+            elif field in BOOLEAN_FIELDS and text:
+                values = [yes if v else no for v in values]
+            if text:
+                values = ["" if v is None else v for v in values]
+            projected.append(list(values))
+        return projected
+
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield project(chunk)
+            chunk = []
+    if chunk:
+        yield project(chunk)
+
+
+def column_labels(columns):
+    return [str(label) for label, _field, _width in columns]
+
+
+class _EchoBuffer:
+    """csv.writer uchun: yozilgan satrni saqlamasdan darhol qaytaradi."""
+    def write(self, value):
+        return value
+
+
+def iter_csv(queryset, columns=TEST_EXPORT_COLUMNS):
+    """CSV ni bo'laklar oqimi sifatida qaytaradi (butun fayl xotirada yig'ilmaydi)."""
+    writer = csv.writer(_EchoBuffer())
+    yield '\ufeff' # Excel UTF-8 ni to'g'ri ochishi uchun BOM
+    yield writer.writerow(column_labels(columns))
+    for column_values in iter_column_chunks(queryset, columns):
+        yield ''.join(writer.writerow(row) for row in zip(*column_values))
+
+
+def write_xlsx(queryset, fileobj, columns=TEST_EXPORT_COLUMNS):
+    import xlsxwriter
+    workbook = xlsxwriter.Workbook(fileobj, {'constant_memory': True, 'tmpdir': tempfile.gettempdir()})
+    worksheet = workbook.add_worksheet(str(_('Test_Natijalari')))
+    header_format = workbook.add_format({'bold': True})
+    for col, (label, _field, width) in enumerate(columns):
+        worksheet.set_column(col, col, max(width, len(str(label)) + 2))
+    worksheet.write_row(0, 0, column_labels(columns), header_format)
+    row_index = 1
+    for column_values in iter_column_chunks(queryset, columns):
+        # constant_memory rejimida qatorlar faqat tartib bilan yozilishi mumkin
+        for row in zip(*column_values):
+            worksheet.write_row(row_index, 0, row)
+            row_index += 1
+    workbook.close()
+    return row_index - 1
+
+
+def write_parquet(queryset, fileobj, columns=TEST_EXPORT_COLUMNS):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    def arrow_type(field):
+        if field in INTEGER_FIELDS:
+            return pa.int64()
+        if field in BOOLEAN_FIELDS:
+            return pa.bool_()
+        return pa.string()
+
+    # Sxema oldindan beriladi: bo'lakdagi ustun to'liq bo'sh (None) bo'lsa ham turlari bir xil qoladi
+    schema = pa.schema([(str(label), arrow_type(field)) for label, field, _width in columns])
+    rows_written = 0
+    with pq.ParquetWriter(fileobj, schema) as writer:
+        for column_values in iter_column_chunks(queryset, columns, text=False):
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=column.type) for values, column in zip(column_values, schema)],
+                schema=schema,
+            ))
+            rows_written += len(column_values[0])
+    return rows_written
+
+
+def write_tests_export(queryset, file_format, fileobj, columns=TEST_EXPORT_COLUMNS):
+    """Testlarni tanlangan formatda fileobj ga yozadi; yozilgan qatorlar sonini qaytaradi."""
+    check_export_format(file_format)
+    if file_format == 'xlsx':
+        return write_xlsx(queryset, fileobj, columns)
+    if file_format == 'parquet':
+        return write_parquet(queryset, fileobj, columns)
+    writer = csv.writer(_EchoBuffer())
+    fileobj.write(('\ufeff' + writer.writerow(column_labels(columns))).encode('utf-8'))
+    rows_written = 0
+    for column_values in iter_column_chunks(queryset, columns):
+        rows = list(zip(*column_values))
+        fileobj.write(''.join(writer.writerow(row) for row in rows).encode('utf-8'))
+        rows_written += len(rows)
+    return rows_written
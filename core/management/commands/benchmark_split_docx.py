@@ -0,0 +1,101 @@
+# core/management/commands/benchmark_split_docx.py
+
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand, CommandError
+from docx import Document as DocxDocument
+from docx.shared import Cm
+from PIL import Image
+
+from core.utils import split_docx_into_questions
+
+
+def build_sample_docx(questions, images, delimiter="###"):
+    """Sinov uchun savollar banki: har bir savol - delimiter, shart, 4 ta variant; `images` ta savolda rasm."""
+    document = DocxDocument()
+    image_every = max(1, questions // images) if images else 0
+    for i in range(1, questions + 1):
+        document.add_paragraph(f"{delimiter} {i}")
+        paragraph = document.add_paragraph()
+        paragraph.add_run(f"{i}. ").bold = True
+        paragraph.add_run("Quyidagi ifodaning qiymatini toping: " + "x + y = z, " * 5)
+        for option in "ABCD":
+            document.add_paragraph(f"{option}) variant {i}{option}")
+        if i % 10 == 0:
+            table = document.add_table(rows=2, cols=2)
+            for cell in table._cells:
+                cell.text = str(i)
+        if image_every and i % image_every == 0:
+            image_stream = BytesIO()
+            Image.new('RGB', (200, 120), (i % 255, 100, 150)).save(image_stream, format='PNG')
+            image_stream.seek(0)
+            document.add_picture(image_stream, width=Cm(4))
+    output = BytesIO()
+    document.save(output)
+    return output.getvalue()
+
+
+class Command(BaseCommand):
+    help = "DOCX savollar bankini savollarga ajratish (split_docx_into_questions) tezligini o'lchaydi."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--questions',
+            type=int,
+            default=500,
+            help="Sinov faylidagi savollar soni.",
+        )
+        parser.add_argument(
+            '--images',
+            type=int,
+            default=50,
+            help="Sinov faylidagi rasmlar soni.",
+        )
+        parser.add_argument(
+            '--file',
+            type=str,
+            default=None,
+            help="Sinov fayli o'rniga mavjud DOCX (javoblar soni savollar soniga qarab olinadi).",
+        )
+        parser.add_argument(
+            '--delimiter',
+            type=str,
+            default='###',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help="Necha marta o'lchansin (eng yaxshi natija ko'rsatiladi).",
+        )
+
+    def handle(self, *args, **kwargs):
+        delimiter = kwargs['delimiter']
+        if kwargs['file']:
+            try:
+                with open(kwargs['file'], 'rb') as f:
+                    docx_bytes = f.read()
+            except OSError as e:
+                raise CommandError(str(e))
+            questions = sum(1 for p in DocxDocument(BytesIO(docx_bytes)).paragraphs if p.text.strip().startswith(delimiter))
+        else:
+            questions = kwargs['questions']
+            docx_bytes = build_sample_docx(questions, kwargs['images'], delimiter)
+        answers = "A" * max(questions, 1)
+        self.stdout.write(f"Fayl: {len(docx_bytes) / 1024:.0f} KB, {questions} ta savol")
+
+        timings = []
+        for _attempt in range(max(1, kwargs['repeat'])):
+            started = time.perf_counter()
+            parsed, error = split_docx_into_questions(docx_bytes, answers, delimiter)
+            timings.append(time.perf_counter() - started)
+            if error:
+                raise CommandError(str(error))
+
+        best = min(timings)
+        total_bytes = sum(len(question_bytes) for question_bytes, _answer in parsed)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(parsed)} ta savol {best:.2f} s da ajratildi (eng yaxshisi, {len(timings)} urinish): "
+            f"{len(parsed) / best:.0f} savol/s, chiqish hajmi jami {total_bytes / 1024 / 1024:.1f} MB"
+        ))
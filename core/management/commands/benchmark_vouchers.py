@@ -0,0 +1,57 @@
+# core/management/commands/benchmark_vouchers.py
+
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.utils import VoucherRenderer
+
+
+class Command(BaseCommand):
+    help = "Voucher generatsiya tezligini o'lchaydi (voucher/sekund)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=200,
+            help="Nechta voucher chizilsin.",
+        )
+        parser.add_argument(
+            '--template',
+            type=str,
+            default='voucher.png',
+            help="'vouchers/' papkasidagi shablon fayl nomi.",
+        )
+
+    def handle(self, *args, **kwargs):
+        count = kwargs['count']
+        if count < 1:
+            raise CommandError("--count kamida 1 bo'lishi kerak.")
+
+        load_started = time.perf_counter()
+        try:
+            renderer = VoucherRenderer(kwargs['template'])
+        except FileNotFoundError as e:
+            raise CommandError(str(e))
+        load_seconds = time.perf_counter() - load_started
+        self.stdout.write(f"Shablon va shriftlar yuklandi: {load_seconds * 1000:.1f} ms")
+
+        date_str = timezone.now().strftime("%d.%m.%Y")
+        total_bytes = 0
+        started = time.perf_counter()
+        for i in range(count):
+            image_bytes = renderer.render(
+                fullname=('Aybek', 'Jumashev', 'Test'),
+                date_str=date_str,
+                num_code=(i, f"IBT{i:06d}"),
+                score=(27, 90.0),
+            )
+            total_bytes += image_bytes.getbuffer().nbytes
+        elapsed = time.perf_counter() - started
+        rate = count / elapsed if elapsed > 0 else float('inf')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{count} ta voucher {elapsed:.2f} s da chizildi: {rate:.1f} voucher/s, "
+            f"o'rtacha {elapsed / count * 1000:.1f} ms, o'rtacha hajm {total_bytes / count / 1024:.0f} KB"
+        ))
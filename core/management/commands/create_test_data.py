@@ -11,6 +11,7 @@ from django.db import transaction
 
 # Modellarni import qilish
 from core.models import Subject, Question, EducationType # User hozircha shart emas
+from core.utils import normalize_docx_bytes
 
 # Agar EducationType kerak bo'lsa, uni topish yoki yaratish
 def get_or_create_default_education_type():
@@ -42,8 +43,8 @@ def generate_dummy_docx_content(subject_name_display, question_num, language_dis
 
     file_stream = BytesIO()
     document.save(file_stream)
-    file_stream.seek(0)
-    return file_stream
+    # Bir xil savol har safar bir xil baytlar bo'lishi uchun - qayta ishga tushirganda fayllar qayta yozilmaydi (QuestionBlob)
+    return BytesIO(normalize_docx_bytes(file_stream.getvalue()))
 
 class Command(BaseCommand):
     help = 'Creates fake data for subjects and questions (multilingual) for testing purposes.'
@@ -0,0 +1,47 @@
+# core/management/commands/deliver_results.py
+
+import asyncio
+from django.core.management.base import BaseCommand
+from asgiref.sync import sync_to_async
+
+from tgbot.utils import deliver_result, get_due_result_delivery_ids, close_telegram_client
+
+
+class Command(BaseCommand):
+    help = "ResultDelivery outboxidagi yuborilmagan test natijalarini Telegramga yuboradi (qayta urinishlar bilan)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help="Navbatni bir marta ko'rib chiqib, chiqib ketish (cron uchun).",
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=10.0,
+            help="Navbatni tekshirish oralig'i (sekund).",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help="Bir tekshirishda olinadigan yozuvlar soni.",
+        )
+
+    def handle(self, *args, **kwargs):
+        asyncio.run(self.run_loop(kwargs['once'], kwargs['interval'], kwargs['batch_size']))
+
+    async def run_loop(self, once, interval, batch_size):
+        self.stdout.write(self.style.SUCCESS("Natijalarni yuborish workeri ishga tushdi."))
+        try:
+            while True:
+                due_ids = await sync_to_async(get_due_result_delivery_ids)(batch_size)
+                if due_ids:
+                    results = await asyncio.gather(*(deliver_result(delivery_id) for delivery_id in due_ids))
+                    self.stdout.write(f"{len(due_ids)} ta yozuv ko'rildi, {sum(1 for r in results if r)} tasi yuborildi.")
+                if once:
+                    break
+                await asyncio.sleep(interval)
+        finally:
+            await close_telegram_client()
@@ -0,0 +1,160 @@
+# core/management/commands/generate_vouchers.py
+
+import multiprocessing
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, FloatField, ExpressionWrapper
+from django.db.models.functions import NullIf
+from django.utils import timezone
+
+
+def _init_worker():
+    # Jarayonlar 'spawn' bilan ishga tushadi (ochiq DB ulanishi fork orqali meros qolmasligi uchun),
+    # shuning uchun har birida Django qayta sozlanadi
+    import django
+    django.setup()
+
+
+def _render_voucher(row):
+    """Worker jarayonida bitta voucherni chizadi: (fayl nomi, JPEG baytlari) qaytaradi."""
+    from core.utils import get_voucher_renderer
+    template_filename, test_id, voucher_code, fullname, date_str, score = row
+    image_bytes = get_voucher_renderer(template_filename).render(
+        fullname=fullname,
+        date_str=date_str,
+        num_code=(test_id, voucher_code),
+        score=score,
+    )
+    return f"{test_id}_{voucher_code}.jpg", image_bytes.getvalue()
+
+
+class Command(BaseCommand):
+    help = "Yuqori natijali testlar uchun voucherlarni (qayta) generatsiya qiladi va papkaga yoki ZIP ga yozadi."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output',
+            type=str,
+            help="Natija papkasi yoki .zip fayl yo'li.",
+        )
+        parser.add_argument(
+            '--min-percent',
+            type=float,
+            default=80.0,
+            help="Voucher beriladigan minimal natija (foiz, qat'iy katta).",
+        )
+        parser.add_argument(
+            '--template',
+            type=str,
+            default='voucher.png',
+            help="'vouchers/' papkasidagi shablon fayl nomi.",
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Parallel jarayonlar soni.",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="Jarayonlarga bir vaqtda beriladigan testlar soni (xotirani cheklash uchun).",
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help="Ko'pi bilan nechta voucher generatsiya qilinsin.",
+        )
+
+    def get_rows(self, template_filename, min_percent):
+        """Shartga mos testlarni iterator bilan o'qib, worker uchun oddiy tuple larga aylantiradi."""
+        # Modellar shu yerda import qilinadi: worker jarayonlar bu modulni Django sozlanmasdan oldin import qiladi
+        from core.models import Test
+        queryset = (
+            Test.objects
+            .filter(score__isnull=False, completed_at__isnull=False)
+            .exclude(voucher_code__isnull=True).exclude(voucher_code='')
+            .annotate(percent=ExpressionWrapper(F('score') * 100.0 / NullIf(F('total_questions'), 0), output_field=FloatField()))
+            .filter(percent__gt=min_percent)
+            .order_by('id')
+            .values_list('id', 'voucher_code', 'score', 'percent', 'completed_at',
+                         'user__name', 'user__surname', 'user__patronymic')
+        )
+        for test_id, voucher_code, score, percent, completed_at, name, surname, patronymic in queryset.iterator(chunk_size=2000):
+            yield (
+                template_filename,
+                test_id,
+                voucher_code,
+                (name or '', surname or '', patronymic or ''),
+                timezone.localtime(completed_at).strftime("%d.%m.%Y"),
+                (score, round(percent, 1)),
+            )
+
+    def handle(self, *args, **kwargs):
+        output = kwargs['output']
+        batch_size = max(1, kwargs['batch_size'])
+        workers = max(1, kwargs['workers'])
+
+        # Shablon mavjudligini oldindan tekshirish (har bir workerda xato chiqmasligi uchun)
+        from core.utils import VoucherRenderer
+        try:
+            VoucherRenderer(kwargs['template'])
+        except FileNotFoundError as e:
+            raise CommandError(str(e))
+
+        if output.lower().endswith('.zip'):
+            os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+            archive = zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED) # JPEG allaqachon siqilgan
+            write = archive.writestr
+        else:
+            archive = None
+            os.makedirs(output, exist_ok=True)
+
+            def write(filename, data):
+                with open(os.path.join(output, filename), 'wb') as f:
+                    f.write(data)
+
+        rows = self.get_rows(kwargs['template'], kwargs['min_percent'])
+        if kwargs['limit'] is not None:
+            rows = islice(rows, kwargs['limit'])
+
+        self.stdout.write(self.style.SUCCESS(f"Voucherlar generatsiyasi boshlandi ({workers} ta jarayon)..."))
+        generated = 0
+        total_bytes = 0
+        started = time.perf_counter()
+        try:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            ) as executor:
+                while True:
+                    batch = list(islice(rows, batch_size))
+                    if not batch:
+                        break
+                    chunksize = max(1, len(batch) // (workers * 4))
+                    for filename, data in executor.map(_render_voucher, batch, chunksize=chunksize):
+                        write(filename, data)
+                        generated += 1
+                        total_bytes += len(data)
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(f"{generated} ta voucher tayyor ({generated / elapsed:.1f} voucher/s)")
+        finally:
+            if archive is not None:
+                archive.close()
+
+        elapsed = time.perf_counter() - started
+        if not generated:
+            self.stdout.write(self.style.WARNING("Shartga mos test topilmadi."))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{generated} ta voucher {elapsed:.2f} s da generatsiya qilindi: {generated / elapsed:.1f} voucher/s, "
+            f"jami {total_bytes / 1024 / 1024:.1f} MB -> {output}"
+        ))
@@ -0,0 +1,57 @@
+# core/management/commands/migrate_question_blobs.py
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from core.models import Question, QuestionBlob
+
+
+class Command(BaseCommand):
+    help = (
+        "Eski (subjects/<id>/questions/...) savol fayllarini kontent hashi bo'yicha QuestionBlob ga ko'chiradi: "
+        "bir xil fayllar bitta blobga aylanadi."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-old',
+            action='store_true',
+            help="Ko'chirilgan eski fayllarni o'chirmaslik.",
+        )
+
+    def handle(self, *args, **kwargs):
+        blob_prefix = f'{QuestionBlob.BLOB_DIR}/'
+        legacy_filter = Q()
+        for lang in Question.LANG_CODES:
+            field_name = f'question_file_{lang}'
+            legacy_filter |= Q(**{f'{field_name}__gt': ''}) & ~Q(**{f'{field_name}__startswith': blob_prefix})
+
+        moved_files = 0
+        for question in Question.objects.filter(legacy_filter).iterator(chunk_size=200):
+            updated_fields, old_names = [], []
+            for lang in Question.LANG_CODES:
+                file_field = getattr(question, f'question_file_{lang}')
+                if not file_field or QuestionBlob.sha_from_name(file_field.name):
+                    continue
+                try:
+                    with file_field.open('rb') as f:
+                        file_field.name = QuestionBlob.store(f)[0]
+                except OSError as e:
+                    self.stderr.write(f"Savol #{question.id} ({lang}): faylni o'qib bo'lmadi: {e}")
+                    continue
+                old_names.append(question._loaded_file_names[lang])
+                updated_fields.append(f'question_file_{lang}')
+            if not updated_fields:
+                continue
+            # Question.save blob havolalarini oshiradi va hashni blob nomidan olib (yo'q yoki eskirgan bo'lsa)
+            # file_hash_* ga yozadi; kontent hashi o'zgarmagan bo'lsa render qayta navbatga qo'yilmaydi
+            question.save(update_fields=updated_fields)
+            moved_files += len(updated_fields)
+            if not kwargs['keep_old']:
+                storage = QuestionBlob.storage()
+                for name in old_names:
+                    storage.delete(name)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{moved_files} ta fayl ko'chirildi; jami bloblar: {QuestionBlob.objects.count()}."
+        ))
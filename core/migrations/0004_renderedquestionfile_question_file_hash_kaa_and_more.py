@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_alter_user_name_alter_user_surname'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenderedQuestionFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True, verbose_name='Kontent hashi (SHA-256)')),
+                ('html', models.TextField(verbose_name='HTML')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Render qilingan savol fayli',
+                'verbose_name_plural': 'Render qilingan savol fayllari',
+            },
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='file_hash_kaa',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64, verbose_name='Fayl hashi (Qoraqalpoqcha)'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='file_hash_ru',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64, verbose_name='Fayl hashi (Ruscha)'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='file_hash_uz',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64, verbose_name="Fayl hashi (O'zbekcha)"),
+        ),
+    ]
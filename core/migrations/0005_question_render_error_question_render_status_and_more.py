@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_renderedquestionfile_question_file_hash_kaa_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='render_error',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Render xatosi'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='render_status',
+            field=models.CharField(choices=[('pending', 'Navbatda'), ('processing', 'Render qilinmoqda'), ('done', 'Tayyor'), ('failed', 'Xatolik')], default='pending', editable=False, max_length=10, verbose_name='Render holati'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='rendered_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Render qilingan vaqti'),
+        ),
+    ]
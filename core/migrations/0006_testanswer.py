@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_question_render_error_question_render_status_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestAnswer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('answer', models.CharField(choices=[('a', 'A'), ('b', 'B'), ('c', 'C'), ('d', 'D')], max_length=1, verbose_name='Javob')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.question', verbose_name='Savol')),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='core.test', verbose_name='Test')),
+            ],
+            options={
+                'verbose_name': 'Test javobi',
+                'verbose_name_plural': 'Test javoblari',
+                'constraints': [models.UniqueConstraint(fields=('test', 'question'), name='unique_test_answer')],
+            },
+        ),
+    ]
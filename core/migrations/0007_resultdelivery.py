@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:50
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_testanswer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Navbatda'), ('sending', 'Yuborilmoqda'), ('sent', 'Yuborildi'), ('failed', 'Xatolik')], db_index=True, default='pending', max_length=10, verbose_name='Holati')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Urinishlar soni')),
+                ('next_attempt_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Keyingi urinish vaqti')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Oxirgi xato')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Yuborilgan vaqti')),
+                ('test', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='result_delivery', to='core.test', verbose_name='Test')),
+            ],
+            options={
+                'verbose_name': 'Natija yuborish navbati',
+                'verbose_name_plural': 'Natija yuborish navbati',
+                'ordering': ['next_attempt_at'],
+            },
+        ),
+    ]
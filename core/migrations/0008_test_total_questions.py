@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:16
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_total_questions(apps, schema_editor):
+    # Mavjud testlar uchun savollar sonini bitta UPDATE ... (SELECT COUNT) so'rovi bilan to'ldirish
+    Test = apps.get_model('core', 'Test')
+    through = Test.questions.through
+    counts = (
+        through.objects.filter(test_id=OuterRef('pk'))
+        .values('test_id')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    Test.objects.update(total_questions=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_resultdelivery'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='total_questions',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Savollar soni'),
+        ),
+        migrations.RunPython(fill_total_questions, migrations.RunPython.noop),
+    ]
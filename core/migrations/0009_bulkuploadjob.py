@@ -0,0 +1,39 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_test_total_questions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BulkUploadJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_uz', models.FileField(blank=True, null=True, upload_to='bulk_uploads/%Y/%m/', verbose_name="Savollar fayli (O'zbekcha, DOCX)")),
+                ('file_kaa', models.FileField(blank=True, null=True, upload_to='bulk_uploads/%Y/%m/', verbose_name='Savollar fayli (Qoraqalpoqcha, DOCX)')),
+                ('file_ru', models.FileField(blank=True, null=True, upload_to='bulk_uploads/%Y/%m/', verbose_name='Savollar fayli (Ruscha, DOCX)')),
+                ('answers_string', models.CharField(max_length=500, verbose_name='Javoblar ketma-ketligi')),
+                ('delimiter', models.CharField(default='###', max_length=10, verbose_name='Savol ajratuvchi belgi')),
+                ('status', models.CharField(choices=[('pending', 'Navbatda'), ('running', 'Bajarilmoqda'), ('done', 'Tayyor'), ('failed', 'Xatolik')], db_index=True, default='pending', max_length=10, verbose_name='Holati')),
+                ('sections_parsed', models.PositiveIntegerField(default=0, verbose_name="Ajratilgan bo'limlar")),
+                ('questions_total', models.PositiveIntegerField(default=0, verbose_name='Jami savollar')),
+                ('questions_saved', models.PositiveIntegerField(default=0, verbose_name='Saqlangan savollar')),
+                ('errors', models.TextField(blank=True, default='', verbose_name='Xatolar')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Yaratilgan vaqti')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Boshlangan vaqti')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Yakunlangan vaqti')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bulk_upload_jobs', to='core.subject', verbose_name='Fan')),
+            ],
+            options={
+                'verbose_name': 'Ommaviy yuklash',
+                'verbose_name_plural': 'Ommaviy yuklashlar',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_bulkuploadjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='Kontent hashi (SHA-256)')),
+                ('size', models.PositiveIntegerField(default=0, verbose_name='Hajmi (bayt)')),
+                ('ref_count', models.PositiveIntegerField(default=0, verbose_name='Havolalar soni')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Savol fayli (blob)',
+                'verbose_name_plural': 'Savol fayllari (bloblar)',
+            },
+        ),
+    ]
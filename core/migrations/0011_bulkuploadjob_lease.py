@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_questionblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bulkuploadjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Oxirgi faollik'),
+        ),
+        migrations.AddField(
+            model_name='bulkuploadjob',
+            name='question_ids',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+    ]
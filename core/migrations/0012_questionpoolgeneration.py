@@ -0,0 +1,20 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_bulkuploadjob_lease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionPoolGeneration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
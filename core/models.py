@@ -6,8 +6,16 @@ import uuid # Agar UUID ishlatmoqchi bo'lsangiz, lekin telegram_id unique bo'lga
 from django.utils import translation # Joriy tilni olish uchun
 from django.utils import timezone # datetime.now() o'rniga
 from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from datetime import timedelta
+import hashlib
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 
 class EducationType(models.Model):
     name_uz = models.CharField(max_length=100, verbose_name=_("Nomi (O'zbekcha)"))
@@ -271,7 +279,8 @@ class Subject(models.Model):
 
 
 def question_file_path_lang(instance, filename, lang_code):
-    # Fayl subjects/<subject_id>/questions/<lang_code>/<filename> manziliga yuklanadi
+    # Eski fayllar subjects/<subject_id>/questions/<lang_code>/<filename> manzilida.
+    # Yangi fayllar Question.save da QuestionBlob (question_blobs/...) sifatida saqlanadi, bu yo'l ishlatilmaydi
     # Fayl nomiga til kodini qo'shish yaxshi, chalkashmasligi uchun
     name, ext = os.path.splitext(filename)
     return f'subjects/{instance.subject.id}/questions/{lang_code}/{name}_{lang_code}{ext}'
@@ -308,20 +317,132 @@ class Question(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    def get_question_file_for_current_lang(self):
-        """Joriy aktiv til uchun savol faylini qaytaradi."""
+    # Har bir til faylining SHA-256 hashi (RenderedQuestionFile keshi uchun kalit)
+    file_hash_uz = models.CharField(max_length=64, blank=True, default='', editable=False, verbose_name=_("Fayl hashi (O'zbekcha)"))
+    file_hash_kaa = models.CharField(max_length=64, blank=True, default='', editable=False, verbose_name=_("Fayl hashi (Qoraqalpoqcha)"))
+    file_hash_ru = models.CharField(max_length=64, blank=True, default='', editable=False, verbose_name=_("Fayl hashi (Ruscha)"))
+
+    RENDER_PENDING = 'pending'
+    RENDER_PROCESSING = 'processing'
+    RENDER_DONE = 'done'
+    RENDER_FAILED = 'failed'
+    RENDER_STATUS_CHOICES = [
+        (RENDER_PENDING, _("Navbatda")),
+        (RENDER_PROCESSING, _("Render qilinmoqda")),
+        (RENDER_DONE, _("Tayyor")),
+        (RENDER_FAILED, _("Xatolik")),
+    ]
+    render_status = models.CharField(max_length=10, choices=RENDER_STATUS_CHOICES, default=RENDER_PENDING, editable=False, verbose_name=_("Render holati"))
+    render_error = models.TextField(blank=True, default='', editable=False, verbose_name=_("Render xatosi"))
+    rendered_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name=_("Render qilingan vaqti"))
+
+    LANG_CODES = ('uz', 'kaa', 'ru')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_subject_id = instance.__dict__.get('subject_id') # Savol boshqa fanga o'tkazilsa, eski fan poolini yangilash uchun
+        # Bazadan o'qilgan fayl nomlarini eslab qolamiz, save() da o'zgarganini aniqlash uchun
+        instance._loaded_file_names = {
+            lang: getattr(instance, f'question_file_{lang}').name
+            for lang in cls.LANG_CODES
+            if f'question_file_{lang}' in field_names
+        }
+        return instance
+
+    def get_question_lang_for_current_lang(self):
+        """Joriy aktiv til uchun qaysi til fayli ishlatilishini qaytaradi (fayl bo'lmasa None)."""
         lang = translation.get_language() # Joriy tilni olish
         if lang == 'kaa' and self.question_file_kaa:
-            return self.question_file_kaa
+            return 'kaa'
         elif lang == 'ru' and self.question_file_ru:
-            return self.question_file_ru
+            return 'ru'
         elif self.question_file_uz: # Standart yoki o'zbekcha
-            return self.question_file_uz
+            return 'uz'
         # Agar joriy til uchun fayl bo'lmasa, boshqa mavjud faylni qaytarish (ixtiyoriy)
-        elif self.question_file_kaa: return self.question_file_kaa
-        elif self.question_file_ru: return self.question_file_ru
+        elif self.question_file_kaa: return 'kaa'
+        elif self.question_file_ru: return 'ru'
         return None # Hech qaysi tilda fayl yo'q
 
+    def get_question_file_for_current_lang(self):
+        """Joriy aktiv til uchun savol faylini qaytaradi."""
+        lang = self.get_question_lang_for_current_lang()
+        return getattr(self, f'question_file_{lang}') if lang else None
+
+    def update_file_hashes(self):
+        """
+        O'zgargan (yangi yuklangan yoki almashtirilgan) til fayllari uchun hashni qayta hisoblaydi.
+        Yangi yuklangan fayllar shu yerda QuestionBlob sifatida (kontent hashi bo'yicha) saqlanadi.
+        O'zgargan tillar ro'yxatini qaytaradi.
+        """
+        loaded_names = getattr(self, '_loaded_file_names', {})
+        changed_langs = []
+        for lang in self.LANG_CODES:
+            file_field = getattr(self, f'question_file_{lang}')
+            old_hash = getattr(self, f'file_hash_{lang}')
+            if not file_field:
+                new_hash = ''
+            elif not file_field._committed:
+                # Bir xil kontent ikkinchi marta yozilmaydi - fayl mavjud blobga ishora qiladi
+                file_field.name, new_hash = QuestionBlob.store(file_field.file)
+                file_field._committed = True
+            elif file_field.name != loaded_names.get(lang) or not old_hash:
+                # Blob nomining o'zi kontent hashi - faylni qayta o'qish shart emas
+                new_hash = QuestionBlob.sha_from_name(file_field.name)
+                if not new_hash:
+                    from .utils import compute_file_hash
+                    new_hash = compute_file_hash(file_field)
+            else:
+                continue
+            if new_hash != old_hash:
+                setattr(self, f'file_hash_{lang}', new_hash)
+                changed_langs.append(lang)
+        return changed_langs
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        files_updated = update_fields is None or any(f.startswith('question_file_') for f in update_fields)
+        old_names = dict(getattr(self, '_loaded_file_names', {}))
+        if files_updated:
+            changed_langs = self.update_file_hashes()
+            if update_fields is not None and changed_langs:
+                kwargs['update_fields'] = set(update_fields) | {f'file_hash_{lang}' for lang in changed_langs}
+        else:
+            changed_langs = []
+        self._changed_file_langs = changed_langs # post_save signal render navbatini shunga qarab qo'yadi
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            new_names = {lang: getattr(self, f'question_file_{lang}').name for lang in self.LANG_CODES}
+            if files_updated:
+                # Almashtirilgan fayllar bloblarining havolalar sonini yangilash
+                replaced = [
+                    lang for lang in self.LANG_CODES
+                    if (adding or lang in old_names) and new_names[lang] != old_names.get(lang)
+                ]
+                QuestionBlob.acquire(QuestionBlob.count_names(new_names[lang] for lang in replaced))
+                QuestionBlob.release(QuestionBlob.count_names(old_names.get(lang) for lang in replaced))
+        self._loaded_file_names = new_names
+
+    def get_question_html_for_current_lang(self):
+        """
+        Joriy til uchun savolning HTML ko'rinishini qaytaradi.
+        HTML fayl hashi bo'yicha RenderedQuestionFile jadvalidan olinadi, topilmasa
+        bir marta render qilinib saqlanadi.
+        """
+        lang = self.get_question_lang_for_current_lang()
+        if not lang:
+            return None
+        file_field = getattr(self, f'question_file_{lang}')
+        content_hash = getattr(self, f'file_hash_{lang}')
+        if not content_hash:
+            # Eski yozuvlar uchun hash birinchi murojaatda hisoblanadi
+            from .utils import compute_file_hash
+            content_hash = compute_file_hash(file_field)
+            setattr(self, f'file_hash_{lang}', content_hash)
+            Question.objects.filter(pk=self.pk).update(**{f'file_hash_{lang}': content_hash})
+        return RenderedQuestionFile.get_html(file_field, content_hash)
+
     def __str__(self):
         # Qaysidir tildagi fayl nomini ko'rsatish (agar bo'lsa)
         file_to_show = self.get_question_file_for_current_lang()
@@ -339,6 +460,219 @@ class Question(models.Model):
         verbose_name_plural = _("Savollar")
         ordering = ['subject', '-created_at']
 
+class RenderedQuestionFile(models.Model):
+    """Savol DOCX faylining oldindan render qilingan HTML ko'rinishi (fayl kontenti hashi bo'yicha)."""
+    content_hash = models.CharField(max_length=64, unique=True, verbose_name=_("Kontent hashi (SHA-256)"))
+    html = models.TextField(verbose_name=_("HTML"))
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @classmethod
+    def render(cls, file_field, content_hash):
+        """
+        Hash bo'yicha HTML ni qaytaradi, topilmasa faylni render qilib saqlaydi.
+        Render xatosi exception sifatida chiqadi (xato natijasi keshga yozilmaydi).
+        """
+        html = cls.objects.filter(content_hash=content_hash).values_list('html', flat=True).first()
+        if html is not None:
+            return html
+        from .utils import render_docx_to_html
+        html = render_docx_to_html(file_field)
+        try:
+            with transaction.atomic():
+                cls.objects.create(content_hash=content_hash, html=html)
+        except IntegrityError:
+            pass # Parallel so'rov (yoki fon worker) allaqachon saqlagan
+        return html
+
+    @classmethod
+    def get_html(cls, file_field, content_hash):
+        """render() bilan bir xil, lekin xatolik bo'lsa foydalanuvchiga ko'rsatiladigan HTML qaytaradi."""
+        try:
+            return cls.render(file_field, content_hash)
+        except Exception as e:
+            # Keyingi murojaatda qayta urinib ko'riladi
+            logger.error(f"Savol faylini HTML ga o'tkazishda xatolik ({file_field.name}): {e}")
+            return "<p>Error displaying question.</p>"
+
+    @classmethod
+    def html_for_questions(cls, questions):
+        """
+        Savollar ro'yxati uchun joriy tildagi HTML larni {question_id: html} ko'rinishida qaytaradi.
+        Keshdagilar bitta so'rov bilan olinadi, topilmaganlari render qilinadi.
+        """
+        hashes_by_question = {}
+        for question in questions:
+            lang = question.get_question_lang_for_current_lang()
+            if lang:
+                hashes_by_question[question.id] = (question, lang, getattr(question, f'file_hash_{lang}'))
+
+        cached = dict(
+            cls.objects.filter(content_hash__in={h for _q, _l, h in hashes_by_question.values() if h})
+            .values_list('content_hash', 'html')
+        )
+        html_by_question = {}
+        for question_id, (question, lang, content_hash) in hashes_by_question.items():
+            if content_hash in cached:
+                html_by_question[question_id] = cached[content_hash]
+            else:
+                html_by_question[question_id] = question.get_question_html_for_current_lang()
+        return html_by_question
+
+    def __str__(self):
+        return self.content_hash
+
+    class Meta:
+        verbose_name = _("Render qilingan savol fayli")
+        verbose_name_plural = _("Render qilingan savol fayllari")
+
+
+class QuestionBlob(models.Model):
+    """
+    Savol DOCX fayli kontent bo'yicha (SHA-256) bir marta saqlanadi: question_blobs/<hash[:2]>/<hash>.docx.
+    Bir xil kontentli savol fayllari (qayta yuklangan bank, create_test_data) bitta faylga ishora qiladi;
+    ref_count - unga ishora qilayotgan savol fayllari soni, 0 ga tushsa fayl o'chiriladi.
+    """
+    BLOB_DIR = 'question_blobs'
+
+    sha256 = models.CharField(max_length=64, unique=True, verbose_name=_("Kontent hashi (SHA-256)"))
+    size = models.PositiveIntegerField(default=0, verbose_name=_("Hajmi (bayt)"))
+    ref_count = models.PositiveIntegerField(default=0, verbose_name=_("Havolalar soni"))
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @classmethod
+    def path_for(cls, sha256):
+        return f'{cls.BLOB_DIR}/{sha256[:2]}/{sha256}.docx'
+
+    @classmethod
+    def sha_from_name(cls, name):
+        """Fayl nomi blob bo'lsa uning hashini, aks holda (eski subjects/... fayllar) None qaytaradi."""
+        if not name or not name.startswith(f'{cls.BLOB_DIR}/'):
+            return None
+        return os.path.splitext(os.path.basename(name))[0]
+
+    @classmethod
+    def storage(cls):
+        return Question._meta.get_field('question_file_uz').storage
+
+    @classmethod
+    def _write(cls, sha256, content):
+        """Blob faylini yozadi (allaqachon bo'lsa yozmaydi)."""
+        from django.core.files.base import ContentFile
+        storage = cls.storage()
+        name = cls.path_for(sha256)
+        if storage.exists(name):
+            return name
+        saved_name = storage.save(name, ContentFile(content))
+        if saved_name != name:
+            # Parallel yozuvchi bizdan oldin saqladi - storage qo'shimcha nom bergan nusxani o'chiramiz
+            storage.delete(saved_name)
+        return name
+
+    @classmethod
+    def store_many(cls, contents, max_workers=8):
+        """
+        contents: {sha256: bytes}. Bazada yo'q bloblarni (parallel) yozadi va ref_count=0 bilan yaratadi.
+        Havolalar keyin acquire() bilan qo'shiladi. Yangi yaratilgan hashlar ro'yxatini qaytaradi.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        existing = set(cls.objects.filter(sha256__in=contents).values_list('sha256', flat=True))
+        missing = [sha for sha in contents if sha not in existing]
+        if not missing:
+            return []
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='question-blob') as executor:
+            list(executor.map(lambda sha: cls._write(sha, contents[sha]), missing))
+        cls.objects.bulk_create(
+            [cls(sha256=sha, size=len(contents[sha])) for sha in missing],
+            ignore_conflicts=True, # Parallel yuklash shu blobni allaqachon yaratgan bo'lishi mumkin
+        )
+        return missing
+
+    @classmethod
+    def store(cls, file):
+        """Saqlanmagan faylni (UploadedFile, ContentFile) blob sifatida yozadi; (nom, sha256) qaytaradi."""
+        file.seek(0)
+        content = file.read()
+        sha256 = hashlib.sha256(content).hexdigest()
+        cls.store_many({sha256: content})
+        return cls.path_for(sha256), sha256
+
+    @classmethod
+    def acquire(cls, counts):
+        """counts: {sha256: n} - har bir blob ref_count ini n ga oshiradi (bir xil n lar bitta UPDATE bilan)."""
+        by_count = {}
+        for sha256, n in counts.items():
+            by_count.setdefault(n, []).append(sha256)
+        for n, hashes in by_count.items():
+            updated = cls.objects.filter(sha256__in=hashes).update(ref_count=F('ref_count') + n)
+            if updated < len(hashes):
+                # Blob shu orada release() da o'chirilgan bo'lsa - yozuv qayta yaratiladi (fayl on_commit da saqlanib qoladi)
+                found = set(cls.objects.filter(sha256__in=hashes).values_list('sha256', flat=True))
+                for sha256 in set(hashes) - found:
+                    blob, created = cls.objects.get_or_create(sha256=sha256, defaults={'ref_count': n})
+                    if not created:
+                        cls.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + n)
+
+    @classmethod
+    def release(cls, counts):
+        """counts: {sha256: n} - ref_count ni kamaytiradi; havolasi qolmagan bloblar va ularning fayllari o'chiriladi."""
+        for sha256, n in counts.items():
+            cls.objects.filter(sha256=sha256).update(ref_count=Greatest(F('ref_count') - n, 0))
+        cls.delete_unreferenced(list(counts))
+
+    @classmethod
+    def delete_unreferenced(cls, hashes):
+        """ref_count=0 bo'lgan bloblarni o'chiradi; fayllar commit dan keyin, yozuv qayta paydo bo'lmagan bo'lsa o'chiriladi."""
+        orphaned = list(cls.objects.filter(sha256__in=hashes, ref_count=0).values_list('sha256', flat=True))
+        if not orphaned:
+            return
+        cls.objects.filter(sha256__in=orphaned, ref_count=0).delete()
+
+        def delete_files():
+            revived = set(cls.objects.filter(sha256__in=orphaned).values_list('sha256', flat=True))
+            storage = cls.storage()
+            for sha256 in orphaned:
+                if sha256 not in revived:
+                    storage.delete(cls.path_for(sha256))
+
+        transaction.on_commit(delete_files)
+
+    @staticmethod
+    def count_names(names):
+        """Fayl nomlari ro'yxatidan blob hashlari bo'yicha {sha256: n} (eski, blob bo'lmagan fayllar hisobga olinmaydi)."""
+        counts = {}
+        for name in names:
+            sha256 = QuestionBlob.sha_from_name(name)
+            if sha256:
+                counts[sha256] = counts.get(sha256, 0) + 1
+        return counts
+
+    def __str__(self):
+        return f"{self.sha256} ({self.ref_count})"
+
+    class Meta:
+        verbose_name = _("Savol fayli (blob)")
+        verbose_name_plural = _("Savol fayllari (bloblar)")
+
+
+class QuestionPoolGeneration(models.Model):
+    """
+    Savol poollari keshining avlodi (bitta qator). Fan yoki savol o'zgarganda oshiriladi; kesh kalitlari shu raqamni
+    o'z ichiga oladi. Raqam bazada turgani uchun lokal (LocMem) keshli har bir worker jarayoni o'zgarishni darhol ko'radi.
+    """
+    value = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def current(cls):
+        return cls.objects.filter(pk=1).values_list('value', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls):
+        if not cls.objects.filter(pk=1).update(value=F('value') + 1):
+            obj, created = cls.objects.get_or_create(pk=1, defaults={'value': 1})
+            if not created:
+                cls.objects.filter(pk=1).update(value=F('value') + 1)
+
+
 class Test(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='tests', on_delete=models.CASCADE, verbose_name=_("Foydalanuvchi")) # AUTH_USER_MODEL = 'core.User'
     # `date` -> `started_at` va `completed_at` ga ajratish mumkin
@@ -348,6 +682,8 @@ class Test(models.Model):
     score = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name=_("Natija (ball)"))
     # Testga berilgan savollar (M2M)
     questions = models.ManyToManyField(Question, related_name='tests', verbose_name=_("Berilgan savollar"))
+    # Savollar soni (test yaratilganda yoziladi) - eksport va ro'yxatlarda har bir test uchun COUNT so'rovi qilinmasligi uchun
+    total_questions = models.PositiveSmallIntegerField(default=0, verbose_name=_("Savollar soni"))
     # Foydalanuvchining javoblari (JSON yoki alohida modelda saqlash mumkin)
     # Hozircha sodda qilamiz, natijani saqlaymiz xolos.
     # Agar har bir savolga berilgan javobni saqlash kerak bo'lsa, TestAttempt kabi model kerak.
@@ -368,4 +704,247 @@ class Test(models.Model):
         verbose_name_plural = _("Testlar")
         # Bir foydalanuvchi bitta fandan faqat bir marta (natijali) test topshirishi mumkin (agar shart bo'lsa)
         # unique_together = [['user', 'subject']] # Agar qayta topshirish mumkin bo'lmasa
-        ordering = ['-started_at']
\ No newline at end of file
+        ordering = ['-started_at']
+
+class TestAnswer(models.Model):
+    """Test davomida berilgan javob (har bir savol uchun bitta kichik yozuv, sessionda saqlanmaydi)."""
+    test = models.ForeignKey(Test, related_name='answers', on_delete=models.CASCADE, verbose_name=_("Test"))
+    question = models.ForeignKey(Question, related_name='+', on_delete=models.CASCADE, verbose_name=_("Savol"))
+    answer = models.CharField(max_length=1, choices=Question.ANSWER_CHOICES, verbose_name=_("Javob"))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def save_answers(cls, test_id, answers):
+        """{question_id: answer} javoblarni bitta so'rov bilan upsert qiladi."""
+        if not answers:
+            return
+        cls.objects.bulk_create(
+            [cls(test_id=test_id, question_id=int(question_id), answer=answer) for question_id, answer in answers.items()],
+            update_conflicts=True,
+            unique_fields=['test', 'question'],
+            update_fields=['answer', 'updated_at'],
+        )
+
+    @classmethod
+    def answers_for_test(cls, test_id):
+        """Testning barcha javoblarini bitta so'rov bilan {"<question_id>": answer} ko'rinishida qaytaradi."""
+        return {
+            str(question_id): answer
+            for question_id, answer in cls.objects.filter(test_id=test_id).values_list('question_id', 'answer')
+        }
+
+    def __str__(self):
+        return f"{self.test_id}:{self.question_id}={self.answer}"
+
+    class Meta:
+        verbose_name = _("Test javobi")
+        verbose_name_plural = _("Test javoblari")
+        constraints = [
+            models.UniqueConstraint(fields=['test', 'question'], name='unique_test_answer'),
+        ]
+
+
+class ResultDelivery(models.Model):
+    """
+    Test natijasini (voucher rasmi yoki matn) Telegramga yuborish uchun outbox yozuvi.
+    SubmitTestView tranzaksiyasi ichida yaratiladi, yuborish esa commitdan keyin alohida worker da bajariladi.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, _("Navbatda")),
+        (STATUS_SENDING, _("Yuborilmoqda")),
+        (STATUS_SENT, _("Yuborildi")),
+        (STATUS_FAILED, _("Xatolik")),
+    ]
+
+    test = models.OneToOneField(Test, related_name='result_delivery', on_delete=models.CASCADE, verbose_name=_("Test"))
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True, verbose_name=_("Holati"))
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name=_("Urinishlar soni"))
+    # Keyingi urinish vaqti; 'sending' holatida bu worker ijarasi (lease) tugash vaqti
+    next_attempt_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name=_("Keyingi urinish vaqti"))
+    last_error = models.TextField(blank=True, default='', verbose_name=_("Oxirgi xato"))
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Yuborilgan vaqti"))
+
+    def __str__(self):
+        return f"{self.test_id} ({self.status})"
+
+    class Meta:
+        verbose_name = _("Natija yuborish navbati")
+        verbose_name_plural = _("Natija yuborish navbati")
+        ordering = ['next_attempt_at']
+
+
+class BulkUploadJob(models.Model):
+    """
+    Savollarni DOCX banklardan ommaviy yuklash vazifasi: admin formasi faqat fayllarni saqlab vazifa yaratadi,
+    ajratish va saqlash esa worker poolda bajariladi (core.bulk_upload). Jarayon admin sahifasida ko'rsatiladi.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, _("Navbatda")),
+        (STATUS_RUNNING, _("Bajarilmoqda")),
+        (STATUS_DONE, _("Tayyor")),
+        (STATUS_FAILED, _("Xatolik")),
+    ]
+    # 'running' vazifa shuncha vaqt heartbeat_at ni yangilamasa, worker o'lgan (server qayta ishga tushgan) hisoblanadi
+    # va vazifani boshqa worker qaytadan boshlaydi (core.tasks.sweep_bulk_upload_jobs). Ishlayotgan worker
+    # heartbeat_at ni har HEARTBEAT_SECONDS da alohida oqimdan yangilaydi - uzoq ajratish bosqichida ham
+    LEASE_SECONDS = 600
+    HEARTBEAT_SECONDS = 60
+
+    subject = models.ForeignKey(Subject, related_name='bulk_upload_jobs', on_delete=models.CASCADE, verbose_name=_("Fan"))
+    file_uz = models.FileField(upload_to='bulk_uploads/%Y/%m/', null=True, blank=True, verbose_name=_("Savollar fayli (O'zbekcha, DOCX)"))
+    file_kaa = models.FileField(upload_to='bulk_uploads/%Y/%m/', null=True, blank=True, verbose_name=_("Savollar fayli (Qoraqalpoqcha, DOCX)"))
+    file_ru = models.FileField(upload_to='bulk_uploads/%Y/%m/', null=True, blank=True, verbose_name=_("Savollar fayli (Ruscha, DOCX)"))
+    answers_string = models.CharField(max_length=500, verbose_name=_("Javoblar ketma-ketligi"))
+    delimiter = models.CharField(max_length=10, default='###', verbose_name=_("Savol ajratuvchi belgi"))
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True, verbose_name=_("Holati"))
+    # Jarayon: har bir til fayli ajratilgach sections_parsed oshadi, har bir paket commit qilingach questions_saved
+    sections_parsed = models.PositiveIntegerField(default=0, verbose_name=_("Ajratilgan bo'limlar"))
+    questions_total = models.PositiveIntegerField(default=0, verbose_name=_("Jami savollar"))
+    questions_saved = models.PositiveIntegerField(default=0, verbose_name=_("Saqlangan savollar"))
+    errors = models.TextField(blank=True, default='', verbose_name=_("Xatolar"))
+    # Shu vazifa saqlagan savollar: vazifa yarmida to'xtab qolsa, qayta boshlashdan oldin ular o'chiriladi
+    question_ids = models.JSONField(default=list, blank=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Yaratilgan vaqti"))
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Boshlangan vaqti"))
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Oxirgi faollik"))
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Yakunlangan vaqti"))
+
+    def __str__(self):
+        return f"{_('Ommaviy yuklash')} #{self.pk} ({self.status})"
+
+    @classmethod
+    def resumable(cls):
+        """Worker olmagan (pending) yoki ijarasi tugagan (to'xtab qolgan running) vazifalar."""
+        expired = timezone.now() - timedelta(seconds=cls.LEASE_SECONDS)
+        return cls.objects.filter(
+            Q(status=cls.STATUS_PENDING) | Q(status=cls.STATUS_RUNNING, heartbeat_at__lt=expired)
+        )
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+
+    @property
+    def progress_percent(self):
+        if self.status == self.STATUS_DONE:
+            return 100
+        if not self.questions_total:
+            return 0
+        return min(99, self.questions_saved * 100 // self.questions_total)
+
+    def claim(self):
+        """
+        pending (yoki ijarasi tugagan running) -> running, shartli UPDATE bilan: vazifa ikki marta
+        navbatga qo'yilsa ham bir vaqtda faqat bitta worker bajaradi.
+        """
+        now = timezone.now()
+        claimed = BulkUploadJob.resumable().filter(pk=self.pk).update(
+            status=self.STATUS_RUNNING, started_at=now, heartbeat_at=now,
+        )
+        if claimed:
+            self.refresh_from_db()
+        return bool(claimed)
+
+    def _update_progress(self, **fields):
+        # Jarayon ustunlari darhol (alohida UPDATE bilan) yoziladi - admin sahifasi ularni yangilab turadi
+        for name, value in fields.items():
+            setattr(self, name, value)
+        BulkUploadJob.objects.filter(pk=self.pk).update(**fields)
+
+    def _heartbeat(self):
+        """Ijarani uzaytiradi (core.workers.repeat_while_running oqimidan chaqiriladi)."""
+        BulkUploadJob.objects.filter(pk=self.pk, status=self.STATUS_RUNNING).update(heartbeat_at=timezone.now())
+
+    def _discard_previous_run(self):
+        """Oldingi (to'xtab qolgan) urinish saqlagan savollarni o'chiradi va jarayonni boshidan boshlaydi."""
+        from .bulk_upload import discard_questions
+        if self.question_ids:
+            logger.warning(f"Ommaviy yuklash #{self.pk}: oldingi urinishdan qolgan {len(self.question_ids)} ta savol o'chirilmoqda.")
+            discard_questions(self.question_ids)
+        self._update_progress(sections_parsed=0, questions_total=0, questions_saved=0, question_ids=[])
+
+    def delete_uploaded_files(self):
+        """Vazifa tugagach yuklangan xom DOCX fayllar kerak emas."""
+        for lang in Question.LANG_CODES:
+            file_field = getattr(self, f'file_{lang}')
+            if file_field:
+                try:
+                    file_field.delete(save=False) # Muvaffaqiyatli bo'lsagina maydon tozalanadi
+                except OSError as e:
+                    # Maydon fayl nomini saqlab qoladi - fayl yetim bo'lib qolmaydi, keyin qo'lda o'chirish mumkin
+                    logger.error(f"Ommaviy yuklash #{self.pk} faylini o'chirishda xatolik ({file_field.name}): {e}")
+
+    def read_files(self):
+        """{lang: docx_bytes} - faqat yuklangan tillar."""
+        files = {}
+        for lang in Question.LANG_CODES:
+            file_field = getattr(self, f'file_{lang}')
+            if file_field:
+                with file_field.open('rb') as f:
+                    files[lang] = f.read()
+        return files
+
+    def run(self):
+        """Fayllarni ajratib savollarni saqlaydi (worker threadda chaqiriladi)."""
+        from .workers import repeat_while_running
+
+        if not self.claim():
+            return False
+        with repeat_while_running(self.HEARTBEAT_SECONDS, self._heartbeat):
+            self._process()
+        self.delete_uploaded_files()
+        self.finished_at = timezone.now()
+        self.save(update_fields=[
+            'status', 'questions_saved', 'question_ids', 'errors', 'finished_at', 'file_uz', 'file_kaa', 'file_ru',
+        ])
+        return self.status == self.STATUS_DONE
+
+    def _process(self):
+        """Ajratish va saqlash; natija status, questions_saved, question_ids va errors ga yoziladi."""
+        from .bulk_upload import bulk_upload_questions, discard_questions
+
+        self._discard_previous_run()
+
+        def on_split(lang, parsed, error):
+            self._update_progress(
+                sections_parsed=self.sections_parsed + len(parsed),
+                questions_total=max(self.questions_total, len(parsed)),
+            )
+
+        def on_saved(created):
+            self._update_progress(questions_saved=len(created), question_ids=[question.pk for question in created])
+
+        try:
+            saved_count, errors = bulk_upload_questions(
+                self.subject, self.read_files(), self.answers_string, self.delimiter,
+                on_split=on_split, on_saved=on_saved,
+            )
+            self.questions_saved = saved_count
+            self.errors = "\n".join(errors)
+            self.status = self.STATUS_FAILED if errors else self.STATUS_DONE
+        except Exception as e:
+            logger.error(f"Ommaviy yuklash #{self.pk} da xatolik: {e}", exc_info=True)
+            self.errors = str(e)[:1000]
+            self.status = self.STATUS_FAILED
+            # Saqlangan paketlar bulk_upload ichida bekor qilinadi; u yerda o'chirish ham muvaffaqiyatsiz bo'lgan
+            # bo'lsa, question_ids saqlanib qoladi (qaysi savollar qolgani ma'lum bo'lishi uchun)
+            try:
+                discard_questions(self.question_ids)
+            except Exception as discard_error:
+                logger.error(f"Ommaviy yuklash #{self.pk}: saqlangan savollarni o'chirib bo'lmadi: {discard_error}")
+            else:
+                self.questions_saved, self.question_ids = 0, []
+
+    class Meta:
+        verbose_name = _("Ommaviy yuklash")
+        verbose_name_plural = _("Ommaviy yuklashlar")
+        ordering = ['-created_at']
@@ -0,0 +1,145 @@
+# core/question_pool.py
+# Test uchun savol tanlashda ishlatiladigan, keshda saqlanadigan savol "pool"lari.
+# Pool: fan bo'yicha testga tushishi mumkin bo'lgan aktiv savollar ID lari ro'yxati. Savol joriy tilda fayli
+# bo'lmasa boshqa tildagisi ko'rsatiladi, shuning uchun pool tilga bog'liq emas.
+# Barcha kesh kalitlari bazadagi avlod raqamini (QuestionPoolGeneration) o'z ichiga oladi: fan yoki savol
+# o'zgarganda raqam oshiriladi (signals.py) va har bir jarayon (lokal LocMem keshda ham) eski yozuvlarni darhol tashlaydi.
+# Avlod o'qilgandan keyin o'zgargan savollar uchun tanlangan ID lar bazada qayta tekshiriladi.
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import Question, QuestionPoolGeneration, Subject
+
+POOL_TIMEOUT = getattr(settings, 'QUESTION_POOL_TIMEOUT', 60 * 60)
+
+
+def normalize_lang(lang):
+    return lang if lang in Question.LANG_CODES else 'uz'
+
+
+def eligible_question_filter(prefix=''):
+    """
+    Question.get_question_lang_for_current_lang() mantiqining SQL ko'rinishi: joriy til fayli bo'lmasa
+    uz, kaa, ru dan biri ko'rsatiladi, ya'ni kamida bitta tilda fayli bor savol har qanday tilda testga tushadi.
+    prefix - boshqa modeldan murojaat uchun (masalan, 'questions__').
+    """
+    condition = Q()
+    for code in Question.LANG_CODES:
+        condition |= Q(**{f'{prefix}question_file_{code}__gt': ''})
+    return condition
+
+
+def _pool_key(subject_id, generation):
+    return f"question_pool:{generation}:{subject_id}"
+
+
+def _generation():
+    return QuestionPoolGeneration.current()
+
+
+def bump_generation():
+    """Fan yoki savol o'zgarganda barcha jarayonlardagi poollar, fanlar ro'yxati va eligibility summary keshlarini eskirtiradi."""
+    QuestionPoolGeneration.bump()
+
+
+def get_subject_ids_for_course(course_year):
+    """Berilgan kurs uchun aktiv fanlar ID lari (keshlangan)."""
+    key = f"question_pool:subjects:{_generation()}:{course_year}"
+    subject_ids = cache.get(key)
+    if subject_ids is None:
+        subject_ids = list(
+            Subject.objects.filter(
+                is_active=True,
+                min_course_year__lte=course_year,
+                max_course_year__gte=course_year
+            ).order_by('id').values_list('id', flat=True)
+        )
+        cache.set(key, subject_ids, POOL_TIMEOUT)
+    return subject_ids
+
+
+def get_question_pools(subject_ids):
+    """
+    {subject_id: [question_id, ...]} qaytaradi. Keshda bo'lmagan poollar bitta so'rov bilan
+    to'ldiriladi, shuning uchun fanlar soniga qaramay so'rovlar soni o'zgarmaydi.
+    """
+    generation = _generation()
+    keys = {subject_id: _pool_key(subject_id, generation) for subject_id in subject_ids}
+    cached = cache.get_many(keys.values())
+    pools = {subject_id: cached[key] for subject_id, key in keys.items() if key in cached}
+
+    missing_subject_ids = [subject_id for subject_id in subject_ids if subject_id not in pools]
+    if missing_subject_ids:
+        filled = {subject_id: [] for subject_id in missing_subject_ids}
+        rows = Question.objects.filter(
+            subject_id__in=missing_subject_ids, is_active=True
+        ).filter(eligible_question_filter()).values_list('subject_id', 'id')
+        for subject_id, question_id in rows:
+            filled[subject_id].append(question_id)
+        cache.set_many({keys[subject_id]: ids for subject_id, ids in filled.items()}, POOL_TIMEOUT)
+        pools.update(filled)
+    return pools
+
+
+def refresh_subject_pools(subject_id):
+    """Fan poolini qayta hisoblab joriy avlod kalitiga yozadi va uni qaytaradi."""
+    pool = list(
+        Question.objects.filter(subject_id=subject_id, is_active=True)
+        .filter(eligible_question_filter()).values_list('id', flat=True)
+    )
+    cache.set(_pool_key(subject_id, _generation()), pool, POOL_TIMEOUT)
+    return pool
+
+
+def _sample(pool, questions_per_subject):
+    if len(pool) >= questions_per_subject:
+        return random.sample(pool, questions_per_subject)
+    return list(pool)
+
+
+def sample_question_ids(course_year, questions_per_subject):
+    """
+    Har bir mos fandan tasodifiy questions_per_subject ta savol ID sini tanlaydi.
+    Tanlanganlar bazada tekshiriladi: pool o'qilgandan keyin o'chirilgan yoki o'chirib qo'yilgan savol topilsa, o'sha fanlarning pooli bazadan qayta olinib, qaytadan tanlanadi.
+    """
+    subject_ids = get_subject_ids_for_course(course_year)
+    pools = get_question_pools(subject_ids)
+    selected = {subject_id: _sample(pools.get(subject_id, []), questions_per_subject) for subject_id in subject_ids}
+
+    sampled_ids = [question_id for ids in selected.values() for question_id in ids]
+    valid_ids = set(
+        Question.objects.filter(pk__in=sampled_ids, is_active=True)
+        .filter(eligible_question_filter()).values_list('id', flat=True)
+    )
+    for subject_id, ids in selected.items():
+        if any(question_id not in valid_ids for question_id in ids):
+            selected[subject_id] = _sample(refresh_subject_pools(subject_id), questions_per_subject)
+    return [question_id for subject_id in subject_ids for question_id in selected[subject_id]]
+
+
+def get_eligibility_summary(course_year, lang):
+    """
+    Kurs va til uchun [(fan nomi, mavjud savollar soni), ...] ro'yxati.
+    Barcha fanlar bo'yicha sonlar bitta annotatsiyalangan so'rov bilan hisoblanadi va keshlanadi.
+    Fan nomi joriy aktiv tilda olinadi, shuning uchun tilni oldindan activate() qilish kerak.
+    """
+    # Savollar soni tilga bog'liq emas, lekin fan nomlari joriy tilda - shuning uchun til kalitda qoladi
+    key = f"question_pool:summary:{_generation()}:{course_year}:{normalize_lang(lang)}"
+    summary = cache.get(key)
+    if summary is None:
+        subjects = Subject.objects.filter(
+            is_active=True,
+            min_course_year__lte=course_year,
+            max_course_year__gte=course_year
+        ).annotate(
+            available_questions=Count(
+                'questions',
+                filter=Q(questions__is_active=True) & eligible_question_filter(prefix='questions__')
+            )
+        ).filter(available_questions__gt=0).only('name_uz', 'name_kaa', 'name_ru')
+        summary = [(subject.get_localized_name(), subject.available_questions) for subject in subjects]
+        cache.set(key, summary, POOL_TIMEOUT)
+    return summary
@@ -0,0 +1,54 @@
+# core/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import question_pool
+from .models import Question, QuestionBlob, Subject
+from .tasks import render_question_files
+from .workers import submit_on_commit
+
+
+@receiver(post_save, sender=Question)
+def schedule_question_render(sender, instance, created, raw=False, **kwargs):
+    """Yangi yoki fayli o'zgargan savolni fonda render qilish uchun navbatga qo'yadi."""
+    if raw:
+        return # loaddata paytida ishlamaydi
+    if not created and not getattr(instance, '_changed_file_langs', None):
+        return
+    if not created:
+        Question.objects.filter(pk=instance.pk).update(render_status=Question.RENDER_PENDING, render_error='')
+    submit_on_commit(render_question_files, instance.pk)
+
+
+@receiver(post_delete, sender=Question)
+def release_question_blobs(sender, instance, **kwargs):
+    """O'chirilgan savol fayllari bloblarining havolalar sonini kamaytiradi (havolasiz bloblar o'chiriladi)."""
+    QuestionBlob.release(QuestionBlob.count_names(
+        getattr(instance, f'question_file_{lang}').name for lang in Question.LANG_CODES
+    ))
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def refresh_question_pools(sender, instance, raw=False, **kwargs):
+    """Savol qo'shilsa/o'zgarsa/o'chirilsa, faqat tegishli fan(lar)ning poollarini yangilaydi."""
+    if raw:
+        return
+    subject_ids = {instance.subject_id, getattr(instance, '_loaded_subject_id', None)} - {None}
+
+    def refresh():
+        question_pool.bump_generation() # Fanlar bo'yicha savollar soni (eligibility summary) ham o'zgardi
+        for subject_id in subject_ids:
+            question_pool.refresh_subject_pools(subject_id) # Yangi avlod kalitiga oldindan yoziladi
+
+    transaction.on_commit(refresh)
+
+
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+def invalidate_subject_lists(sender, raw=False, **kwargs):
+    """Fan faolligi, nomi yoki kurs oralig'i o'zgarganda fanlar ro'yxati va summary keshini eskirtiradi."""
+    if raw:
+        return
+    transaction.on_commit(question_pool.bump_generation)
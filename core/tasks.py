@@ -0,0 +1,79 @@
+# core/tasks.py
+# Worker poolda (core.workers) bajariladigan fon vazifalari.
+import logging
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import BulkUploadJob, Question, RenderedQuestionFile
+from .utils import compute_file_hash
+
+logger = logging.getLogger(__name__)
+
+
+def render_question_files(question_id):
+    """
+    Savolning barcha til fayllarini HTML ga render qiladi (rasmlar media papkaga chiqariladi)
+    va natijani RenderedQuestionFile keshiga yozadi. Statusni Question.render_status da yangilaydi.
+    """
+    updated = Question.objects.filter(pk=question_id).update(render_status=Question.RENDER_PROCESSING)
+    if not updated:
+        return # Savol o'chirilgan
+    question = Question.objects.get(pk=question_id)
+
+    errors = []
+    for lang in Question.LANG_CODES:
+        file_field = getattr(question, f'question_file_{lang}')
+        if not file_field:
+            continue
+        content_hash = getattr(question, f'file_hash_{lang}')
+        try:
+            if not content_hash:
+                content_hash = compute_file_hash(file_field)
+                Question.objects.filter(pk=question_id).update(**{f'file_hash_{lang}': content_hash})
+            RenderedQuestionFile.render(file_field, content_hash)
+        except Exception as e:
+            logger.error(f"Savol {question_id} ({lang}) faylini render qilishda xatolik: {e}")
+            errors.append(f"{lang.upper()}: {e}")
+
+    Question.objects.filter(pk=question_id).update(
+        render_status=Question.RENDER_FAILED if errors else Question.RENDER_DONE,
+        render_error="\n".join(errors),
+        rendered_at=timezone.now(),
+    )
+
+
+def run_bulk_upload_job(job_id):
+    """Ommaviy yuklash vazifasini bajaradi (fon workerida). Savollar saqlansa True qaytaradi."""
+    job = BulkUploadJob.objects.select_related('subject').filter(pk=job_id).first()
+    if job is None:
+        logger.warning(f"Ommaviy yuklash vazifasi {job_id} topilmadi.")
+        return False
+    done = job.run()
+    if done:
+        logger.info(f"Ommaviy yuklash #{job_id} tayyor: {job.questions_saved} ta savol saqlandi.")
+    elif job.status == BulkUploadJob.STATUS_FAILED:
+        logger.error(f"Ommaviy yuklash #{job_id} xatolik bilan tugadi: {job.errors}")
+    return done
+
+
+def sweep_result_deliveries():
+    """Yuborish vaqti kelgan (qayta urinish yoki qayta ishga tushishdan qolib ketgan) natijalarni navbatga qo'yadi."""
+    from tgbot.utils import deliver_result_sync, get_due_result_delivery_ids
+    from .workers import submit
+    for delivery_id in get_due_result_delivery_ids():
+        submit(deliver_result_sync, delivery_id)
+
+
+def sweep_bulk_upload_jobs():
+    """Worker olmagan yoki server qayta ishga tushganda to'xtab qolgan ommaviy yuklash vazifalarini navbatga qo'yadi."""
+    from .workers import submit
+    for job_id in BulkUploadJob.resumable().values_list('pk', flat=True):
+        submit(run_bulk_upload_job, job_id)
+
+
+def start_background_sweeps():
+    """Server jarayoni ishga tushganda (CONFIG/wsgi.py, CONFIG/asgi.py) davriy fon tekshiruvlarini boshlaydi."""
+    from .workers import start_periodic
+    start_periodic('result-deliveries', getattr(settings, 'RESULT_DELIVERY_SWEEP_INTERVAL', 60), sweep_result_deliveries)
+    start_periodic('bulk-upload-jobs', getattr(settings, 'BULK_UPLOAD_SWEEP_INTERVAL', 60), sweep_bulk_upload_jobs)
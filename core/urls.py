@@ -3,14 +3,15 @@ from django.urls import path
 from .views import (
     UserRegistrationInfoFormView, some_error_page_view, registration_success_page_view,
     EducationTypeListAPIView, InstitutionListAPIView, EducationLevelListAPIView, FacultyListAPIView,
-    PrepareTestView, StartMixedTestView, TestInProgressView, SubmitTestView
+    PrepareTestView, StartMixedTestView, TestInProgressView, TestPayloadView, SubmitTestView
 )
+from .models import TestAnswer
 from django.http import HttpResponse # Vaqtinchalik view uchun
 
 # Vaqtinchalik SubmitTestView (keyinroq haqiqiysiga almashtiriladi)
 def dummy_submit_test_view(request):
     test_id = request.session.get('current_test_id')
-    user_answers = request.session.get(f'test_{test_id}_answers', {})
+    user_answers = TestAnswer.answers_for_test(test_id) if test_id else {}
     time_spent = request.session.get('time_spent_on_test', 'N/A')
 
     # Bu yerda natijalarni hisoblash va saqlash logikasi bo'ladi
@@ -24,8 +25,6 @@ def dummy_submit_test_view(request):
     
     # Sessiondagi test ma'lumotlarini tozalash (ixtiyoriy, test tugagandan keyin)
     # request.session.pop('current_test_id', None)
-    # request.session.pop('current_question_index', None)
-    # request.session.pop(f'test_{test_id}_answers', None)
     # request.session.pop('time_spent_on_test', None)
     # request.session.pop('test_submitted_for_processing', None)
 
@@ -49,6 +48,7 @@ urlpatterns = [
     path('prepare-test/', PrepareTestView.as_view(), name='prepare_test'),
     path('start-mixed-test/', StartMixedTestView.as_view(), name='start_mixed_test'),
     path('test-in-progress/', TestInProgressView.as_view(), name='test_in_progress'),
+    path('test-payload/', TestPayloadView.as_view(), name='test_payload'), # Barcha savollar bitta JSON da
     
     # Testni yakunlash/natijalarni ko'rish uchun URL (vaqtinchalik view bilan)
     path('submit-test/', SubmitTestView.as_view(), name='submit_test'),
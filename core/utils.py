@@ -6,14 +6,69 @@ from django.conf import settings
 import os
 from django.contrib.staticfiles import finders
 import zipfile
+import posixpath
+from copy import deepcopy
 from lxml import etree
 from django.utils.translation import gettext_lazy as _
 from docx import Document as DocxDocument
 import logging
-from copy import deepcopy
+import hashlib
+import threading
+import mimetypes
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 
 logger = logging.getLogger(__name__)
 
+def compute_file_hash(file_field):
+    """
+    FileField (yoki File) kontentining SHA-256 hashini qaytaradi.
+    Fayl bo'laklab o'qiladi, pointer boshiga qaytariladi.
+    """
+    if not file_field:
+        return ""
+    sha256 = hashlib.sha256()
+    file_field.open('rb')
+    try:
+        file_field.seek(0)
+        for chunk in file_field.chunks():
+            sha256.update(chunk)
+    finally:
+        file_field.seek(0)
+    return sha256.hexdigest()
+
+def render_docx_to_html(docx_file_field):
+    """
+    DOCX faylni mammoth bilan HTML ga o'tkazadi. Xatolik bo'lsa exception ko'taradi
+    (natijani keshga yozishdan oldin xatoni ajratib olish uchun).
+    """
+    docx_file_field.open('rb')
+    docx_file_field.seek(0)
+    docx_bytes = BytesIO(docx_file_field.read())
+    docx_file_field.seek(0) # Fayl pointerini boshiga qaytarish, agar qayta o'qish kerak bo'lsa
+
+    # Rasmlar base64 sifatida HTML ichiga joylashtirilmaydi, media papkaga alohida fayl qilib chiqariladi
+    # (DEBUG=False da ular CONFIG/urls.py dagi question_images yo'li yoki veb-server orqali beriladi)
+    result = mammoth.convert_to_html(docx_bytes, convert_image=mammoth.images.img_element(save_docx_image))
+    # result.messages - ogohlantirishlar (kerak bo'lsa log qilish mumkin)
+    return result.value # The raw HTML
+
+def save_docx_image(image):
+    """
+    DOCX ichidagi rasmni media/question_images/<sha256>.<ext> ga saqlaydi (bir xil rasm bir marta
+    saqlanadi) va mammoth uchun <img> atributlarini qaytaradi.
+    """
+    with image.open() as image_stream:
+        content = image_stream.read()
+    ext = mimetypes.guess_extension(image.content_type or '') or '.bin'
+    name = f"question_images/{hashlib.sha256(content).hexdigest()}{ext}"
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(content))
+    attributes = {"src": default_storage.url(name)}
+    if image.alt_text:
+        attributes["alt"] = image.alt_text
+    return attributes
+
 def convert_docx_to_html(docx_file_field):
     """
     Django FileField da saqlangan DOCX faylni HTML ga o'tkazadi.
@@ -21,82 +76,301 @@ def convert_docx_to_html(docx_file_field):
     if not docx_file_field:
         return ""
     try:
-        # Faylni BytesIO obyektiga o'qish
-        docx_bytes = BytesIO(docx_file_field.read())
-        docx_file_field.seek(0) # Fayl pointerini boshiga qaytarish, agar qayta o'qish kerak bo'lsa
-        
-        result = mammoth.convert_to_html(docx_bytes)
-        html = result.value # The raw HTML
-        # messages = result.messages # Any messages (warnings, errors)
-        return html
+        return render_docx_to_html(docx_file_field)
     except Exception as e:
         print(f"Error converting DOCX to HTML: {e}")
         return "<p>Error displaying question.</p>"
 
-def get_photo(fullname, date_str, voucher_template_filename, num_code, score):
+class VoucherRenderer:
     """
-    Generates a voucher image.
-    voucher_template_filename - 'vouchers/' papkasidagi shablon fayl nomi (masalan, 'VoucherUmumiy1.jpg')
+    Voucher rasmini chizadi. Shablon rasm (bir marta decode qilingan) va shriftlar
+    obyekt yaratilganda yuklanadi, har bir voucher uchun faqat nusxa olinib matn yoziladi.
     """
-    try:
-        # Statik fayllar qidiruvchisi orqali shablon rasmini topish
-        # Bu 'vouchers/VoucherUmumiy1.jpg' kabi yo'lni qidiradi
+    FONT_DATE_NUM_SIZE = 36
+    FONT_FULLNAME_SIZE = 24
+    LINE_SPACING = 10 # Ism-familiya qatorlari oralig'i
+
+    def __init__(self, voucher_template_filename):
+        # Statik fayllar qidiruvchisi orqali shablon rasmini topish ('vouchers/voucher.png' kabi)
         base_image_full_path = finders.find(os.path.join('vouchers', voucher_template_filename))
         if not base_image_full_path or not os.path.exists(base_image_full_path):
-            print(f"Error: Voucher template image not found: vouchers/{voucher_template_filename}")
-            return None
-        
-        image = Image.open(base_image_full_path)
-        draw = ImageDraw.Draw(image)
-
-        # Shriftlarni topish
-        font_arial_path = finders.find('fonts/arial.ttf')
-        font_fullname_path = finders.find('fonts/forFullname.ttf') # Sizning fayl nomingiz
+            raise FileNotFoundError(f"Voucher template image not found: vouchers/{voucher_template_filename}")
 
-        if not font_arial_path: font_arial_path = "arial.ttf" # Fallback
-        if not font_fullname_path: font_fullname_path = font_arial_path # Fallback
+        with Image.open(base_image_full_path) as template_image:
+            self.base_image = template_image.convert('RGB') # JPEG uchun RGB, convert() rasmni to'liq decode qiladi
 
+        # Shriftlarni topish
+        font_arial_path = finders.find('fonts/arial.ttf') or "arial.ttf" # Fallback
         try:
-            font_date_num = ImageFont.truetype(font_arial_path, 36)
-            font_fullname_obj = ImageFont.truetype(font_arial_path, 24)
+            self.font_date_num = ImageFont.truetype(font_arial_path, self.FONT_DATE_NUM_SIZE)
+            self.font_fullname = ImageFont.truetype(font_arial_path, self.FONT_FULLNAME_SIZE)
         except IOError as e:
             print(f"Warning: Fonts not found ({e}), using default.")
-            font_date_num = ImageFont.load_default()
-            font_fullname_obj = ImageFont.load_default()
-
-        # Matnlarni yozish (koordinatalar sizning shabloningizga mos bo'lishi kerak)
-        # Bu koordinatalar eski loyihadagi get_photo dan olingan
-        draw.text((250, 1500), date_str, fill="#000000", font=font_date_num)
-        draw.text((325, 679), str(num_code[1]), fill="#000000", font=font_fullname_obj)
-        draw.text((471, 713), str(num_code[0]), fill="#000000", font=font_fullname_obj)
-        draw.text((528, 1155), str(score[0]), fill="#000000", font=font_date_num)
-        draw.text((993, 1198), str(score[1])+'%', fill="#000000", font=font_date_num)
+            self.font_date_num = ImageFont.load_default()
+            self.font_fullname = ImageFont.load_default()
 
-        name, surname, patronymic = fullname 
+        # FreeType shrift obyektlari oqimlar orasida xavfsiz emas, shuning uchun chizish qulf ostida
+        self._draw_lock = threading.Lock()
 
-        # Boshlang'ich koordinatalar
-        text_x = 250  # Chapdan qancha masofada yozilsin, o'zingiz moslashtiring
-        text_y = 781  # Birinchi qatorning Y koordinatasi
+    def render(self, fullname, date_str, num_code, score):
+        """Voucherni JPEG ko'rinishida BytesIO ga yozib qaytaradi."""
+        image = self.base_image.copy()
+        draw = ImageDraw.Draw(image)
+        name, surname, patronymic = fullname
 
-        # Har bir qator uchun yozish
-        line_spacing = 10  # Qatorlar oralig'i, kerak bo‘lsa sozlang
+        with self._draw_lock:
+            # Matnlarni yozish (koordinatalar shablonga mos)
+            draw.text((250, 1500), date_str, fill="#000000", font=self.font_date_num)
+            draw.text((325, 679), str(num_code[1]), fill="#000000", font=self.font_fullname)
+            draw.text((471, 713), str(num_code[0]), fill="#000000", font=self.font_fullname)
+            draw.text((528, 1155), str(score[0]), fill="#000000", font=self.font_date_num)
+            draw.text((993, 1198), str(score[1])+'%', fill="#000000", font=self.font_date_num)
 
-        for i, text_line in enumerate([surname, name, patronymic]):
-            draw.text((text_x, text_y + i * (font_fullname_obj.size + line_spacing)),
-                    text_line.upper(), 
-                    fill="#000000",
-                    font=font_fullname_obj)
+            # Familiya, ism, otasining ismi alohida qatorlarda
+            text_x, text_y = 250, 781
+            for i, text_line in enumerate([surname, name, patronymic]):
+                draw.text((text_x, text_y + i * (self.font_fullname.size + self.LINE_SPACING)),
+                        text_line.upper(),
+                        fill="#000000",
+                        font=self.font_fullname)
 
         image_bytes = BytesIO()
         image.save(image_bytes, format='JPEG')
         image_bytes.seek(0)
         return image_bytes
 
+
+_voucher_renderers = {}
+_voucher_renderers_lock = threading.Lock()
+
+def get_voucher_renderer(voucher_template_filename):
+    """Shablon bo'yicha jarayon ichida bitta VoucherRenderer qaytaradi (birinchi chaqiruvda yaratiladi)."""
+    renderer = _voucher_renderers.get(voucher_template_filename)
+    if renderer is None:
+        with _voucher_renderers_lock:
+            renderer = _voucher_renderers.get(voucher_template_filename)
+            if renderer is None:
+                renderer = VoucherRenderer(voucher_template_filename)
+                _voucher_renderers[voucher_template_filename] = renderer
+    return renderer
+
+def get_photo(fullname, date_str, voucher_template_filename, num_code, score):
+    """
+    Generates a voucher image.
+    voucher_template_filename - 'vouchers/' papkasidagi shablon fayl nomi (masalan, 'voucher.png')
+    """
+    try:
+        return get_voucher_renderer(voucher_template_filename).render(fullname, date_str, num_code, score)
     except Exception as e:
         print(f"Error in get_photo: {e}")
         # traceback.print_exc() # Batafsil xato uchun
         return None
 
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+W_BODY = f"{{{W_NS}}}body"
+W_P = f"{{{W_NS}}}p"
+W_R = f"{{{W_NS}}}r"
+W_T = f"{{{W_NS}}}t"
+W_SECT_PR = f"{{{W_NS}}}sectPr"
+R_PREFIX = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}" # r:id, r:embed, r:link ...
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+CT_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+
+DOCUMENT_PART = "word/document.xml"
+DOCUMENT_RELS_PART = "word/_rels/document.xml.rels"
+# Asl DOCX dan har bir savol fayliga o'zgarishsiz ko'chiriladigan fayllar. Rasmlar va boshqa bog'langan
+# qismlar (word/media/ ...) esa faqat savol ularga document.xml.rels orqali murojaat qilsa qo'shiladi
+DOCX_SHARED_PARTS = {
+    "word/styles.xml", # Yoki stylesWithEffects.xml
+    "word/numbering.xml", # Raqamlangan ro'yxatlar (variantlar) uchun
+    "word/theme/theme1.xml", # Agar mavjud bo'lsa
+    "word/fontTable.xml", # Agar mavjud bo'lsa
+    "word/settings.xml", # Agar mavjud bo'lsa
+}
+_SECTION_MARKER = "docx-split-marker"
+# Arxiv ichidagi fayllar vaqti fiksirlanadi: bir xil kontent har doim bir xil baytlar (va SHA-256) beradi,
+# shunda QuestionBlob qayta yuklangan savollarni qayta yozmaydi
+DOCX_ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+def _rels_part_name(part_name):
+    """word/document.xml -> word/_rels/document.xml.rels ("" -> _rels/.rels)"""
+    directory, filename = posixpath.split(part_name)
+    return posixpath.join(directory, "_rels", f"{filename}.rels")
+
+
+def _rel_target_part(source_part, rel):
+    """Relationship Target ini arxivdagi to'liq nomga aylantiradi (tashqi havolalar uchun None)."""
+    if rel.get("TargetMode") == "External":
+        return None
+    target = rel.get("Target", "")
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join(posixpath.dirname(source_part), target))
+
+
+def _rels_xml(relationships):
+    root = etree.Element(f"{{{PKG_REL_NS}}}Relationships", nsmap={None: PKG_REL_NS})
+    for rel in relationships:
+        etree.SubElement(root, f"{{{PKG_REL_NS}}}Relationship", attrib=dict(rel.attrib))
+    return etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+
+
+def _zip_writestr(zip_file, name, data):
+    info = zipfile.ZipInfo(name, date_time=DOCX_ZIP_DATE_TIME)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.external_attr = 0o600 << 16 # writestr(name, ...) bilan bir xil ruxsatlar
+    zip_file.writestr(info, data)
+
+
+def normalize_docx_bytes(docx_bytes):
+    """
+    DOCX arxivini fiksirlangan fayl vaqtlari bilan qayta yozadi (python-docx saqlash vaqtini yozadi,
+    shuning uchun bir xil hujjat har safar boshqa hash beradi).
+    """
+    output = BytesIO()
+    with zipfile.ZipFile(BytesIO(docx_bytes), 'r') as source_zip, zipfile.ZipFile(output, 'w') as target_zip:
+        for name in source_zip.namelist():
+            _zip_writestr(target_zip, name, source_zip.read(name))
+    return output.getvalue()
+
+
+class DocxPartGraph:
+    """
+    Asl DOCX qismlari va ularning relationship lari: har bir savol uchun faqat kerakli qismlarni
+    (rasmlar, sarlavhalar va ularning o'z bog'liqliklari) tanlash va [Content_Types].xml ni filtrlash uchun.
+    """
+
+    def __init__(self, docx_zip):
+        self.docx_zip = docx_zip
+        self.names = {info.filename for info in docx_zip.infolist() if not info.is_dir()}
+        self._rels_cache = {}
+        self.ct_defaults = []
+        self.ct_overrides = {}
+        if "[Content_Types].xml" in self.names:
+            for element in etree.fromstring(docx_zip.read("[Content_Types].xml")):
+                if element.tag == f"{{{CT_NS}}}Default":
+                    self.ct_defaults.append(element)
+                elif element.tag == f"{{{CT_NS}}}Override":
+                    self.ct_overrides[element.get("PartName", "").lstrip("/")] = element
+
+    def relationships(self, part_name):
+        if part_name not in self._rels_cache:
+            rels_name = _rels_part_name(part_name)
+            self._rels_cache[part_name] = list(etree.fromstring(self.docx_zip.read(rels_name))) if rels_name in self.names else []
+        return self._rels_cache[part_name]
+
+    def related_parts(self, part_name, rel_ids=None):
+        """part_name ning (rel_ids berilsa - faqat shu ID li) relationship lari orqali rekursiv bog'langan qismlar."""
+        found = set()
+        pending = [(part_name, rel_ids)]
+        while pending:
+            source, ids = pending.pop()
+            for rel in self.relationships(source):
+                if ids is not None and rel.get("Id") not in ids:
+                    continue
+                target = _rel_target_part(source, rel)
+                if target and target in self.names and target not in found:
+                    found.add(target)
+                    pending.append((target, None))
+        return found
+
+    def content_types_xml(self, part_names):
+        """Faqat arxivga kirgan qismlar uchun Override lar qoldirilgan [Content_Types].xml."""
+        root = etree.Element(f"{{{CT_NS}}}Types", nsmap={None: CT_NS})
+        for default in self.ct_defaults:
+            root.append(deepcopy(default))
+        for part_name in sorted(part_names):
+            override = self.ct_overrides.get(part_name)
+            if override is not None:
+                root.append(deepcopy(override))
+        return etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+
+
+def split_document_xml(xml_stream, delimiter="###"):
+    """
+    word/document.xml ni iterparse bilan bir marta o'qib, delimiter bilan boshlanadigan paragraflar bo'yicha bo'laklaydi.
+    Body elementlari nusxalanmaydi: har bir bo'lak yig'ilgach elementlar bitta chiqish ildiziga ko'chiriladi,
+    serializatsiya qilinadi va tashlab yuboriladi. Natija: ([(savol XML boshi, relationship ID lari), ...], umumiy yakun) -
+    har bir savolning document.xml i = bosh + yakun (yakun - sectPr va yopuvchi teglar, bir marta serializatsiya qilinadi).
+    Qoidalar avvalgi (DOM asosidagi) ajratish bilan bir xil: matni delimiter bilan boshlanadigan paragraf yangi savolni
+    boshlaydi, birinchi delimiterdan oldingi kontent tashlanadi. Delimiter hech bir paragrafda bo'lmasa, butun body
+    bitta savol hisoblanadi; delimiter bor, lekin birorta paragraf u bilan boshlanmasa, savol ajratilmaydi
+    (bo'laklar ro'yxati bo'sh - chaqiruvchi "delimiter topilmadi" xatosini qaytaradi).
+    """
+    marker = f"<!--{_SECTION_MARKER}-->".encode()
+    out_root = out_body = body = None
+    sect_pr = None
+    sections = []
+    leading = [] # Birinchi delimiterdan oldingi elementlar (delimiter umuman topilmasa kerak bo'ladi)
+    current = None # Joriy savol elementlari; None - hali delimiter topilmagan
+    delimiter_in_text = False # Delimiter biror paragraf ichida (boshida bo'lmasa ham) uchradimi
+    depth = 0
+
+    def flush(elements):
+        if not elements:
+            return
+        rel_ids = set() # Savol murojaat qiladigan relationship lar (rasmlar r:embed, havolalar r:id, ...)
+        for element in elements:
+            for node in element.iter(tag=etree.Element):
+                for key, value in node.attrib.items():
+                    if key.startswith(R_PREFIX):
+                        rel_ids.add(value)
+            out_body.append(element) # Ko'chirish (nusxa emas)
+        out_body.append(etree.Comment(_SECTION_MARKER))
+        xml = etree.tostring(out_root, xml_declaration=True, encoding='UTF-8', standalone=True)
+        sections.append((xml[:xml.rindex(marker)], rel_ids))
+        out_body[:] = []
+
+    for event, element in etree.iterparse(xml_stream, events=("start", "end"), huge_tree=True):
+        if event == "start":
+            if depth == 0:
+                # Chiqish ildizi asl hujjat ildizining nomlar fazosi va atributlari bilan (mc:Ignorable va h.k.)
+                out_root = etree.Element(element.tag, attrib=dict(element.attrib), nsmap=element.nsmap)
+                out_body = etree.SubElement(out_root, W_BODY)
+            elif depth == 1 and element.tag == W_BODY:
+                body = element
+            depth += 1
+            continue
+
+        depth -= 1
+        if depth != 2 or element.getparent() is not body:
+            continue
+        if element.tag == W_SECT_PR:
+            sect_pr = element
+            continue
+        if element.tag == W_P:
+            text = "".join(t.text or "" for t in element.iter(W_T))
+            delimiter_in_text = delimiter_in_text or delimiter in text
+            if text.strip().startswith(delimiter):
+                if current is not None:
+                    flush(current)
+                current = []
+                body.remove(element) # Delimiter paragrafi savolga kirmaydi
+                continue
+        (leading if current is None else current).append(element)
+
+    if current is None:
+        if not delimiter_in_text:
+            flush(leading) # Faylda delimiter yo'q: butun body bitta savol
+    else:
+        flush(current)
+
+    if sect_pr is None: # Word fayli to'g'ri ochilishi uchun minimal oxirgi paragraf
+        sect_pr = etree.Element(W_P)
+        etree.SubElement(sect_pr, W_R)
+    else:
+        # Umumiy sectPr dagi sarlavha/pastki kolontitul havolalari olib tashlanadi (savol fayllariga ko'chirilmaydi)
+        for child in list(sect_pr):
+            if any(key.startswith(R_PREFIX) for key in child.attrib):
+                sect_pr.remove(child)
+    out_body.append(etree.Comment(_SECTION_MARKER))
+    out_body.append(sect_pr)
+    xml = etree.tostring(out_root, xml_declaration=True, encoding='UTF-8', standalone=True)
+    tail = xml[xml.rindex(marker) + len(marker):]
+    return sections, tail
+
+
 def split_docx_into_questions(docx_file_bytes, answers_string, delimiter="###"):
     """
     Parses DOCX file bytes, splits it by a delimiter, and associates
@@ -107,80 +381,19 @@ def split_docx_into_questions(docx_file_bytes, answers_string, delimiter="###"):
         return [], _("Fayl yuklanmagan.")
     if not answers_string:
         return [], _("Javoblar ketma-tetligi kiritilmagan.")
-    
-    print(answers_string)
-    print(f"split_docx_into_questions: Fayl hajmi: {len(docx_file_bytes)} bayt.")
-
-    # # python-docx bilan dastlabki tekshiruv (ixtiyoriy)
-    # check_stream = BytesIO(docx_file_bytes)
-    # try:
-    #     from docx import Document as DocxDocumentForCheck
-    #     DocxDocumentForCheck(check_stream)
-    #     print("Fayl python-docx tomonidan dastlabki tekshiruvdan o'tdi.")
-    # except Exception as e_check:
-    #     print(f"python-docx tekshiruvida xato: {e_check}")
-    #     # return [], _("DOCX fayl yaroqsiz (dastlabki tekshiruv).") # Agar bu xato bo'lsa, davom etmaslik mumkin
-    # finally:
-    #     check_stream.close()
-
-    # Asosiy zip faylni ochish uchun yangi BytesIO
+
+    logger.debug(f"split_docx_into_questions: Fayl hajmi: {len(docx_file_bytes)} bayt.")
+
     main_zip_stream = BytesIO(docx_file_bytes)
     try:
         with zipfile.ZipFile(main_zip_stream, 'r') as docx_zip:
             if "word/document.xml" not in docx_zip.namelist():
                 return [], _("DOCX fayl yaroqsiz (document.xml topilmadi).")
 
-            xml_content = docx_zip.read("word/document.xml")
-            original_root = etree.fromstring(xml_content) # Asl XML ildizi
-            
-            namespaces = {"w": "http://schemas.openxmlformats.org/wordprocessingml/2006/main"}
-            body_elements_from_original = original_root.xpath("//w:body/*", namespaces=namespaces)
-            
-            parsed_sections_elements = [] # Har bir section uchun elementlar ro'yxatini saqlaydi
-            current_section_elements = []
-            found_first_delimiter_or_content = False # Delimiter yoki kontent topilganini belgilash
-
-            # Faylda delimiter borligini tekshirish
-            has_delimiter_in_file = any(
-                delimiter in "".join(el.xpath(".//w:t/text()", namespaces=namespaces))
-                for el in body_elements_from_original if el.tag.endswith("p")
-            )
-
-            if not has_delimiter_in_file and body_elements_from_original:
-                # Agar delimiter yo'q bo'lsa, butun body ni bitta section deb hisoblash
-                parsed_sections_elements.append(list(body_elements_from_original))
-                found_first_delimiter_or_content = True
-            else:
-                for element in body_elements_from_original:
-                    is_paragraph = element.tag.endswith("p")
-                    text_in_element = "".join(element.xpath(".//w:t/text()", namespaces=namespaces)) if is_paragraph else ""
-                    
-                    # Agar elementning o'zi delimiter bilan boshlansa
-                    # Yoki element ichidagi biror w:r/w:t delimiter bilan boshlansa
-                    # Bu qismni soddalashtirish kerak bo'lishi mumkin
-                    # Hozircha, faqat to'liq paragraf matni delimiter bilan boshlanishini tekshiramiz
-                    if text_in_element.strip().startswith(delimiter):
-                        if current_section_elements: # Oldingi sectionni saqlash
-                            parsed_sections_elements.append(deepcopy(current_section_elements))
-                        current_section_elements = [] # Yangisi uchun tozalash
-                        found_first_delimiter_or_content = True
-                        # Delimiterli paragrafdan keyingi matnni olish (agar bo'lsa)
-                        # Hozircha, delimiterli paragrafni o'zini qo'shmaymiz
-                    elif found_first_delimiter_or_content: # Delimiter topilgandan keyingi elementlar
-                        current_section_elements.append(element)
-                    elif not found_first_delimiter_or_content and element.xpath("string()").strip(): # Delimiterdan oldingi birinchi kontentli element
-                        # Bu logikani soddalashtirish mumkin: faqat delimiterdan keyingi qismlarni olish
-                        # Hozircha, agar delimiter topilmagan bo'lsa, lekin kontent bo'lsa, uni current_section ga qo'shamiz
-                        # Bu agar fayl ### bilan boshlanmasa, birinchi qismni ham olishga harakat qiladi
-                        # Lekin bu chalkashlik tug'dirishi mumkin. Eng yaxshisi, ### dan boshlash.
-                        # Agar fayl ### bilan boshlanmasa, birinchi ### gacha bo'lgan qismni tashlab yuboramiz.
-                        pass # ### dan oldingi kontentni o'tkazib yuborish
-
-
-            if current_section_elements: # Oxirgi sectionni saqlash
-                parsed_sections_elements.append(deepcopy(current_section_elements))
-            
-            num_parsed_sections = len(parsed_sections_elements)
+            with docx_zip.open(DOCUMENT_PART) as xml_stream:
+                question_sections, document_tail = split_document_xml(xml_stream, delimiter)
+
+            num_parsed_sections = len(question_sections)
             num_answers = len(answers_string)
 
             if num_parsed_sections == 0:
@@ -189,85 +402,50 @@ def split_docx_into_questions(docx_file_bytes, answers_string, delimiter="###"):
                 else: # Hech qanday savol va hech qanday javob
                     return [], _("DOCX fayli bo'sh yoki savol topilmadi va javoblar ham kiritilmagan.")
 
-
             if num_parsed_sections != num_answers:
                 return [], _("Ajratilgan savollar soni ({}) kiritilgan javoblar soniga ({}) mos kelmadi.").format(num_parsed_sections, num_answers)
 
+            graph = DocxPartGraph(docx_zip)
+            shared_parts = {name for name in DOCX_SHARED_PARTS if name in graph.names}
+            document_rels = graph.relationships(DOCUMENT_PART)
+            shared_rels = [rel for rel in document_rels if _rel_target_part(DOCUMENT_PART, rel) in shared_parts]
+            # Paket darajasidagi rels dan faqat document.xml ga havola qoladi (docProps ko'chirilmaydi)
+            package_rels = [rel for rel in graph.relationships("") if _rel_target_part("", rel) == DOCUMENT_PART]
+
+            # Barcha savollar uchun bir xil qismlar (stillar, mavzu, ...) bitta shablon arxivga bir marta siqib yoziladi;
+            # har bir savol shu arxiv baytlarining nusxasiga faqat o'z document.xml, rels, rasmlari va content types ini qo'shadi
+            template_stream = BytesIO()
+            with zipfile.ZipFile(template_stream, 'w', zipfile.ZIP_DEFLATED) as template_zip:
+                _zip_writestr(template_zip, "_rels/.rels", _rels_xml(package_rels))
+                for part_name in sorted(shared_parts):
+                    _zip_writestr(template_zip, part_name, docx_zip.read(part_name))
+            template_bytes = template_stream.getvalue()
+
+            part_bytes = {} # Bir nechta savolda ishlatiladigan rasm asl arxivdan bir marta o'qiladi
             output_questions_data = []
-            for i, section_elements_list in enumerate(parsed_sections_elements):
-                if not section_elements_list: continue
-
-                # Har bir yangi DOCX uchun asosiy XML tuzilmasini yaratish
-                new_doc_root_for_section = etree.Element(original_root.tag, nsmap=original_root.nsmap)
-                
-                # Asl XMLdan bodydan boshqa barcha kerakli qismlarni nusxalash
-                # Bu qism DOCX stillari va formatlashini saqlab qolish uchun muhim
-                # Masalan, settings, styles, fontTable, theme, va hokazo.
-                # Buni to'g'ri qilish murakkab, chunki bog'liqliklar bo'lishi mumkin.
-                # Hozircha minimal yondashuv: faqat body yaratamiz.
-                # Yaxshiroq yondashuv - python-docx bilan yangi hujjat yaratib, elementlarni ko'chirish.
-                
-                body_for_section = etree.SubElement(new_doc_root_for_section, "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}body")
-                for el_instance in section_elements_list:
-                    body_for_section.append(deepcopy(el_instance)) # Elementlarni to'liq nusxalash
-                
-                # Word fayli to'g'ri ochilishi uchun oxirgi sectPr ni qo'shish
-                original_sect_pr = original_root.find("w:body/w:sectPr", namespaces=namespaces)
-                if original_sect_pr is not None:
-                    body_for_section.append(deepcopy(original_sect_pr))
-                else: # Minimal oxirgi paragraf
-                    final_p = etree.SubElement(body_for_section, "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}p")
-                    etree.SubElement(final_p, "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}r")
-
-                # Yangi DOCX faylini BytesIO ga yozish
-                single_question_docx_stream = BytesIO()
-                with zipfile.ZipFile(single_question_docx_stream, 'w', zipfile.ZIP_DEFLATED) as new_single_docx_zip:
-                    # Yangi document.xml ni yozish
-                    new_single_docx_zip.writestr(
-                        "word/document.xml",
-                        etree.tostring(new_doc_root_for_section, xml_declaration=True, encoding='UTF-8', standalone="yes")
-                    )
-                    
-                    # Asl DOCXdagi BA'ZI MUHIM fayllarni nusxalash
-                    # Bu ro'yxatni ehtiyotkorlik bilan tanlash kerak, chunki ba'zilari document.xml ga bog'liq.
-                    # Masalan, _rels/document.xml.rels ni nusxalashda ehtiyot bo'lish kerak.
-                    # Hozircha, faqat rasmlar (media) va stillarni (styles.xml) nusxalashga harakat qilamiz.
-                    # Va content types, asosiy rels.
-                    files_to_copy_from_original = {
+            for i, (question_head, rel_ids) in enumerate(question_sections):
+                question_rels = [rel for rel in document_rels if rel.get("Id") in rel_ids]
+                question_parts = graph.related_parts(DOCUMENT_PART, rel_ids) - shared_parts
+                single_question_docx_stream = BytesIO(template_bytes)
+                with zipfile.ZipFile(single_question_docx_stream, 'a', zipfile.ZIP_DEFLATED) as new_single_docx_zip:
+                    _zip_writestr(new_single_docx_zip, DOCUMENT_PART, question_head + document_tail)
+                    _zip_writestr(new_single_docx_zip, DOCUMENT_RELS_PART, _rels_xml(shared_rels + question_rels))
+                    for part_name in sorted(question_parts):
+                        if part_name not in part_bytes:
+                            part_bytes[part_name] = docx_zip.read(part_name)
+                        _zip_writestr(new_single_docx_zip, part_name, part_bytes[part_name])
+                        rels_name = _rels_part_name(part_name) # Masalan, sarlavha yoki diagrammaning o'z rels fayli
+                        if rels_name in graph.names:
+                            _zip_writestr(new_single_docx_zip, rels_name, docx_zip.read(rels_name))
+                    _zip_writestr(
+                        new_single_docx_zip,
                         "[Content_Types].xml",
-                        "_rels/.rels",
-                        # "word/_rels/document.xml.rels", # Bu yangi document.xml ga mos kelmasligi mumkin
-                        "word/styles.xml", # Yoki stylesWithEffects.xml
-                        "word/theme/theme1.xml", # Agar mavjud bo'lsa
-                        "word/fontTable.xml", # Agar mavjud bo'lsa
-                        "word/settings.xml", # Agar mavjud bo'lsa
-                    }
-                    # Papkalarni ham qo'shish (rekursiv nusxalash kerak bo'ladi)
-                    # Hozircha faqat fayllar
-                    
-                    for item_info in docx_zip.infolist():
-                        if item_info.is_dir(): # Papkalarni o'tkazib yuborish
-                            continue
-
-                        # Media papkasidagi barcha fayllarni nusxalash
-                        if item_info.filename.startswith("word/media/"):
-                            try:
-                                content = docx_zip.read(item_info.filename)
-                                new_single_docx_zip.writestr(item_info.filename, content)
-                            except Exception as e_copy_media:
-                                logger.warning(f"Media faylni nusxalashda xato '{item_info.filename}': {e_copy_media}")
-                        elif item_info.filename in files_to_copy_from_original:
-                            try:
-                                content = docx_zip.read(item_info.filename)
-                                new_single_docx_zip.writestr(item_info.filename, content)
-                            except Exception as e_copy_essential:
-                                logger.warning(f"Muhim faylni nusxalashda xato '{item_info.filename}': {e_copy_essential}")
-                
-                single_question_docx_stream.seek(0)
+                        graph.content_types_xml(shared_parts | question_parts | {DOCUMENT_PART}),
+                    )
                 output_questions_data.append((single_question_docx_stream.getvalue(), answers_string[i].upper()))
-            
+
             return output_questions_data, None
-    
+
     except zipfile.BadZipFile:
         logger.error("BadZipFile error in split_docx_into_questions (main zip)", exc_info=True)
         return [], _("DOCX fayl yaroqsiz zip arxiv (asosiy fayl).")
@@ -278,5 +456,4 @@ def split_docx_into_questions(docx_file_bytes, answers_string, delimiter="###"):
         logger.error("Unexpected error in split_docx_into_questions", exc_info=True)
         return [], _("DOCX faylini qayta ishlashda kutilmagan xato: {}").format(str(e))
     finally:
-        if 'main_zip_stream' in locals() and main_zip_stream:
-            main_zip_stream.close()
\ No newline at end of file
+        main_zip_stream.close()
@@ -5,9 +5,13 @@ from django.contrib import messages # Foydalanuvchiga xabar berish uchun
 from django.urls import reverse_lazy, reverse # reverse_lazy FormView uchun, reverse redirect uchun
 from django.utils.translation import gettext_lazy as _
 from django.utils.translation import activate # Tilni aktivlashtirish uchun
+from django.utils import translation
 from .forms import UserRegistrationInfoForm
-from .models import User, EducationType, Institution, EducationLevel, Faculty, Test, Subject
+from .models import User, EducationType, Institution, EducationLevel, Faculty, Test, Question, RenderedQuestionFile, TestAnswer, ResultDelivery
 from django.http import HttpRequest, HttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.gzip import gzip_page # Katta JSON javoblarni siqish uchun
+import json
 import random
 from django.db import transaction # Atomik operatsiyalar uchun
 from django.utils import timezone # datetime.now() o'rniga
@@ -18,11 +22,11 @@ from .serializers import (
     EducationLevelSerializer, FacultySerializer
 )
 from django.http import JsonResponse, Http404 # JsonResponse va Http404
-from .utils import convert_docx_to_html # Avval yaratgan utils.py dan
-from tgbot.utils import send_test_result_to_user
+from . import question_pool
+from tgbot.utils import deliver_result_sync
+from .workers import submit_on_commit
 import logging
 import os
-from asgiref.sync import async_to_sync
 logger = logging.getLogger(__name__)
 
 
@@ -191,24 +195,17 @@ class PrepareTestView(View): # Nomini o'zgartirdim, bu sahifa testga tayyorgarli
 
         # Qancha savol borligini va test haqida ma'lumotni shablonga yuborish
         user_course = user.course_year if user.course_year else 0
-        active_subjects = Subject.objects.filter(
-            is_active=True,
-            min_course_year__lte=user_course,
-            max_course_year__gte=user_course
-        ).prefetch_related('questions')
+        questions_per_subject = 3
+
+        # Fanlar bo'yicha mavjud savollar soni bitta (keshlangan) agregat so'rov bilan olinadi
+        eligibility_summary = question_pool.get_eligibility_summary(user_course, translation.get_language())
 
         total_questions_for_test = 0
-        questions_per_subject = 3
         possible_subjects_for_test = []
-
-        for subject in active_subjects:
-            num_available_questions = subject.questions.filter(is_active=True).count()
-            if num_available_questions >= questions_per_subject:
-                total_questions_for_test += questions_per_subject
-                possible_subjects_for_test.append(subject.get_localized_name())
-            elif num_available_questions > 0 : # Agar 5 tadan kam bo'lsa, borini oladi
-                total_questions_for_test += num_available_questions
-                possible_subjects_for_test.append(subject.get_localized_name())
+        for subject_name, num_available_questions in eligibility_summary:
+            # Agar questions_per_subject tadan kam bo'lsa, borini oladi
+            total_questions_for_test += min(num_available_questions, questions_per_subject)
+            possible_subjects_for_test.append(subject_name)
 
 
         if total_questions_for_test == 0:
@@ -246,47 +243,28 @@ class StartMixedTestView(View):
         #     return redirect(reverse('core:prepare_test') + f'?user_tg_id={user_telegram_id}') # Qayta prepare sahifasiga
 
         user_course = user.course_year if user.course_year else 0
-        active_subjects = Subject.objects.filter(
-            is_active=True,
-            min_course_year__lte=user_course,
-            max_course_year__gte=user_course
-        ).prefetch_related('questions')
-
-        all_selected_questions = []
         questions_per_subject = 3
 
-        for subject in active_subjects:
-            # Joriy til uchun fayli bor aktiv savollarni olish
-            # Bu qism biroz murakkab, chunki har bir savolni tekshirish kerak
-            # Yaxshiroq yo'li - Question modeliga property qo'shish yoki queryni optimallashtirish
-            
-            potential_questions = []
-            for q in subject.questions.filter(is_active=True):
-                if q.get_question_file_for_current_lang(): # Joriy til uchun fayl bormi?
-                    potential_questions.append(q)
-
-            if len(potential_questions) >= questions_per_subject:
-                all_selected_questions.extend(random.sample(potential_questions, questions_per_subject))
-            elif len(potential_questions) > 0:
-                 all_selected_questions.extend(potential_questions)
-
-        if not all_selected_questions:
+        # Fan bo'yicha oldindan hisoblangan savol poollaridan tanlash:
+        # fanlar soniga qaramay so'rovlar soni o'zgarmaydi
+        selected_question_ids = question_pool.sample_question_ids(user_course, questions_per_subject)
+
+        if not selected_question_ids:
             messages.error(request, _("Test uchun savollar topilmadi."))
             return redirect(reverse('core:prepare_test') + f'?user_tg_id={user_telegram_id}')
 
         # Yangi Test obyektini yaratish (subject endi yo'q)
-        new_test = Test.objects.create(user=user, started_at=timezone.now())
-        new_test.questions.set(all_selected_questions)
+        new_test = Test.objects.create(user=user, started_at=timezone.now(), total_questions=len(selected_question_ids))
+        new_test.questions.add(*selected_question_ids)
         
         request.session['current_test_id'] = new_test.id
-        request.session['current_question_index'] = 0
         
         return redirect(reverse('core:test_in_progress')) # Keyingi qadamda yaratiladi
     
 
 
-class TestInProgressView(View):
-    template_name = 'test_in_progress.html'
+class CurrentTestMixin:
+    """Sessiondagi aktiv testni topish (TestInProgressView va TestPayloadView uchun umumiy)."""
 
     def get_current_test_and_user(self, request):
         test_id = request.session.get('current_test_id')
@@ -303,6 +281,10 @@ class TestInProgressView(View):
         except Test.DoesNotExist:
             raise Http404(_("Test topilmadi."))
 
+
+class TestInProgressView(CurrentTestMixin, View):
+    template_name = 'test_in_progress.html'
+
     def get(self, request, *args, **kwargs):
         try:
             test_instance, user = self.get_current_test_and_user(request)
@@ -313,31 +295,29 @@ class TestInProgressView(View):
             return redirect(reverse('core:some_error_page'))
 
 
-        # Sessiondan joriy savol indeksini olish
-        question_index = request.session.get('current_question_index', 0)
         all_questions_in_test = list(test_instance.questions.all().order_by('id')) # Yoki boshqa tartibda
 
         if not all_questions_in_test:
             messages.error(request, _("Testda savollar topilmadi."))
             return redirect(reverse('core:prepare_test') + f'?user_tg_id={user.telegram_id}')
 
-        if question_index >= len(all_questions_in_test):
-            # Barcha savollar tugagan, natijalar sahifasiga o'tish kerak
-            # Bu holat GET so'rovida bo'lmasligi kerak, lekin har ehtimolga qarshi
-            return redirect(reverse('core:submit_test')) # SubmitTestView ni hali yaratmadik
+        # Foydalanuvchi javoblari TestAnswer jadvalidan bitta so'rov bilan olinadi
+        user_answers = TestAnswer.answers_for_test(test_instance.id)
+        # Sahifa qayta ochilganda birinchi javob berilmagan savoldan davom etiladi
+        question_index = next(
+            (i for i, q in enumerate(all_questions_in_test) if str(q.id) not in user_answers),
+            len(all_questions_in_test) - 1
+        )
 
         current_question = all_questions_in_test[question_index]
-        question_file_to_render = current_question.get_question_file_for_current_lang() # YANGILANDI
+        question_html = current_question.get_question_html_for_current_lang() # Hash bo'yicha keshdan
 
-        if not question_file_to_render:
+        if question_html is None:
             # Bu holat bo'lmasligi kerak, agar savollar to'g'ri filtrlangan bo'lsa
             logger.error(f"Test {test_instance.id}, Savol {current_question.id} uchun joriy tilda fayl topilmadi!")
             question_html = f"<p>{_('Savol matni topilmadi.')}</p>"
-        else:
-            question_html = convert_docx_to_html(question_file_to_render) # YANGILANDI
 
-        # Foydalanuvchining bu savolga bergan javobini sessiondan olish (agar mavjud bo'lsa)
-        user_answers = request.session.get(f'test_{test_instance.id}_answers', {})
+        # Foydalanuvchining bu savolga bergan javobi (agar mavjud bo'lsa)
         previous_answer = user_answers.get(str(current_question.id))
 
         context = {
@@ -371,16 +351,16 @@ class TestInProgressView(View):
                 # return JsonResponse({'error': _("Savol ID si yoki javob yetishmayapti."), 'success': False}, status=400)
 
 
-        # Foydalanuvchi javoblarini sessionda saqlash
-        user_answers = request.session.get(f'test_{test_instance.id}_answers', {})
-        if question_id and selected_answer: # Faqat javob berilgan bo'lsa saqlash
-            user_answers[str(question_id)] = selected_answer
-        request.session[f'test_{test_instance.id}_answers'] = user_answers
-        request.session.modified = True # Session o'zgartirilganini bildirish
-
-        # Joriy savol indeksini olish va yangilash
-        question_index = request.session.get('current_question_index', 0)
         all_questions_in_test = list(test_instance.questions.all().order_by('id'))
+        question_ids = [str(q.id) for q in all_questions_in_test]
+
+        # Javob sessionga emas, TestAnswer jadvaliga bitta kichik yozuv sifatida saqlanadi
+        valid_choices = {choice for choice, _label in Question.ANSWER_CHOICES}
+        if question_id in question_ids and selected_answer in valid_choices: # Faqat javob berilgan bo'lsa saqlash
+            TestAnswer.save_answers(test_instance.id, {question_id: selected_answer})
+
+        # Joriy savol indeksi sessionda saqlanmaydi, yuborilgan question_id dan aniqlanadi
+        question_index = question_ids.index(question_id) if question_id in question_ids else 0
 
         if action == 'next' or action == 'next_unanswered':
             question_index += 1
@@ -406,10 +386,6 @@ class TestInProgressView(View):
         # if question_index >= len(all_questions_in_test):
         #     return JsonResponse({'success': True, 'finished': True, 'redirect_url': reverse('core:submit_test')})
 
-
-        request.session['current_question_index'] = question_index
-        request.session.modified = True
-
         # Agar barcha savollar tugagan bo'lsa va keyingi bosilsa (yoki oxirgi savoldan keyin)
         if question_index >= len(all_questions_in_test):
              return JsonResponse({'success': True, 'finished': True, 'message': _("Barcha savollarga javob berildi. Testni yakunlang.")})
@@ -417,15 +393,15 @@ class TestInProgressView(View):
 
         # Keyingi savolni yuklash uchun ma'lumotlarni qaytarish (AJAX so'rovi uchun)
         next_question_obj = all_questions_in_test[question_index]
-        next_question_file_to_render = next_question_obj.get_question_file_for_current_lang() # YANGILANDI
+        next_question_html = next_question_obj.get_question_html_for_current_lang() # Hash bo'yicha keshdan
 
-        if not next_question_file_to_render:
+        if next_question_html is None:
             logger.error(f"Test {test_instance.id}, Keyingi savol {next_question_obj.id} uchun joriy tilda fayl topilmadi!")
             next_question_html = f"<p>{_('Savol matni topilmadi.')}</p>"
-        else:
-            next_question_html = convert_docx_to_html(next_question_file_to_render) # YANGILANDI
-            
-        previous_answer_for_next_q = user_answers.get(str(next_question_obj.id))
+
+        previous_answer_for_next_q = TestAnswer.objects.filter(
+            test_id=test_instance.id, question_id=next_question_obj.id
+        ).values_list('answer', flat=True).first()
 
 
         return JsonResponse({
@@ -440,13 +416,87 @@ class TestInProgressView(View):
         })
 
 
+@method_decorator(gzip_page, name='dispatch')
+class TestPayloadView(CurrentTestMixin, View):
+    """
+    Testning barcha savollarini (oldindan render qilingan HTML bilan) bitta siqilgan JSON javobda qaytaradi.
+    Navigatsiya brauzerda bajariladi, javoblar esa POST orqali paket (batch) holida yuboriladi.
+    """
+
+    def get(self, request, *args, **kwargs):
+        try:
+            test_instance, user = self.get_current_test_and_user(request)
+        except Http404 as e:
+            return JsonResponse({'error': str(e), 'success': False}, status=404)
+
+        all_questions_in_test = list(test_instance.questions.all().order_by('id'))
+        html_by_question = RenderedQuestionFile.html_for_questions(all_questions_in_test)
+        not_found_html = f"<p>{_('Savol matni topilmadi.')}</p>"
+
+        questions_payload = []
+        for number, question in enumerate(all_questions_in_test, start=1):
+            question_html = html_by_question.get(question.id)
+            if question_html is None:
+                logger.error(f"Test {test_instance.id}, Savol {question.id} uchun joriy tilda fayl topilmadi!")
+                question_html = not_found_html
+            questions_payload.append({
+                'id': question.id,
+                'number': number,
+                'html': question_html,
+            })
+
+        return JsonResponse({
+            'success': True,
+            'test_id': test_instance.id,
+            'total_questions': len(questions_payload),
+            'time_limit_minutes': len(questions_payload),
+            'answer_choices': [choice for choice, _label in Question.ANSWER_CHOICES],
+            'questions': questions_payload,
+            'answers': TestAnswer.answers_for_test(test_instance.id),
+        })
+
+    def post(self, request, *args, **kwargs):
+        """
+        Javoblarni paket holida qabul qiladi:
+        {"answers": {"<question_id>": "a", ...}, "submit": true|false, "time_spent": <sekund>}
+        """
+        try:
+            test_instance, user = self.get_current_test_and_user(request)
+        except Http404 as e:
+            return JsonResponse({'error': str(e), 'success': False}, status=404)
+
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({'error': _("Noto'g'ri so'rov formati."), 'success': False}, status=400)
+
+        answers = data.get('answers') or {}
+        if not isinstance(answers, dict):
+            return JsonResponse({'error': _("Noto'g'ri so'rov formati."), 'success': False}, status=400)
+
+        valid_question_ids = {str(q_id) for q_id in test_instance.questions.values_list('id', flat=True)}
+        valid_choices = {choice for choice, _label in Question.ANSWER_CHOICES}
+        valid_answers = {
+            str(question_id): selected_answer
+            for question_id, selected_answer in answers.items()
+            if str(question_id) in valid_question_ids and selected_answer in valid_choices
+        }
+        TestAnswer.save_answers(test_instance.id, valid_answers) # Butun paket bitta upsert so'rovida
+
+        if data.get('submit'):
+            request.session['time_spent_on_test'] = str(data.get('time_spent', 0))
+            request.session['test_submitted_for_processing'] = True
+            return JsonResponse({'success': True, 'redirect_url': reverse('core:submit_test')})
+
+        return JsonResponse({'success': True, 'saved': len(valid_answers)})
+
+
 class SubmitTestView(View):
     template_name = 'test_results.html' # Shablon nomini to'g'riladim
 
     @transaction.atomic
     def get(self, request, *args, **kwargs):
         test_id = request.session.get('current_test_id')
-        user_answers_session = request.session.get(f'test_{test_id}_answers', {})
         time_spent_str = request.session.get('time_spent_on_test', '0')
         
         if not request.session.get('test_submitted_for_processing', False):
@@ -478,6 +528,8 @@ class SubmitTestView(View):
             return HttpResponse(f"Test {test_id} allaqachon yakunlangan. Natija: {test_instance.score}")
 
 
+        # Barcha javoblar bitta so'rov bilan o'qiladi
+        user_answers_session = TestAnswer.answers_for_test(test_instance.id)
         correct_answers_count = 0
         test_questions = test_instance.questions.all()
         detailed_results = []
@@ -503,7 +555,8 @@ class SubmitTestView(View):
         except ValueError:
             test_instance.time_spent_seconds = 0
         
-        total_q_count = test_questions.count() if test_questions.exists() else 1 # exists() bilan tekshirish yaxshiroq
+        test_instance.total_questions = len(test_questions) # Savollar prefetch qilingan, qo'shimcha so'rov yo'q
+        total_q_count = test_instance.total_questions or 1
         percentage_correct = (correct_answers_count / total_q_count) * 100 if total_q_count > 0 else 0
         test_instance.voucher_code = f"IBT{timezone.now().strftime('%m%d')}{test_instance.id}{random.randint(1, 9)}"   
         
@@ -511,30 +564,13 @@ class SubmitTestView(View):
         test_instance.save()
         logger.info(f"Test {test_id} natijalari saqlandi. Hisob: {test_instance.score}, Voucher kodi: {test_instance.voucher_code}")
 
-        # Telegramga xabar yuborish
-        message_was_sent_to_user = False
-        if user.telegram_id: 
-            logger.info(f"Telegramga yuborish boshlandi: User {user.telegram_id}")
-            try:
-                message_was_sent_to_user = async_to_sync(send_test_result_to_user)(
-                    user_telegram_id=int(user.telegram_id), # Int ga o'tkazish
-                    user_fullname=(user.name or '', user.surname or '', user.patronymic or ''), # Foydalanuvchi ismi va familiyasini olish
-                    score=(correct_answers_count, round(percentage_correct, 1)),
-                    total_questions=total_q_count,
-                    voucher_code=(test_instance.id, test_instance.voucher_code),
-                )
-                logger.info(f"Telegramga yuborish statusi (user {user.telegram_id}): {message_was_sent_to_user}")
-
-                if message_was_sent_to_user:
-                    test_instance.voucher_sent = True
-                    test_instance.save(update_fields=['voucher_sent'])
-                    logger.info(f"Test {test_id} uchun voucher_sent=True qilib saqlandi.")
-                else:
-                    logger.error(f"Test {test_id} uchun Telegramga xabar YUBORILMADI (send_test_result_to_user False qaytardi).")
-
-            except Exception as e:
-                logger.error(f"SubmitTestView: Telegramga xabar yuborishda KRITIK xatolik (test {test_id}): {e}", exc_info=True)
-        elif not user.telegram_id:
+        # Telegramga yuborish tranzaksiyadan tashqarida: outbox yozuvi yaratiladi,
+        # yuborish esa commit dan keyin fon workerida (yoki deliver_results komandasi orqali) bajariladi
+        if user.telegram_id:
+            delivery, _created = ResultDelivery.objects.get_or_create(test=test_instance)
+            submit_on_commit(deliver_result_sync, delivery.id)
+            logger.info(f"Test {test_id} natijasi Telegramga yuborish navbatiga qo'yildi (delivery {delivery.id}).")
+        else:
             logger.warning(f"Test {test_id} uchun foydalanuvchining telegram_id si yo'q.")
 
 
@@ -549,13 +585,11 @@ class SubmitTestView(View):
             'voucher_type': "",
             'voucher_amount_text': "", 
             'voucher_code': test_instance.voucher_code,
-            'voucher_sent_to_telegram': message_was_sent_to_user,
+            'result_delivery_queued': bool(user.telegram_id), # Natija fon rejimida Telegramga yuboriladi
         }
 
         # Sessiondagi testga oid ma'lumotlarni tozalash
         request.session.pop('current_test_id', None)
-        request.session.pop('current_question_index', None)
-        request.session.pop(f'test_{test_id}_answers', None)
         request.session.pop('time_spent_on_test', None)
         request.session.pop('test_submitted_for_processing', None)
         request.session.modified = True
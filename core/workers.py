@@ -0,0 +1,147 @@
+# core/workers.py
+# Fon vazifalari uchun lokal worker pool (thread pool) va CPU talab qiladigan ishlar uchun process pool.
+# Celery kabi tashqi broker ishlatilmaydi: vazifalar shu jarayon ichida bajariladi.
+import logging
+import multiprocessing
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Jarayon bo'yicha yagona ThreadPoolExecutor ni qaytaradi (kerak bo'lganda yaratadi)."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'BACKGROUND_WORKERS', 4),
+                    thread_name_prefix='bg-worker',
+                )
+    return _executor
+
+
+def _run_task(func, args, kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    except Exception as e:
+        logger.error(f"Fon vazifasida xatolik ({func.__name__}): {e}", exc_info=True)
+        raise
+    finally:
+        # Har bir thread o'z DB ulanishini ochadi, vazifa tugagach yopamiz
+        connections.close_all()
+
+
+def submit(func, *args, **kwargs):
+    """Vazifani darhol worker poolga yuboradi."""
+    return get_executor().submit(_run_task, func, args, kwargs)
+
+
+def submit_on_commit(func, *args, **kwargs):
+    """Vazifani joriy tranzaksiya muvaffaqiyatli yakunlangandan keyin worker poolga yuboradi."""
+    transaction.on_commit(lambda: submit(func, *args, **kwargs))
+
+
+def submit_later(delay, func, *args, **kwargs):
+    """Vazifani `delay` sekunddan keyin worker poolga yuboradi (qayta urinishlar uchun)."""
+    timer = threading.Timer(delay, submit, args=(func, *args), kwargs=kwargs)
+    timer.daemon = True # Jarayon to'xtashiga xalaqit bermaydi; yo'qolgan taymerlarni davriy tekshiruv qoplaydi
+    timer.start()
+    return timer
+
+
+_periodic_started = set()
+
+
+def start_periodic(name, interval, func):
+    """
+    func ni har `interval` sekundda worker poolga yuboradi (jarayon bo'yicha bitta marta ishga tushiriladi).
+    Server ishga tushganda chaqiriladi (core.tasks.start_background_sweeps), management komandalarda emas.
+    """
+    with _executor_lock:
+        if name in _periodic_started:
+            return
+        _periodic_started.add(name)
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                submit(func)
+            except RuntimeError:
+                return # Executor yopilgan (jarayon to'xtamoqda)
+
+    threading.Thread(target=loop, name=f'periodic-{name}', daemon=True).start()
+
+
+@contextmanager
+def repeat_while_running(interval, func, *args):
+    """
+    `with` bloki bajarilayotganda func ni har `interval` sekundda alohida oqimda chaqiradi
+    (uzoq davom etadigan vazifalar ijarasini (heartbeat) yangilab turish uchun).
+    """
+    stop = threading.Event()
+
+    def loop():
+        try:
+            while not stop.wait(interval):
+                try:
+                    func(*args)
+                except Exception as e:
+                    logger.error(f"Davriy chaqiruvda xatolik ({func.__name__}): {e}")
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=loop, name=f'repeat-{func.__name__}', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+_process_executor = None
+
+
+def _init_process_worker():
+    # spawn bilan ochilgan jarayonda Django sozlamalari va ilovalar qayta yuklanadi
+    import django
+    django.setup()
+
+
+def get_process_executor():
+    """
+    CPU talab qiladigan vazifalar (DOCX ni ajratish va h.k.) uchun yagona ProcessPoolExecutor.
+    Threadlar GIL tufayli bunday ishni tezlashtirmaydi; jarayonlar 'spawn' bilan ochiladi,
+    chunki fork ochiq DB ulanishlari va threadlarni ham nusxalab yuboradi.
+    """
+    global _process_executor
+    if _process_executor is None:
+        with _executor_lock:
+            if _process_executor is None:
+                _process_executor = ProcessPoolExecutor(
+                    max_workers=getattr(settings, 'BACKGROUND_PROCESSES', 3),
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_process_worker,
+                )
+    return _process_executor
+
+
+def reset_process_executor():
+    """Pool buzilsa (BrokenProcessPool), keyingi chaqiruvda yangisi ochilishi uchun eskisini yopadi."""
+    global _process_executor
+    with _executor_lock:
+        if _process_executor is not None:
+            _process_executor.shutdown(wait=False, cancel_futures=True)
+            _process_executor = None
@@ -1,3 +1,25 @@
 from django.contrib import admin
+from .models import Broadcast, BroadcastDelivery, ExportJob
+
+
+@admin.register(Broadcast)
+class BroadcastAdmin(admin.ModelAdmin):
+    list_display = ('id', 'source_chat_id', 'message_id', 'status', 'total_recipients', 'sent_count', 'blocked_count', 'failed_count', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('created_at', 'finished_at')
+
+
+@admin.register(BroadcastDelivery)
+class BroadcastDeliveryAdmin(admin.ModelAdmin):
+    list_display = ('broadcast', 'user', 'status', 'updated_at')
+    list_filter = ('status', 'broadcast')
+    search_fields = ('user__telegram_id',)
+    raw_id_fields = ('broadcast', 'user')
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'file_format', 'status', 'rows_count', 'requested_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'file_format')
+    readonly_fields = ('status', 'file', 'rows_count', 'error', 'created_at', 'finished_at')
 
-# Register your models here.
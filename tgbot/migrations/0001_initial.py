@@ -0,0 +1,56 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Broadcast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_chat_id', models.BigIntegerField(verbose_name='Kanal ID')),
+                ('message_id', models.BigIntegerField(verbose_name='Xabar ID')),
+                ('progress_message_id', models.BigIntegerField(blank=True, null=True, verbose_name='Jarayon xabari ID')),
+                ('reply_markup', models.JSONField(blank=True, null=True, verbose_name='Inline tugmalar')),
+                ('status', models.CharField(choices=[('running', 'Davom etmoqda'), ('finished', 'Yakunlangan')], db_index=True, default='running', max_length=10, verbose_name='Holati')),
+                ('total_recipients', models.PositiveIntegerField(default=0, verbose_name='Qabul qiluvchilar soni')),
+                ('sent_count', models.PositiveIntegerField(default=0, verbose_name='Yuborildi')),
+                ('blocked_count', models.PositiveIntegerField(default=0, verbose_name='Bloklagan')),
+                ('failed_count', models.PositiveIntegerField(default=0, verbose_name='Xatolik')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Yaratilgan vaqti')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Yakunlangan vaqti')),
+            ],
+            options={
+                'verbose_name': 'Xabar tarqatish',
+                'verbose_name_plural': 'Xabar tarqatishlar',
+                'ordering': ['-created_at'],
+                'constraints': [models.UniqueConstraint(fields=('source_chat_id', 'message_id'), name='unique_broadcast_message')],
+            },
+        ),
+        migrations.CreateModel(
+            name='BroadcastDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('sent', 'Yuborildi'), ('blocked', 'Botni bloklagan'), ('failed', 'Xatolik')], max_length=10, verbose_name='Holati')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Xato')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('broadcast', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='tgbot.broadcast', verbose_name='Tarqatish')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Foydalanuvchi')),
+            ],
+            options={
+                'verbose_name': 'Tarqatish natijasi',
+                'verbose_name_plural': 'Tarqatish natijalari',
+                'constraints': [models.UniqueConstraint(fields=('broadcast', 'user'), name='unique_broadcast_delivery')],
+            },
+        ),
+    ]
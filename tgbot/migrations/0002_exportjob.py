@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tgbot', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('requested_by', models.BigIntegerField(blank=True, null=True, verbose_name="So'ragan (Telegram ID)")),
+                ('file_format', models.CharField(default='xlsx', max_length=10, verbose_name='Format')),
+                ('filters', models.JSONField(blank=True, default=dict, verbose_name='Filtrlar')),
+                ('status', models.CharField(choices=[('pending', 'Navbatda'), ('running', 'Bajarilmoqda'), ('done', 'Tayyor'), ('failed', 'Xatolik')], db_index=True, default='pending', max_length=10, verbose_name='Holati')),
+                ('file', models.FileField(blank=True, null=True, upload_to='exports/%Y/%m/', verbose_name='Fayl')),
+                ('rows_count', models.PositiveIntegerField(default=0, verbose_name='Qatorlar soni')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Xato')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Yaratilgan vaqti')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Yakunlangan vaqti')),
+            ],
+            options={
+                'verbose_name': 'Eksport vazifasi',
+                'verbose_name_plural': 'Eksport vazifalari',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:44
+
+import tgbot.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tgbot', '0002_exportjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportjob',
+            name='file',
+            field=models.FileField(blank=True, null=True, storage=tgbot.models.export_storage, upload_to='%Y/%m/', verbose_name='Fayl'),
+        ),
+    ]
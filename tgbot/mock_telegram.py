@@ -0,0 +1,115 @@
+# tgbot/mock_telegram.py
+"""
+Lokal Telegram Bot API mock serveri (yuklama testlari va lokal ishlab chiqish uchun).
+
+Ishga tushirish:
+    python -m tgbot.mock_telegram --port 8081 --latency-ms 50
+so'ng Django ni TELEGRAM_API_BASE_URL=http://127.0.0.1:8081 bilan ishga tushiring.
+
+Testlardan foydalanish:
+    async with MockTelegramServer() as server:
+        ...  # settings.TELEGRAM_API_BASE_URL = server.url
+        server.stats()  # {'requests': ..., 'connections': ..., 'methods': {...}}
+"""
+import argparse
+import asyncio
+import itertools
+import time
+from collections import Counter
+
+from aiohttp import web
+
+
+class MockTelegramServer:
+    """Har qanday /bot<token>/<method> so'roviga muvaffaqiyatli Telegram javobini qaytaradi."""
+
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=0, fail_every=0):
+        self.host = host
+        self.port = port
+        self.latency = latency_ms / 1000
+        self.fail_every = fail_every # Har N-so'rovga 429 qaytarish (qayta urinishlarni sinash uchun); 0 - o'chiq
+        self.method_counts = Counter()
+        self.connection_ids = set() # Nechta alohida TCP ulanish ochilganini kuzatish uchun
+        self._message_ids = itertools.count(1)
+        self._runner = None
+
+        self.app = web.Application(client_max_size=20 * 1024 * 1024)
+        self.app.router.add_route('*', '/bot{token}/{method}', self.handle)
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def stats(self):
+        return {
+            'requests': sum(self.method_counts.values()),
+            'connections': len(self.connection_ids),
+            'methods': dict(self.method_counts),
+        }
+
+    async def handle(self, request):
+        method = request.match_info['method']
+        self.connection_ids.add(request.transport.get_extra_info('peername') if request.transport else None)
+        self.method_counts[method] += 1
+        await request.read() # Multipart (rasm) tanasini to'liq qabul qilish
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if self.fail_every and sum(self.method_counts.values()) % self.fail_every == 0:
+            return web.json_response(
+                {'ok': False, 'error_code': 429, 'description': 'Too Many Requests: retry after 1', 'parameters': {'retry_after': 1}},
+                status=429,
+            )
+
+        return web.json_response({
+            'ok': True,
+            'result': {
+                'message_id': next(self._message_ids),
+                'date': int(time.time()),
+                'chat': {'id': 0, 'type': 'private'},
+            },
+        })
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1] # port=0 bo'lsa OS tanlagan port
+        return self
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+
+async def _serve(args):
+    server = MockTelegramServer(args.host, args.port, args.latency_ms, args.fail_every)
+    await server.start()
+    print(f"Mock Telegram API: {server.url} (TELEGRAM_API_BASE_URL sifatida ishlating)")
+    try:
+        while True:
+            await asyncio.sleep(10)
+            print(f"Statistika: {server.stats()}")
+    finally:
+        await server.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Lokal Telegram Bot API mock serveri")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency-ms', type=int, default=0, help="Har bir javobga qo'shiladigan kechikish (ms).")
+    parser.add_argument('--fail-every', type=int, default=0, help="Har N-so'rovga 429 qaytarish.")
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -1,3 +1,202 @@
 from django.db import models
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 
-# Create your models here.
+
+class Broadcast(models.Model):
+    """
+    Kanal postini foydalanuvchilarga tarqatish (bot_runner.handle_channel_post) jarayoni.
+    Bot qayta ishga tushsa, 'running' holatidagi tarqatishlar davom ettiriladi.
+    """
+    STATUS_RUNNING = 'running'
+    STATUS_FINISHED = 'finished'
+    STATUS_CHOICES = [
+        (STATUS_RUNNING, _("Davom etmoqda")),
+        (STATUS_FINISHED, _("Yakunlangan")),
+    ]
+
+    source_chat_id = models.BigIntegerField(verbose_name=_("Kanal ID"))
+    message_id = models.BigIntegerField(verbose_name=_("Xabar ID"))
+    progress_message_id = models.BigIntegerField(null=True, blank=True, verbose_name=_("Jarayon xabari ID"))
+    reply_markup = models.JSONField(null=True, blank=True, verbose_name=_("Inline tugmalar"))
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_RUNNING, db_index=True, verbose_name=_("Holati"))
+    total_recipients = models.PositiveIntegerField(default=0, verbose_name=_("Qabul qiluvchilar soni"))
+    sent_count = models.PositiveIntegerField(default=0, verbose_name=_("Yuborildi"))
+    blocked_count = models.PositiveIntegerField(default=0, verbose_name=_("Bloklagan"))
+    failed_count = models.PositiveIntegerField(default=0, verbose_name=_("Xatolik"))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Yaratilgan vaqti"))
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Yakunlangan vaqti"))
+
+    def __str__(self):
+        return f"{self.source_chat_id}/{self.message_id} ({self.status})"
+
+    def refresh_counts(self):
+        """Yetkazish natijalarini BroadcastDelivery jadvalidan bitta so'rov bilan qayta hisoblaydi."""
+        counts = self.deliveries.aggregate(
+            sent=Count('id', filter=Q(status=BroadcastDelivery.STATUS_SENT)),
+            blocked=Count('id', filter=Q(status=BroadcastDelivery.STATUS_BLOCKED)),
+            failed=Count('id', filter=Q(status=BroadcastDelivery.STATUS_FAILED)),
+        )
+        self.sent_count = counts['sent']
+        self.blocked_count = counts['blocked']
+        self.failed_count = counts['failed']
+
+    def pending_recipients(self):
+        """Hali yetkazilmagan (yoki xatolik bilan tugagan) aktiv foydalanuvchilar."""
+        from core.models import User
+        done_user_ids = self.deliveries.filter(
+            status__in=[BroadcastDelivery.STATUS_SENT, BroadcastDelivery.STATUS_BLOCKED]
+        ).values('user_id')
+        return User.objects.filter(is_active=True).exclude(id__in=done_user_ids)
+
+    def finish(self):
+        self.refresh_counts()
+        self.status = self.STATUS_FINISHED
+        self.finished_at = timezone.now()
+        self.save(update_fields=['sent_count', 'blocked_count', 'failed_count', 'status', 'finished_at'])
+
+    class Meta:
+        verbose_name = _("Xabar tarqatish")
+        verbose_name_plural = _("Xabar tarqatishlar")
+        ordering = ['-created_at']
+        constraints = [
+            # Bitta post ikki marta tarqatilmasligi uchun (update qayta kelsa ham)
+            models.UniqueConstraint(fields=['source_chat_id', 'message_id'], name='unique_broadcast_message'),
+        ]
+
+
+class BroadcastDelivery(models.Model):
+    """Tarqatishning har bir qabul qiluvchi uchun natijasi (bot tomonidan paketlab yoziladi)."""
+    STATUS_SENT = 'sent'
+    STATUS_BLOCKED = 'blocked'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_SENT, _("Yuborildi")),
+        (STATUS_BLOCKED, _("Botni bloklagan")),
+        (STATUS_FAILED, _("Xatolik")),
+    ]
+
+    broadcast = models.ForeignKey(Broadcast, related_name='deliveries', on_delete=models.CASCADE, verbose_name=_("Tarqatish"))
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='+', on_delete=models.CASCADE, verbose_name=_("Foydalanuvchi"))
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, verbose_name=_("Holati"))
+    error = models.TextField(blank=True, default='', verbose_name=_("Xato"))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.broadcast_id} -> {self.user_id}: {self.status}"
+
+    @classmethod
+    def save_results(cls, broadcast, results):
+        """
+        results: [{"telegram_id": ..., "status": ..., "error": ...}, ...] (BroadcastResultsSerializer bilan tekshirilgan)
+        - bitta upsert so'rovi bilan yoziladi.
+        Botni bloklagan foydalanuvchilar is_active=False qilinadi (keyingi tarqatishlarga kirmaydi).
+        Yozilgan natijalar sonini qaytaradi.
+        """
+        from core.models import User
+        results_by_tg_id = {item['telegram_id']: item for item in results}
+        if not results_by_tg_id:
+            return 0
+
+        user_ids = dict(User.objects.filter(telegram_id__in=results_by_tg_id).values_list('telegram_id', 'id'))
+        now = timezone.now()
+        deliveries = [
+            cls(
+                broadcast=broadcast,
+                user_id=user_ids[tg_id],
+                status=item['status'],
+                error=(item.get('error') or '')[:1000],
+                updated_at=now,
+            )
+            for tg_id, item in results_by_tg_id.items() if tg_id in user_ids
+        ]
+        cls.objects.bulk_create(
+            deliveries,
+            update_conflicts=True,
+            unique_fields=['broadcast', 'user'],
+            update_fields=['status', 'error', 'updated_at'],
+        )
+
+        blocked_user_ids = [d.user_id for d in deliveries if d.status == cls.STATUS_BLOCKED]
+        if blocked_user_ids:
+            User.objects.filter(id__in=blocked_user_ids).update(is_active=False)
+        return len(deliveries)
+
+    class Meta:
+        verbose_name = _("Tarqatish natijasi")
+        verbose_name_plural = _("Tarqatish natijalari")
+        constraints = [
+            models.UniqueConstraint(fields=['broadcast', 'user'], name='unique_broadcast_delivery'),
+        ]
+
+
+def export_storage():
+    """Eksport fayllari uchun ommaviy bo'lmagan storage (settings.EXPORTS_ROOT, MEDIA_URL orqali berilmaydi)."""
+    return FileSystemStorage(location=settings.EXPORTS_ROOT)
+
+
+class ExportJob(models.Model):
+    """
+    Testlar eksporti fon vazifasi sifatida (bot /export_data): fayl worker poolda diskka yoziladi,
+    bot esa holatini so'rab turadi va tayyor bo'lganda hujjatni adminga yuboradi.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, _("Navbatda")),
+        (STATUS_RUNNING, _("Bajarilmoqda")),
+        (STATUS_DONE, _("Tayyor")),
+        (STATUS_FAILED, _("Xatolik")),
+    ]
+
+    requested_by = models.BigIntegerField(null=True, blank=True, verbose_name=_("So'ragan (Telegram ID)"))
+    file_format = models.CharField(max_length=10, default='xlsx', verbose_name=_("Format"))
+    filters = models.JSONField(default=dict, blank=True, verbose_name=_("Filtrlar"))
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True, verbose_name=_("Holati"))
+    file = models.FileField(upload_to='%Y/%m/', storage=export_storage, null=True, blank=True, verbose_name=_("Fayl"))
+    rows_count = models.PositiveIntegerField(default=0, verbose_name=_("Qatorlar soni"))
+    error = models.TextField(blank=True, default='', verbose_name=_("Xato"))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Yaratilgan vaqti"))
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Yakunlangan vaqti"))
+
+    def __str__(self):
+        return f"Eksport #{self.pk} ({self.file_format}, {self.status})"
+
+    def claim(self):
+        """pending -> running (shartli UPDATE): vazifa ikki marta ishga tushsa ham fayl bir marta yoziladi."""
+        claimed = ExportJob.objects.filter(pk=self.pk, status=self.STATUS_PENDING).update(status=self.STATUS_RUNNING)
+        if claimed:
+            self.status = self.STATUS_RUNNING
+        return bool(claimed)
+
+    def run(self):
+        """Eksport faylini vaqtinchalik faylga yozib, so'ng storage ga saqlaydi (worker threadda chaqiriladi)."""
+        import tempfile
+        from django.core.files import File
+        from core.exports import export_filename, filter_tests, parse_export_filters, write_tests_export
+
+        if not self.claim():
+            return False
+        try:
+            queryset = filter_tests(**parse_export_filters(self.filters))
+            with tempfile.TemporaryFile() as output:
+                self.rows_count = write_tests_export(queryset, self.file_format, output)
+                output.seek(0)
+                self.file.save(export_filename(self.file_format), File(output), save=False)
+            self.status = self.STATUS_DONE
+        except Exception as e:
+            self.status = self.STATUS_FAILED
+            self.error = str(e)[:1000]
+        self.finished_at = timezone.now()
+        self.save(update_fields=['status', 'file', 'rows_count', 'error', 'finished_at'])
+        return self.status == self.STATUS_DONE
+
+    class Meta:
+        verbose_name = _("Eksport vazifasi")
+        verbose_name_plural = _("Eksport vazifalari")
+        ordering = ['-created_at']
@@ -0,0 +1,22 @@
+# tgbot/permissions.py
+import hmac
+
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+BOT_API_KEY_HEADER = 'X-Bot-Api-Key'
+
+
+class IsBotClient(BasePermission):
+    """
+    Faqat bot jarayoniga ruxsat: so'rovda settings.BOT_API_KEY bilan bir xil X-Bot-Api-Key sarlavhasi bo'lishi kerak.
+    Kalit sozlanmagan bo'lsa hech kimga ruxsat berilmaydi.
+    """
+    message = "Bot API kaliti noto'g'ri yoki yuborilmagan."
+
+    def has_permission(self, request, view):
+        expected = getattr(settings, 'BOT_API_KEY', None)
+        provided = request.headers.get(BOT_API_KEY_HEADER)
+        if not expected or not provided:
+            return False
+        return hmac.compare_digest(provided.encode(), expected.encode())
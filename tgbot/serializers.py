@@ -1,5 +1,7 @@
 from rest_framework import serializers
 from core.models import User
+from .models import Broadcast, BroadcastDelivery, ExportJob
+import os
 from django.utils.translation import gettext_lazy as _
 
 class UserCreateSerializer(serializers.ModelSerializer):
@@ -31,4 +33,39 @@ class UserPhoneUpdateSerializer(serializers.Serializer):
 class UserDetailSerializer(serializers.ModelSerializer): # Foydalanuvchi ma'lumotlarini qaytarish uchun
     class Meta:
         model = User
-        fields = ['telegram_id', 'full_name', 'username', 'phone_number', 'language_code']
\ No newline at end of file
+        fields = ['telegram_id', 'full_name', 'username', 'phone_number', 'language_code']
+
+class BroadcastSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Broadcast
+        fields = [
+            'id', 'source_chat_id', 'message_id', 'progress_message_id', 'reply_markup', 'status',
+            'total_recipients', 'sent_count', 'blocked_count', 'failed_count', 'created_at', 'finished_at',
+        ]
+        read_only_fields = [
+            'id', 'status', 'total_recipients', 'sent_count', 'blocked_count', 'failed_count', 'created_at', 'finished_at',
+        ]
+        # get_or_create view ichida, shuning uchun unique tekshiruvi serializerda o'chiriladi
+        validators = []
+
+
+class BroadcastResultSerializer(serializers.Serializer): # Bitta qabul qiluvchi natijasi (bot yuboradi)
+    telegram_id = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=BroadcastDelivery.STATUS_CHOICES)
+    error = serializers.CharField(required=False, allow_blank=True, allow_null=True, default='', trim_whitespace=False)
+
+
+class BroadcastResultsSerializer(serializers.Serializer):
+    results = BroadcastResultSerializer(many=True)
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    file_name = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = ['id', 'requested_by', 'file_format', 'filters', 'status', 'rows_count', 'error', 'file_name', 'created_at', 'finished_at']
+        read_only_fields = ['id', 'status', 'rows_count', 'error', 'file_name', 'created_at', 'finished_at']
+
+    def get_file_name(self, obj):
+        return os.path.basename(obj.file.name) if obj.file else None
@@ -1,3 +1,137 @@
-from django.test import TestCase
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from bot_broadcast import BroadcastEngine, STATUS_SENT
+from core.models import ResultDelivery, Test, User
+from tgbot import utils
+from tgbot.mock_telegram import MockTelegramServer
+
+BOT_TOKEN = '123456:test-token'
+
+
+def run_with_mock_telegram(test_coro_func, **server_kwargs):
+    """
+    Lokal mock Telegram serverini ishga tushirib, TELEGRAM_API_BASE_URL ni unga yo'naltiradi va
+    test_coro_func(server) ni bajaradi. Natija va server qaytariladi.
+    """
+    async def runner():
+        async with MockTelegramServer(**server_kwargs) as server:
+            try:
+                with override_settings(TELEGRAM_API_BASE_URL=server.url, TELEGRAM_BOT_TOKEN=BOT_TOKEN):
+                    return await test_coro_func(server), server
+            finally:
+                await utils.close_telegram_client()
+    return async_to_sync(runner)()
+
+
+class SendTestResultTests(TestCase):
+    def send(self, percent, **server_kwargs):
+        async def send_result(server):
+            return await utils.send_test_result_to_user(
+                user_telegram_id=1001,
+                user_fullname=('Ali', 'Valiyev', ''),
+                score=(9, percent),
+                total_questions=10,
+                voucher_code=(1, 'IBT0101011'),
+            )
+        return run_with_mock_telegram(send_result, **server_kwargs)
+
+    def test_low_score_sends_text_message(self):
+        sent, server = self.send(50.0)
+        self.assertTrue(sent)
+        self.assertEqual(server.stats()['methods'], {'sendMessage': 1})
+
+    def test_high_score_sends_voucher_photo(self):
+        sent, server = self.send(90.0)
+        self.assertTrue(sent)
+        self.assertEqual(server.stats()['methods'], {'sendPhoto': 1})
+
+    def test_retry_after_response_is_reported_as_not_sent(self):
+        # 429 da xabar yuborilmagan hisoblanadi - qayta urinishni outbox (ResultDelivery) bajaradi
+        sent, server = self.send(50.0, fail_every=1)
+        self.assertFalse(sent)
+        self.assertEqual(server.stats()['methods'], {'sendMessage': 1})
+
+
+class BroadcastEngineTests(TestCase):
+    def test_sends_to_every_recipient_and_waits_on_retry_after(self):
+        chat_ids = list(range(1, 6))
+        results = {}
+
+        async def broadcast(server):
+            bot = Bot(BOT_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(server.url)))
+
+            async def on_result(chat_id, status, error):
+                results[chat_id] = status
+
+            try:
+                started = time.monotonic()
+                state = await BroadcastEngine(rate=100, concurrency=2, per_chat_interval=0).run(
+                    chat_ids, lambda chat_id: bot.send_message(chat_id, 'Salom'), on_result=on_result,
+                )
+                return state, time.monotonic() - started
+            finally:
+                await bot.session.close()
+
+        # Har 3-so'rovga 429 (retry_after=1) qaytadi
+        (state, elapsed), server = run_with_mock_telegram(broadcast, fail_every=3)
+        self.assertEqual(state[STATUS_SENT], len(chat_ids))
+        self.assertEqual(results, {chat_id: STATUS_SENT for chat_id in chat_ids})
+        # 5 ta xabar + 429 olgan so'rovlar qayta yuborildi
+        self.assertEqual(server.stats()['methods']['sendMessage'], 7)
+        self.assertGreaterEqual(elapsed, 1) # retry_after kutildi
+
+
+@mock.patch.object(utils, 'submit_later')
+class ResultDeliveryTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(telegram_id=1001, name='Ali', surname='Valiyev', language_code='uz')
+        self.test = Test.objects.create(user=user, score=3, total_questions=10, voucher_code='IBT0101011')
+        self.delivery = ResultDelivery.objects.create(test=self.test)
+
+    def deliver(self, fail=False):
+        async def deliver(server):
+            return await utils.deliver_result(self.delivery.pk)
+        return run_with_mock_telegram(deliver, fail_every=1 if fail else 0)
+
+    def test_failed_send_schedules_retry_then_delivers(self, submit_later):
+        sent, server = self.deliver(fail=True)
+        self.assertFalse(sent)
+        self.assertEqual(server.stats()['methods'], {'sendMessage': 1})
+        self.delivery.refresh_from_db()
+        self.assertEqual(self.delivery.status, ResultDelivery.STATUS_PENDING)
+        self.assertEqual(self.delivery.attempts, 1)
+        self.assertGreater(self.delivery.next_attempt_at, timezone.now())
+        delay = utils.RESULT_DELIVERY_RETRY_DELAYS[0]
+        submit_later.assert_called_once_with(delay, utils.deliver_result_sync, self.delivery.pk)
+
+        # Vaqti kelmagan yozuv qayta yuborilmaydi
+        sent, server = self.deliver()
+        self.assertFalse(sent)
+        self.assertEqual(server.stats()['requests'], 0)
+
+        ResultDelivery.objects.filter(pk=self.delivery.pk).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        sent, server = self.deliver()
+        self.assertTrue(sent)
+        self.assertEqual(server.stats()['methods'], {'sendMessage': 1})
+        self.delivery.refresh_from_db()
+        self.test.refresh_from_db()
+        self.assertEqual(self.delivery.status, ResultDelivery.STATUS_SENT)
+        self.assertEqual(self.delivery.attempts, 2)
+        self.assertTrue(self.test.voucher_sent)
+
+    def test_gives_up_after_last_retry(self, submit_later):
+        ResultDelivery.objects.filter(pk=self.delivery.pk).update(attempts=len(utils.RESULT_DELIVERY_RETRY_DELAYS) - 1)
+        sent, _server = self.deliver(fail=True)
+        self.assertFalse(sent)
+        self.delivery.refresh_from_db()
+        self.assertEqual(self.delivery.status, ResultDelivery.STATUS_FAILED)
+        submit_later.assert_not_called()
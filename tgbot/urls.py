@@ -3,7 +3,14 @@ from .views import (
     UserRegisterAPIView,
     UserDetailAPIView,
     UserSetLanguageAPIView,
-    UserSetPhoneAPIView
+    UserSetPhoneAPIView,
+    BroadcastListCreateAPIView,
+    BroadcastRecipientsAPIView,
+    BroadcastResultsAPIView,
+    BroadcastFinishAPIView,
+    ExportJobListCreateAPIView,
+    ExportJobDetailAPIView,
+    ExportJobFileAPIView,
 )
 
 app_name = 'tgbot' # Agar reverse URL kerak bo'lsa
@@ -13,4 +20,11 @@ urlpatterns = [
     path('users/<int:telegram_id>/', UserDetailAPIView.as_view(), name='user_detail_update'),
     path('users/<int:telegram_id>/set-language/', UserSetLanguageAPIView.as_view(), name='user_set_language'),
     path('users/<int:telegram_id>/set-phone/', UserSetPhoneAPIView.as_view(), name='user_set_phone'),
+    path('broadcasts/', BroadcastListCreateAPIView.as_view(), name='broadcast_list_create'),
+    path('broadcasts/<int:pk>/recipients/', BroadcastRecipientsAPIView.as_view(), name='broadcast_recipients'),
+    path('broadcasts/<int:pk>/results/', BroadcastResultsAPIView.as_view(), name='broadcast_results'),
+    path('broadcasts/<int:pk>/finish/', BroadcastFinishAPIView.as_view(), name='broadcast_finish'),
+    path('export-jobs/', ExportJobListCreateAPIView.as_view(), name='export_job_create'),
+    path('export-jobs/<int:pk>/', ExportJobDetailAPIView.as_view(), name='export_job_detail'),
+    path('export-jobs/<int:pk>/file/', ExportJobFileAPIView.as_view(), name='export_job_file'),
 ]
\ No newline at end of file
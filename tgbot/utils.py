@@ -1,12 +1,21 @@
 # tgbot/bot_utils.py (yoki core/bot_integration.py)
 import httpx
 import os
+import asyncio
+import importlib.util
+import threading
+import weakref
 from io import BytesIO
 from django.utils.translation import gettext_lazy as _ # Agar Django sozlamalaridan til kerak bo'lsa
+from django.utils import translation
 from django.conf import settings # BOT_TOKEN ni olish uchun
 from django.utils import timezone
-from core.models import User # Funksiya ichidan tashqariga olib chiqish mumkin, agar circular import muammosi bo'lmasa
+from django.db.models import F, Q
+from datetime import timedelta
+from core.models import User, ResultDelivery # Funksiya ichidan tashqariga olib chiqish mumkin, agar circular import muammosi bo'lmasa
+from .models import ExportJob
 from asgiref.sync import sync_to_async
+from core.workers import submit_later
 # Agar get_photo utils.py da bo'lsa:
 from core.utils import get_photo # Yoki to'g'ri import yo'li
 
@@ -14,6 +23,63 @@ from core.utils import get_photo # Yoki to'g'ri import yo'li
 import logging
 logger = logging.getLogger(__name__)
 
+# --- Telegram Bot API uchun umumiy HTTP klient ---
+# Har bir xabar uchun yangi AsyncClient (yangi TCP+TLS ulanish) ochilmaydi: har bir event loop uchun
+# bitta keep-alive pool li klient yaratiladi va qayta ishlatiladi.
+_telegram_clients = weakref.WeakKeyDictionary() # event loop -> httpx.AsyncClient
+_telegram_loop = None # Sinxron koddan (fon workerlari) chaqirish uchun alohida oqimdagi doimiy loop
+_telegram_loop_lock = threading.Lock()
+
+
+def _http2_available():
+    return settings.TELEGRAM_HTTP2 and importlib.util.find_spec('h2') is not None
+
+
+def get_telegram_client() -> httpx.AsyncClient:
+    """Joriy event loop uchun umumiy httpx.AsyncClient qaytaradi (birinchi chaqiruvda yaratiladi)."""
+    loop = asyncio.get_running_loop()
+    client = _telegram_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            base_url=settings.TELEGRAM_API_BASE_URL,
+            timeout=settings.TELEGRAM_HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.TELEGRAM_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.TELEGRAM_HTTP_MAX_KEEPALIVE,
+            ),
+            http2=_http2_available(),
+        )
+        _telegram_clients[loop] = client
+    return client
+
+
+async def close_telegram_client():
+    """Joriy event loop dagi klientni yopadi (jarayon yoki loop tugashidan oldin chaqiriladi)."""
+    client = _telegram_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def run_telegram_coroutine(coro):
+    """
+    Korutinani jarayon bo'ylab yagona fon loop ida bajarib, natijasini qaytaradi.
+    async_to_sync har chaqiruvda yangi loop ochgani uchun ulanishlar qayta ishlatilmasdi;
+    bu loop (va undagi klient) jarayon tugaguncha yashaydi.
+    """
+    global _telegram_loop
+    if _telegram_loop is None:
+        with _telegram_loop_lock:
+            if _telegram_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='telegram-loop', daemon=True).start()
+                _telegram_loop = loop
+    return asyncio.run_coroutine_threadsafe(coro, _telegram_loop).result()
+
+
+def _telegram_method_path(method):
+    return f"/bot{settings.TELEGRAM_BOT_TOKEN}/{method}"
+
+
 async def send_telegram_photo_message(chat_id: int, caption: str, photo_bytes: BytesIO, parse_mode: str = "HTML"):
     """
     Asinxron ravishda Telegramga rasm bilan xabar yuboradi.
@@ -23,25 +89,22 @@ async def send_telegram_photo_message(chat_id: int, caption: str, photo_bytes: B
         logger.error("TELEGRAM_BOT_TOKEN topilmadi!")
         return False
 
-    url = f"https://api.telegram.org/bot{bot_token}/sendPhoto"
-    
     # photo_bytes ni o'qib, fayl sifatida tayyorlash
     photo_bytes.seek(0) # Pointerni boshiga
     files = {'photo': ('voucher.jpg', photo_bytes, 'image/jpeg')}
     data = {'chat_id': chat_id, 'caption': caption, 'parse_mode': parse_mode}
 
-    async with httpx.AsyncClient(timeout=30.0) as client: # Timeout qo'shish
-        try:
-            response = await client.post(url, data=data, files=files)
-            response.raise_for_status() # Agar 4xx yoki 5xx bo'lsa xato chiqaradi
-            logger.info(f"Telegramga xabar muvaffaqiyatli yuborildi (chat_id: {chat_id}). Javob: {response.json()}")
-            return True
-        except httpx.HTTPStatusError as e:
-            logger.error(f"Telegram API xatosi (sendPhoto, chat_id: {chat_id}): {e.response.status_code} - {e.response.text}")
-        except httpx.RequestError as e:
-            logger.error(f"Telegramga ulanishda xato (sendPhoto, chat_id: {chat_id}): {e}")
-        except Exception as e:
-            logger.error(f"Telegramga rasm yuborishda kutilmagan xato (chat_id: {chat_id}): {e}")
+    try:
+        response = await get_telegram_client().post(_telegram_method_path('sendPhoto'), data=data, files=files)
+        response.raise_for_status() # Agar 4xx yoki 5xx bo'lsa xato chiqaradi
+        logger.info(f"Telegramga xabar muvaffaqiyatli yuborildi (chat_id: {chat_id}). Javob: {response.json()}")
+        return True
+    except httpx.HTTPStatusError as e:
+        logger.error(f"Telegram API xatosi (sendPhoto, chat_id: {chat_id}): {e.response.status_code} - {e.response.text}")
+    except httpx.RequestError as e:
+        logger.error(f"Telegramga ulanishda xato (sendPhoto, chat_id: {chat_id}): {e}")
+    except Exception as e:
+        logger.error(f"Telegramga rasm yuborishda kutilmagan xato (chat_id: {chat_id}): {e}")
     return False
 
 
@@ -54,30 +117,26 @@ async def send_telegram_text_message(chat_id: int, text: str, parse_mode: str =
         logger.error("TELEGRAM_BOT_TOKEN topilmadi!")
         return False
 
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
     data = {
         'chat_id': chat_id,
         'text': text,
         'parse_mode': parse_mode
     }
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.post(url, data=data)
-            response.raise_for_status()
-            logger.info(f"Telegramga matnli xabar yuborildi (chat_id: {chat_id}). Javob: {response.json()}")
-            return True
-        except httpx.HTTPStatusError as e:
-            logger.error(f"Telegram API xatosi (sendMessage, chat_id: {chat_id}): {e.response.status_code} - {e.response.text}")
-        except httpx.RequestError as e:
-            logger.error(f"Telegramga ulanishda xato (sendMessage, chat_id: {chat_id}): {e}")
-        except Exception as e:
-            logger.error(f"Telegramga matnli xabar yuborishda kutilmagan xato (chat_id: {chat_id}): {e}")
+    try:
+        response = await get_telegram_client().post(_telegram_method_path('sendMessage'), data=data)
+        response.raise_for_status()
+        logger.info(f"Telegramga matnli xabar yuborildi (chat_id: {chat_id}). Javob: {response.json()}")
+        return True
+    except httpx.HTTPStatusError as e:
+        logger.error(f"Telegram API xatosi (sendMessage, chat_id: {chat_id}): {e.response.status_code} - {e.response.text}")
+    except httpx.RequestError as e:
+        logger.error(f"Telegramga ulanishda xato (sendMessage, chat_id: {chat_id}): {e}")
+    except Exception as e:
+        logger.error(f"Telegramga matnli xabar yuborishda kutilmagan xato (chat_id: {chat_id}): {e}")
     return False
 
 
-
-
 async def send_test_result_to_user(
     user_telegram_id: int,
     user_fullname: tuple,
@@ -97,7 +156,7 @@ async def send_test_result_to_user(
         logger.info(f"Voucher shabloni izlanmoqda: {voucher_template_filename}")
         
         # get_photo sinxron funksiya, uni sync_to_async bilan chaqirish kerak
-        image_bytes = await sync_to_async(get_photo, thread_sensitive=True)( # thread_sensitive=True Pillow uchun kerak bo'lishi mumkin
+        image_bytes = await sync_to_async(get_photo, thread_sensitive=False)( # VoucherRenderer o'zi qulf bilan himoyalangan
             fullname=user_fullname,
             date_str=timezone.now().strftime("%d.%m.%Y"),
             voucher_template_filename=voucher_template_filename,
@@ -132,4 +191,119 @@ async def send_test_result_to_user(
             text=message_to_user
         )
                 
-    return user_message_sent
\ No newline at end of file
+    return user_message_sent
+
+
+
+# --- Natijalarni yuborish outboxi (ResultDelivery) ---
+# Yuborish muvaffaqiyatsiz bo'lsa, shu oraliqlardan keyin qayta urinib ko'riladi (sekund)
+RESULT_DELIVERY_RETRY_DELAYS = [30, 120, 600, 1800, 3600]
+RESULT_DELIVERY_LEASE_SECONDS = 300 # 'sending' holatida qolib ketgan yozuv shu vaqtdan keyin qayta olinadi
+
+
+def claim_result_delivery(delivery_id):
+    """
+    Yozuvni yuborish uchun band qiladi (bir nechta worker bir xabarni ikki marta yubormasligi uchun).
+    Muvaffaqiyatli bo'lsa ResultDelivery (test va user bilan), aks holda None qaytaradi.
+    """
+    now = timezone.now()
+    claimed = ResultDelivery.objects.filter(
+        pk=delivery_id,
+        status__in=[ResultDelivery.STATUS_PENDING, ResultDelivery.STATUS_SENDING],
+        next_attempt_at__lte=now,
+    ).update(
+        status=ResultDelivery.STATUS_SENDING,
+        attempts=F('attempts') + 1,
+        next_attempt_at=now + timedelta(seconds=RESULT_DELIVERY_LEASE_SECONDS),
+    )
+    if not claimed:
+        return None
+    return ResultDelivery.objects.select_related('test__user').get(pk=delivery_id)
+
+
+def finish_result_delivery(delivery, sent, error=''):
+    """Yuborish natijasini yozadi: muvaffaqiyatli bo'lsa voucher_sent=True, aks holda qayta urinish rejalashtiriladi."""
+    now = timezone.now()
+    if sent:
+        ResultDelivery.objects.filter(pk=delivery.pk).update(status=ResultDelivery.STATUS_SENT, sent_at=now, last_error='')
+        delivery.test.__class__.objects.filter(pk=delivery.test_id).update(voucher_sent=True)
+        logger.info(f"Test {delivery.test_id} uchun voucher_sent=True qilib saqlandi.")
+    elif delivery.attempts >= len(RESULT_DELIVERY_RETRY_DELAYS):
+        ResultDelivery.objects.filter(pk=delivery.pk).update(status=ResultDelivery.STATUS_FAILED, last_error=error)
+        logger.error(f"Test {delivery.test_id} natijasi {delivery.attempts} urinishdan keyin ham YUBORILMADI: {error}")
+    else:
+        delay = RESULT_DELIVERY_RETRY_DELAYS[delivery.attempts - 1]
+        ResultDelivery.objects.filter(pk=delivery.pk).update(
+            status=ResultDelivery.STATUS_PENDING,
+            next_attempt_at=now + timedelta(seconds=delay),
+            last_error=error,
+        )
+        logger.warning(f"Test {delivery.test_id} natijasi yuborilmadi, {delay} sekunddan keyin qayta urinish: {error}")
+        # Taymer yo'qolsa (jarayon qayta ishga tushsa) yozuvni core.tasks.sweep_result_deliveries oladi
+        submit_later(delay, deliver_result_sync, delivery.pk)
+
+
+async def deliver_result(delivery_id):
+    """Bitta outbox yozuvini band qilib, natijani Telegramga yuboradi. Yuborilgan bo'lsa True qaytaradi."""
+    delivery = await sync_to_async(claim_result_delivery)(delivery_id)
+    if delivery is None:
+        return False # Boshqa worker olgan yoki hali vaqti kelmagan
+
+    test_instance = delivery.test
+    user = test_instance.user
+    total_q_count = test_instance.total_questions or 1
+    score = test_instance.score or 0
+    percentage_correct = (score / total_q_count) * 100
+
+    sent, error = False, ''
+    if not user.telegram_id:
+        error = "Foydalanuvchining telegram_id si yo'q."
+    else:
+        try:
+            # Fon workerida so'rov tili yo'q: xabar foydalanuvchining tilida formatlanadi
+            with translation.override(user.language_code):
+                sent = await send_test_result_to_user(
+                    user_telegram_id=int(user.telegram_id),
+                    user_fullname=(user.name or '', user.surname or '', user.patronymic or ''),
+                    score=(score, round(percentage_correct, 1)),
+                    total_questions=total_q_count,
+                    voucher_code=(test_instance.id, test_instance.voucher_code),
+                )
+            if not sent:
+                error = "send_test_result_to_user False qaytardi."
+        except Exception as e:
+            logger.error(f"Test {test_instance.id} natijasini yuborishda kutilmagan xato: {e}", exc_info=True)
+            error = str(e)
+
+    await sync_to_async(finish_result_delivery)(delivery, sent, error)
+    return sent
+
+
+def get_due_result_delivery_ids(limit=100):
+    """Yuborish vaqti kelgan outbox yozuvlari ID lari."""
+    return list(
+        ResultDelivery.objects.filter(
+            Q(status=ResultDelivery.STATUS_PENDING) | Q(status=ResultDelivery.STATUS_SENDING),
+            next_attempt_at__lte=timezone.now(),
+        ).order_by('next_attempt_at').values_list('id', flat=True)[:limit]
+    )
+
+
+def deliver_result_sync(delivery_id):
+    """deliver_result ning sinxron varianti (fon workerlari uchun): umumiy Telegram loop ida bajariladi."""
+    return run_telegram_coroutine(deliver_result(delivery_id))
+
+
+def run_export_job(job_id):
+    """Eksport vazifasini bajaradi (fon workerida). Fayl tayyor bo'lsa True qaytaradi."""
+    job = ExportJob.objects.filter(pk=job_id).first()
+    if job is None:
+        logger.warning(f"Eksport vazifasi {job_id} topilmadi.")
+        return False
+    done = job.run()
+    if done:
+        logger.info(f"Eksport #{job_id} tayyor: {job.rows_count} qator, {job.file.name}")
+    elif job.status == ExportJob.STATUS_FAILED:
+        logger.error(f"Eksport #{job_id} xatolik bilan tugadi: {job.error}")
+    return done
+
@@ -3,11 +3,15 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from core.models import User, Test
+from .models import Broadcast, BroadcastDelivery, ExportJob
 from .serializers import (
     UserCreateSerializer,
     UserLanguageUpdateSerializer,
     UserPhoneUpdateSerializer,
-    UserDetailSerializer
+    UserDetailSerializer,
+    BroadcastSerializer,
+    BroadcastResultsSerializer,
+    ExportJobSerializer,
 )
 from django.utils.translation import gettext_lazy as _
 from asgiref.sync import sync_to_async # Import qilingan
@@ -17,10 +21,23 @@ from asgiref.sync import sync_to_async # Import qilingan
 from django.shortcuts import get_object_or_404
 from rest_framework import serializers
 
-from django.http import HttpResponse, JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse, FileResponse
 from django.utils import timezone
-import pandas as pd
-from io import BytesIO
+import os
+import tempfile
+from core.exports import (
+    EXPORT_FORMATS,
+    ExportError,
+    check_export_format,
+    export_filename,
+    filter_tests,
+    iter_csv,
+    parse_export_filters,
+    write_tests_export,
+)
+from core.workers import submit_on_commit
+from .utils import run_export_job
+from .permissions import IsBotClient
 
 
 
@@ -34,6 +51,10 @@ class UserRegisterAPIView(APIView):
         try:
             # User.objects.aget o'rniga User.objects.get
             user = User.objects.get(telegram_id=telegram_id)
+            if not user.is_active:
+                # Botni bloklab (tarqatishda is_active=False qilingan), keyin qaytgan foydalanuvchi
+                user.is_active = True
+                user.save(update_fields=['is_active'])
             serializer = UserDetailSerializer(user)
             return Response({"message": _("Foydalanuvchi allaqachon mavjud."), "user": serializer.data}, status=status.HTTP_200_OK)
         except User.DoesNotExist:
@@ -88,7 +109,7 @@ class UserSetPhoneAPIView(APIView):
         if serializer.is_valid():
             try:
                 serializer.save()
-                return Response({"message": _("Telefon raqami muvaffaqiyatli yangilandi."), "phone_number": user.phone_number}, status=status.HTTP_200_OK)
+                return Response({"message": _("Telefon raqami muvaffaqiyatli yangilandi."), "phone_number": user.phone_number, "language_code": user.language_code}, status=status.HTTP_200_OK) # Bot tilni olish uchun alohida GET qilmasligi uchun
             except serializers.ValidationError as e:
                 return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -98,6 +119,12 @@ class UserSetPhoneAPIView(APIView):
 
 
 class ExportTestsAPIView(APIView):
+    """
+    Testlarni eksport qiladi (core/exports.py): ?file_format=xlsx (standart), csv yoki parquet
+    (DRF ?format= parametrini o'zi band qiladi). Filtrlar: date_from, date_to, institution, min_score, max_score.
+    CSV to'g'ridan-to'g'ri oqim (stream) bilan yuboriladi; xlsx/parquet vaqtinchalik faylga yozilib bo'laklab
+    yuboriladi - ikkala holatda ham butun fayl xotirada saqlanmaydi.
+    """
     # Bu viewni himoyalash kerak (masalan, faqat adminlar uchun)
     # permission_classes = [IsAdminUser] # Agar DRF ishlatsangiz
     # Yoki custom decorator bilan
@@ -109,112 +136,74 @@ class ExportTestsAPIView(APIView):
         # if not secret_key_from_request or secret_key_from_request != "SIZNING_MAXFIY_KALITINGIZ":
         #     return JsonResponse({"error": "Unauthorized"}, status=401)
 
+        export_format = request.GET.get('file_format', 'xlsx').lower()
         try:
-            tests_queryset = Test.objects.select_related(
-                'user__education_type',
-                'user__institution__education_type',
-                'user__education_level',
-                'user__faculty'
-            ).prefetch_related(
-                'questions__subject' # Testdagi savollar va ularning fanlari
-            ).order_by('-started_at').all()
-
-            if not tests_queryset.exists():
-                return JsonResponse({"message": _("Eksport uchun test ma'lumotlari topilmadi.")}, status=404)
-
-            data_for_excel = []
-            # DataFrame uchun ustun nomlari (tarjima qilingan)
-            column_names = {
-                'test_id': str(_('Test ID')),
-                'tg_id': str(_('Telegram ID')),
-                'name': str(_('Atı')),
-                'surname': str(_('Familiyası')),
-                'patronymic': str(_('Ákesiniń Atı')),
-                'phone': str(_('Telefon')),
-                'edu_type': str(_('Bilimlendiriw Túri')),
-                'institution': str(_('Mákeme')),
-                'edu_level_otm': str(_('Basqısh (JOO)')),
-                'faculty_otm': str(_('Fakultet (JOO)')),
-                'course': str(_('Kurs')),
-                'test_date_started': str(_('Test Baslanıw Waqıtı')),
-                'test_date_completed': str(_('Test Tamamlanıw Waqıtı')),
-                'score': str(_('Nátiyje (Ball)')),
-                'total_q': str(_('Jámi Sorawlar')),
-                'time_spent': str(_('Sarplaǵan Waqıtı (s)')),
-                'voucher_code': str(_('Sertifikat Kodı')),
-            }
-            # Agar User modelida name, surname, patronymic alohida bo'lsa:
-            # column_names['name'] = str(_('Atı'))
-            # column_names['surname'] = str(_('Familiyası'))
-            # column_names['patronymic'] = str(_('Ákesiniń Atı'))
-
-
-            for test_obj in tests_queryset:
-                user = test_obj.user
-                
-                row_data = {
-                    column_names['test_id']: test_obj.id,
-                    column_names['tg_id']: user.telegram_id,
-                    column_names['name']: user.name or "",
-                    column_names['surname']: user.surname or "",
-                    column_names['patronymic']: user.patronymic or "",
-                    column_names['phone']: user.phone_number or "",
-                    column_names['edu_type']: str(user.education_type.name_kaa) if user.education_type else "",
-                    column_names['institution']: str(user.institution.name_kaa) if user.institution else "",
-                    column_names['edu_level_otm']: str(user.education_level.name_kaa) if user.education_level else "",
-                    column_names['faculty_otm']: str(user.faculty.name_kaa) if user.faculty else "",
-                    column_names['course']: user.course_year or "",
-                    column_names['test_date_started']: timezone.localtime(test_obj.started_at).strftime('%Y-%m-%d %H:%M') if test_obj.started_at else "",
-                    column_names['test_date_completed']: timezone.localtime(test_obj.completed_at).strftime('%Y-%m-%d %H:%M') if test_obj.completed_at else "",
-                    column_names['score']: test_obj.score if test_obj.score is not None else "",
-                    column_names['total_q']: test_obj.questions.count(),
-                    column_names['time_spent']: test_obj.time_spent_seconds if test_obj.time_spent_seconds is not None else "",
-                    column_names['voucher_code']: test_obj.voucher_code or "",
-                }
-                # Agar User modelida name, surname, patronymic alohida bo'lsa:
-                # row_data[column_names['name']] = user.name or ""
-                # row_data[column_names['surname']] = user.surname or ""
-                # row_data[column_names['patronymic']] = user.patronymic or ""
-                data_for_excel.append(row_data)
-
-            df = pd.DataFrame(data_for_excel)
-            
-            output = BytesIO()
-            sheet_name_str = str(_('Test_Natijalari'))
-
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                df.to_excel(writer, index=False, sheet_name=sheet_name_str)
-                worksheet = writer.sheets[sheet_name_str]
-                for idx, col_name_proxy in enumerate(df.columns):
-                    col_name_str = str(col_name_proxy)
-                    series = df[col_name_proxy]
-                    try:
-                        data_max_len = series.fillna('').astype(str).map(len).max()
-                    except Exception:
-                        data_max_len = 0
-                    header_len = len(col_name_str)
-                    max_len = max(data_max_len, header_len) + 2
-                    worksheet.set_column(idx, idx, max_len)
-
-            output.seek(0)
-
-            filename = f"test_results_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-            response = HttpResponse(
-                output,
-                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            )
+            check_export_format(export_format)
+            tests_queryset = filter_tests(**parse_export_filters(request.GET))
+        except ExportError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        if not tests_queryset.exists():
+            return JsonResponse({"message": _("Eksport uchun test ma'lumotlari topilmadi.")}, status=404)
+
+        filename = export_filename(export_format)
+
+        if export_format == 'csv':
+            response = StreamingHttpResponse(iter_csv(tests_queryset), content_type=EXPORT_FORMATS['csv'])
             response['Content-Disposition'] = f'attachment; filename="{filename}"'
             return response
 
+        output = tempfile.TemporaryFile() # Yopilganda (javob yuborilgach) avtomatik o'chadi
+        try:
+            write_tests_export(tests_queryset, export_format, output)
         except Exception as e:
+            output.close()
             # logger.error(f"Error exporting tests to Excel via API: {e}", exc_info=True) # Agar logger sozlagan bo'lsangiz
-            print(f"Error exporting tests to Excel via API: {e}") # Oddiy print
+            print(f"Error exporting tests via API: {e}") # Oddiy print
             import traceback
             traceback.print_exc() # Batafsil xato uchun
-            return JsonResponse({"error": _("Excel faylini yaratishda xatolik yuz berdi."), "details": str(e)}, status=500)
+            return JsonResponse({"error": _("Eksport faylini yaratishda xatolik yuz berdi."), "details": str(e)}, status=500)
+
+        output.seek(0)
+        return FileResponse(output, as_attachment=True, filename=filename, content_type=EXPORT_FORMATS[export_format])
+
 
 
 
+TELEGRAM_IDS_PAGE_SIZE = 5000
+TELEGRAM_IDS_MAX_PAGE_SIZE = 20000
+
+
+def telegram_ids_page(queryset, request):
+    """
+    Keyset pagination: ?after=<telegram_id>&limit=N. telegram_id bo'yicha saralangan bitta sahifa
+    (faqat ID lar) qaytaradi - OFFSET ishlatilmaydi, shuning uchun har bir sahifa indeks bo'yicha tez o'qiladi.
+    Birinchi sahifada (after berilmaganda) jami soni ham qaytariladi.
+    """
+    try:
+        after = int(request.GET['after']) if request.GET.get('after') not in (None, '') else None
+        limit = min(int(request.GET.get('limit', TELEGRAM_IDS_PAGE_SIZE)), TELEGRAM_IDS_MAX_PAGE_SIZE)
+    except ValueError:
+        return None
+    if limit <= 0:
+        return None
+
+    page_queryset = queryset.order_by('telegram_id')
+    if after is not None:
+        page_queryset = page_queryset.filter(telegram_id__gt=after)
+    telegram_ids = list(page_queryset.values_list('telegram_id', flat=True)[:limit])
+
+    data = {
+        "success": True,
+        "telegram_ids": telegram_ids,
+        "count": len(telegram_ids),
+        # Sahifa to'liq bo'lsa, keyingisi bo'lishi mumkin
+        "next_cursor": telegram_ids[-1] if len(telegram_ids) == limit else None,
+    }
+    if after is None:
+        data["total"] = queryset.count()
+    return data
+
 
 class GetAllUserTelegramIdsAPIView(APIView):
     # Bu viewni himoyalash kerak!
@@ -228,24 +217,138 @@ class GetAllUserTelegramIdsAPIView(APIView):
         #     return JsonResponse({"error": _("Ruxsat etilmagan.")}, status=401)
 
         try:
-            # Barcha aktiv foydalanuvchilarning telegram_id larini olish
-            # `values_list` faqat ko'rsatilgan maydonlarni qaytaradi, bu samaraliroq.
-            # `flat=True` esa tuple o'rniga to'g'ridan-to'g'ri qiymatlar ro'yxatini beradi.
-            telegram_ids = [
-                user_id for user_id in User.objects.filter(is_active=True).values_list('telegram_id', flat=True)
-            ]
-            # Yoki sinxron variant (agar view sinxron bo'lsa):
-            # telegram_ids = list(User.objects.filter(is_active=True).values_list('telegram_id', flat=True))
-
-            return JsonResponse({
-                "success": True,
-                "telegram_ids": telegram_ids,
-                "count": len(telegram_ids)
-            }, status=200)
+            # Barcha aktiv foydalanuvchilarning telegram_id lari sahifalab (?after=&limit=) qaytariladi,
+            # butun ro'yxat bitta JSON ga yig'ilmaydi
+            data = telegram_ids_page(User.objects.filter(is_active=True), request)
+            if data is None:
+                return JsonResponse({"error": _("Noto'g'ri 'after' yoki 'limit' parametri.")}, status=400)
+            return JsonResponse(data, status=200)
 
         except Exception as e:
             # logger.error(f"Error fetching all user Telegram IDs: {e}", exc_info=True)
             print(f"Error fetching all user Telegram IDs: {e}")
             import traceback
             traceback.print_exc()
-            return JsonResponse({"error": _("Telegram IDlarni olishda xatolik yuz berdi."), "details": str(e)}, status=500)
\ No newline at end of file
+            return JsonResponse({"error": _("Telegram IDlarni olishda xatolik yuz berdi."), "details": str(e)}, status=500)
+
+
+class BroadcastListCreateAPIView(APIView):
+    """
+    GET - yakunlanmagan tarqatishlar (bot qayta ishga tushganda davom ettirish uchun).
+    POST - yangi tarqatish yaratish (bir post uchun qayta POST qilinsa, mavjudi qaytariladi).
+    """
+    permission_classes = [IsBotClient]
+
+    def get(self, request, *args, **kwargs):
+        broadcasts = Broadcast.objects.filter(status=Broadcast.STATUS_RUNNING).order_by('created_at')
+        return Response({"success": True, "broadcasts": BroadcastSerializer(broadcasts, many=True).data}, status=status.HTTP_200_OK)
+
+    def post(self, request, *args, **kwargs):
+        serializer = BroadcastSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        broadcast, created = Broadcast.objects.get_or_create(
+            source_chat_id=serializer.validated_data['source_chat_id'],
+            message_id=serializer.validated_data['message_id'],
+            defaults={
+                'progress_message_id': serializer.validated_data.get('progress_message_id'),
+                'reply_markup': serializer.validated_data.get('reply_markup'),
+            },
+        )
+        if created:
+            broadcast.total_recipients = User.objects.filter(is_active=True).count()
+            broadcast.save(update_fields=['total_recipients'])
+        return Response(
+            {"success": True, "created": created, "broadcast": BroadcastSerializer(broadcast).data},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+
+class BroadcastRecipientsAPIView(APIView):
+    """
+    Tarqatishning hali yetkazilmagan qabul qiluvchilari (yuborilgan va bloklaganlar o'tkazib yuboriladi),
+    ?after=<telegram_id>&limit=N sahifalari bilan.
+    """
+    permission_classes = [IsBotClient]
+
+    def get(self, request, pk, *args, **kwargs):
+        broadcast = get_object_or_404(Broadcast, pk=pk)
+        data = telegram_ids_page(broadcast.pending_recipients(), request)
+        if data is None:
+            return Response({"error": _("Noto'g'ri 'after' yoki 'limit' parametri.")}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class BroadcastResultsAPIView(APIView):
+    """Bot yuborish natijalarini paketlab yozadi: {"results": [{"telegram_id", "status", "error"}, ...]}."""
+    permission_classes = [IsBotClient]
+
+    def post(self, request, pk, *args, **kwargs):
+        broadcast = get_object_or_404(Broadcast, pk=pk)
+        serializer = BroadcastResultsSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        saved = BroadcastDelivery.save_results(broadcast, serializer.validated_data['results'])
+        return Response({"success": True, "saved": saved}, status=status.HTTP_200_OK)
+
+
+class BroadcastFinishAPIView(APIView):
+    """Tarqatishni yakunlangan deb belgilaydi va yakuniy hisobni qaytaradi."""
+    permission_classes = [IsBotClient]
+
+    def post(self, request, pk, *args, **kwargs):
+        broadcast = get_object_or_404(Broadcast, pk=pk)
+        broadcast.finish()
+        return Response({"success": True, "broadcast": BroadcastSerializer(broadcast).data}, status=status.HTTP_200_OK)
+
+
+class ExportJobListCreateAPIView(APIView):
+    """
+    POST - eksport vazifasini yaratadi va darhol qaytaradi (202); fayl fon workerida tayyorlanadi.
+    Tana: {"requested_by": <telegram_id>, "file_format": "xlsx|csv|parquet", "filters": {date_from, date_to, institution, min_score, max_score}}
+    """
+    permission_classes = [IsBotClient]
+
+    def post(self, request, *args, **kwargs):
+        file_format = str(request.data.get('file_format') or 'xlsx').lower()
+        filters = request.data.get('filters') or {}
+        if not isinstance(filters, dict):
+            return Response({"error": _("'filters' obyekt bo'lishi kerak.")}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            check_export_format(file_format)
+            parse_export_filters(filters) # Xato parametrlar vazifa yaratilmasdan oldin qaytariladi
+        except ExportError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = ExportJob.objects.create(
+            requested_by=request.data.get('requested_by') or None,
+            file_format=file_format,
+            filters={key: str(value) for key, value in filters.items() if value not in (None, '')},
+        )
+        submit_on_commit(run_export_job, job.id)
+        return Response({"success": True, "job": ExportJobSerializer(job).data}, status=status.HTTP_202_ACCEPTED)
+
+
+class ExportJobDetailAPIView(APIView):
+    """Eksport vazifasining holati (bot tayyor bo'lguncha so'rab turadi)."""
+    permission_classes = [IsBotClient]
+
+    def get(self, request, pk, *args, **kwargs):
+        job = get_object_or_404(ExportJob, pk=pk)
+        return Response({"success": True, "job": ExportJobSerializer(job).data}, status=status.HTTP_200_OK)
+
+
+class ExportJobFileAPIView(APIView):
+    """Tayyor eksport faylini bo'laklab yuboradi."""
+    permission_classes = [IsBotClient]
+
+    def get(self, request, pk, *args, **kwargs):
+        job = get_object_or_404(ExportJob, pk=pk)
+        if job.status != ExportJob.STATUS_DONE or not job.file:
+            return Response({"error": _("Eksport fayli hali tayyor emas.")}, status=status.HTTP_409_CONFLICT)
+        return FileResponse(
+            job.file.open('rb'),
+            as_attachment=True,
+            filename=os.path.basename(job.file.name),
+            content_type=EXPORT_FORMATS.get(job.file_format, 'application/octet-stream'),
+        )